@@ -1,4 +1,9 @@
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
 from app.db.session import SessionLocal
+from app.services import profiling
 
 def get_db():
     db = SessionLocal()
@@ -6,3 +11,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def require_admin(x_profile: Optional[str] = Header(None)) -> None:
+    """Admin-only routes need a fresh signed X-Profile header (see profiling.sign)."""
+    if not profiling.verify(x_profile):
+        raise HTTPException(status_code=403, detail="Valid X-Profile signature required")
@@ -0,0 +1,130 @@
+"""
+ASGI middleware.
+"""
+import time
+
+from starlette.responses import JSONResponse
+
+from app.services import admission, profiling
+from app.services.metrics import HTTP_REQUEST_DURATION
+
+# Routes gated by require_admin (see app.api.deps)
+ADMIN_PATH_PREFIXES = ("/admin/", "/knowledge/")
+
+
+class MetricsMiddleware:
+    """
+    Records HTTP latency per route template (e.g. /tickets/{ticket_id}),
+    measured until the last body chunk is sent so streamed responses count
+    their full duration.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status
+            ).observe(time.perf_counter() - start)
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests picked by profiling.should_profile (signed X-Profile
+    header or sampling) until their response body is complete.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # Admin-only routes carry the signed header as authorization: reading
+        # profiles back or importing does not produce new profiles
+        if scope["type"] != "http" or scope["path"].startswith(ADMIN_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        header = None
+        for name, value in scope.get("headers", ()):
+            if name == profiling.PROFILE_HEADER.encode("latin-1"):
+                header = value.decode("latin-1")
+                break
+        trigger = profiling.should_profile(header)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        session, token = profiling.begin(f"{scope['method']} {scope['path']}", trigger)
+        status = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiling.end(session, token, status)
+
+
+class AdmissionMiddleware:
+    """
+    Sheds ticket requests over their route or client budget (see admission)
+    with 429/503 and Retry-After. Admitted requests carry their lease in
+    context until the response is complete.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        route = admission.route_for(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = None
+        for name, value in scope.get("headers", ()):
+            if name == admission.CLIENT_HEADER.encode("latin-1"):
+                client = value.decode("latin-1")
+                break
+        if not client:
+            client = scope["client"][0] if scope.get("client") else "unknown"
+
+        lease, rejection = await admission.controller.admit(route, client)
+        if rejection is not None:
+            response = JSONResponse(
+                status_code=rejection.status_code,
+                content={"detail": rejection.detail, "reason": rejection.reason},
+                headers={"Retry-After": str(rejection.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        token = admission.bind(lease)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.unbind(token)
+            lease.release()
@@ -0,0 +1,31 @@
+"""
+Admin API routes.
+Stored request profiles (see app.services.profiling). Every call needs a
+fresh signed X-Profile header, the same one that triggers profiling.
+"""
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.api.deps import require_admin
+from app.services import profiling
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/profiles")
+def read_profiles():
+    """Summaries of recent profiles, newest first."""
+    return profiling.list_profiles()
+
+
+@router.get("/profiles/{profile_id}")
+def read_profile(profile_id: str, format: str = "speedscope"):
+    """
+    One profile as speedscope JSON (open it at https://www.speedscope.app),
+    or its component summary with ?format=summary.
+    """
+    if not profile_id.isalnum():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    profile = profiling.load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile["summary"] if format == "summary" else profile["speedscope"]
@@ -0,0 +1,46 @@
+"""
+Analytics API routes.
+Serves ticket metrics from incrementally maintained rollups.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_db
+from app.schemas.response import AnalyticsResponse
+from app.services.analytics import get_analytics
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+DEFAULT_WINDOW = timedelta(hours=24)
+
+
+def _to_naive_utc(ts: datetime) -> datetime:
+    """Rollup buckets are stored as naive UTC."""
+    if ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@router.get("", response_model=AnalyticsResponse)
+def read_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Resolution/escalation rates, intent mix, confidence distribution and
+    latency percentiles for [start, end). Times are UTC; defaults to the
+    last 24 hours.
+    """
+    end = end or datetime.utcnow()
+    start = start or end - DEFAULT_WINDOW
+
+    start, end = _to_naive_utc(start), _to_naive_utc(end)
+
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    return AnalyticsResponse(**get_analytics(db, start, end))
@@ -2,15 +2,19 @@
 Feedback API routes.
 Handles human feedback submission for learning.
 """
+import uuid
 import logging
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
 
 from app.api.deps import get_db
 from app.schemas.feedback import FeedbackCreate
 from app.schemas.response import FeedbackResponse
-from app.graph.nodes.learning import learning_from_feedback
+from app.models.feedback import Feedback
 from app.models.ticket import Ticket
+from app.services.learner import notify_feedback_pending
 
 logger = logging.getLogger(__name__)
 
@@ -25,37 +29,49 @@ def submit_feedback(
     """
     Submit human feedback for a ticket.
     
-    This feedback is used to improve the knowledge base.
+    The feedback is persisted and acknowledged immediately; the background
+    learner adds it to the knowledge base.
     """
     # Verify ticket exists
     ticket = db.query(Ticket).filter(Ticket.id == payload.ticket_id).first()
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
 
-    state = {
-        "ticket_id": payload.ticket_id,
-        "ticket_text": payload.ticket_text,
-        "final_response": payload.final_response,
-        "human_feedback": payload.feedback,
-        "intent": ticket.intent
-    }
+    # One pending row per ticket: resubmissions before learning overwrite it
+    feedback = (
+        db.query(Feedback)
+        .filter(Feedback.ticket_id == payload.ticket_id)
+        .filter(Feedback.status == "pending")
+        .first()
+    )
+    if feedback is None:
+        feedback = Feedback(id=str(uuid.uuid4()), ticket_id=payload.ticket_id)
+        db.add(feedback)
+
+    feedback.content = payload.feedback
+    feedback.ticket_text = payload.ticket_text
+    feedback.final_response = payload.final_response
+    feedback.intent = ticket.intent
+    feedback.status = "pending"
+    feedback.attempts = 0
+    feedback.next_attempt_at = datetime.utcnow()
 
     try:
-        learning_from_feedback(state)
-        
         # FIX: Update ticket status to resolved so it doesn't reappear in queue
         ticket.status = "resolved"
         db.commit()
-        
-        return FeedbackResponse(
-            status="feedback_processed",
-            ticket_id=payload.ticket_id,
-            message="Feedback recorded and added to knowledge base"
-        )
-    
-    except Exception as e:
-        logger.error(f"Failed to process feedback: {e}")
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Failed to save feedback: {e}")
         raise HTTPException(
             status_code=500,
             detail="Failed to process feedback"
         )
+
+    notify_feedback_pending()
+
+    return FeedbackResponse(
+        status="feedback_queued",
+        ticket_id=payload.ticket_id,
+        message="Feedback recorded and queued for the knowledge base"
+    )
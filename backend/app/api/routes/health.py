@@ -1,8 +1,13 @@
 """
-Health check API route.
+Health check API routes.
+Liveness (/health) and readiness (/health/ready) are reported separately:
+a live process may still be warming up.
 """
 from fastapi import APIRouter
-from app.schemas.response import HealthResponse
+from fastapi.responses import JSONResponse
+
+from app.schemas.response import HealthResponse, ReadinessResponse
+from app.services import lifecycle, warmup
 
 router = APIRouter(tags=["health"])
 
@@ -14,3 +19,18 @@ def health_check():
         status="ok",
         service="langgraph-support-agent"
     )
+
+
+@router.get("/health/ready", response_model=ReadinessResponse, responses={503: {"model": ReadinessResponse}})
+def readiness_check():
+    """
+    Check if the service is warmed up and should receive traffic (503 until
+    then, and again once it is draining for shutdown).
+    """
+    state = ReadinessResponse(**warmup.readiness())
+    if lifecycle.is_draining():
+        state.status = "draining"
+        return JSONResponse(status_code=503, content=state.model_dump())
+    if not warmup.is_ready():
+        return JSONResponse(status_code=503, content=state.model_dump())
+    return state
@@ -0,0 +1,37 @@
+"""
+Knowledge base API routes.
+Bulk import of help-center articles and macros. Imports rewrite the shared
+index, so these routes are admin-only, like /admin.
+"""
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.api.deps import require_admin
+from app.schemas.knowledge import KnowledgeImportRequest
+from app.schemas.response import KnowledgeImportResponse
+from app.services.kb_import import get_import_job, start_import_job
+
+router = APIRouter(prefix="/knowledge", tags=["knowledge"], dependencies=[Depends(require_admin)])
+
+
+@router.post("/import", response_model=KnowledgeImportResponse, status_code=202)
+def import_knowledge(payload: KnowledgeImportRequest):
+    """
+    Queue a bulk import. Articles are chunked, embedded in batches and
+    written to the index in bulk; poll the returned job for progress.
+    """
+    job = start_import_job(
+        [article.model_dump() for article in payload.articles],
+        chunk_size=payload.chunk_size,
+        overlap=payload.overlap,
+        deduplicate=payload.deduplicate
+    )
+    return KnowledgeImportResponse(**job)
+
+
+@router.get("/import/{job_id}", response_model=KnowledgeImportResponse)
+def read_import_job(job_id: str):
+    """Progress of an import (started on any worker)."""
+    job = get_import_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return KnowledgeImportResponse(**job)
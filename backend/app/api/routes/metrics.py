@@ -0,0 +1,16 @@
+"""
+Metrics API route.
+Prometheus exposition of app metrics (see app.services.metrics).
+"""
+from fastapi import APIRouter, Response
+
+from app.services.metrics import render
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Prometheus scrape endpoint."""
+    payload, content_type = render()
+    return Response(content=payload, media_type=content_type)
@@ -4,50 +4,118 @@ Handles ticket creation and processing.
 """
 import uuid
 import logging
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.api.deps import get_db
-from app.graph.graph import build_graph
 from app.models.ticket import Ticket
 from app.schemas.ticket import TicketCreate
 from app.schemas.response import TicketResponse, TicketResult
+from app.config.settings import settings
+from app.services import admission
+from app.services import deadline as request_deadline
+from app.services import idempotency, lifecycle
+from app.services.llm_scheduler import INTERACTIVE, STANDARD, priority, resolve_priority
+from app.services.metrics import STREAM_THREADS_IN_FLIGHT
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/tickets", tags=["tickets"])
 
-# Build graph once at module load
-_graph = None
+# Idempotency-Key scopes
+CREATE_ROUTE = idempotency.CREATE_ROUTE
+STREAM_ROUTE = idempotency.STREAM_ROUTE
 
 
 def get_graph():
-    """Lazy load the graph to avoid import-time issues."""
-    global _graph
-    if _graph is None:
-        _graph = build_graph()
-    return _graph
+    """
+    The compiled graph. Imported lazily: langgraph, langchain and openai
+    account for most of the app's import time, and the startup warm-up
+    builds the graph in the background anyway.
+    """
+    from app.graph.graph import get_graph as get_compiled_graph
+    return get_compiled_graph()
+
+
+def _claim_idempotency_key(route: str, key: str, payload: TicketCreate, ticket_id: Optional[str]) -> Optional[dict]:
+    """
+    Claim an Idempotency-Key for this request.
+
+    Returns None if this request should run, otherwise the record of the
+    first request that used the key (completed or still in progress).
+    """
+    if len(key) > idempotency.MAX_KEY_LENGTH:
+        admission.no_graph_run()
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+    body_hash = idempotency.request_hash(payload.model_dump())
+    existing = idempotency.claim(route, key, body_hash, ticket_id)
+    if existing is not None and existing["request_hash"] != body_hash:
+        admission.no_graph_run()
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for a different request"
+        )
+    return existing
+
+
+def _idempotent_response(route: str, key: str, record: dict) -> dict:
+    """The stored response for a key, waiting (up to IDEMPOTENCY_WAIT_S) if still in progress."""
+    if record["status"] != idempotency.COMPLETED:
+        record = idempotency.wait_for_completion(route, key, settings.idempotency_wait_s)
+        if record is None:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress"
+            )
+        if record["status"] == idempotency.RELEASED:
+            raise HTTPException(
+                status_code=409,
+                detail="The request with this Idempotency-Key failed; retry to run it again"
+            )
+    return record["response"]
 
 
 @router.post("/", response_model=TicketResponse)
 def create_ticket(
     payload: TicketCreate,
-    db: Session = Depends(get_db)
+    response: Response,
+    db: Session = Depends(get_db),
+    x_priority: Optional[str] = Header(None),
+    x_request_timeout_ms: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None)
 ):
     """
     Create and process a new support ticket.
     
     The ticket is saved immediately, then processed through the LangGraph workflow.
     If processing fails, the ticket is marked as failed but still persisted.
+    LLM calls run at the X-Priority class (interactive, standard or batch;
+    standard by default). Processing degrades to stay within the
+    X-Request-Timeout-Ms budget (default DEADLINE_TICKETS_MS).
+
+    With an Idempotency-Key header, a retry gets the first request's response
+    (marked Idempotent-Replayed) instead of a new ticket, unless that request
+    failed: failures are not replayed, so the retry runs again.
     """
+    deadline = request_deadline.for_request(x_request_timeout_ms, settings.deadline_tickets_ms)
     ticket_id = str(uuid.uuid4())
 
+    if idempotency_key:
+        existing = _claim_idempotency_key(CREATE_ROUTE, idempotency_key, payload, ticket_id)
+        if existing is not None:
+            admission.no_graph_run()
+            response.headers[idempotency.REPLAYED_HEADER] = "true"
+            return TicketResponse(**_idempotent_response(CREATE_ROUTE, idempotency_key, existing))
+
     # Create ticket record first
     ticket = Ticket(
         id=ticket_id,
         text=payload.text,
-        status="processing"
+        status="processing",
+        idempotency_route=CREATE_ROUTE if idempotency_key else None,
+        idempotency_key=idempotency_key
     )
     
     try:
@@ -56,63 +124,77 @@ def create_ticket(
     except SQLAlchemyError as e:
         db.rollback()
         logger.error(f"Failed to create ticket: {e}")
+        if idempotency_key:
+            idempotency.release(CREATE_ROUTE, idempotency_key)
         raise HTTPException(status_code=500, detail="Failed to create ticket")
 
-    # Process through graph
-    try:
-        graph = get_graph()
-        result = graph.invoke({
-            "ticket_id": ticket_id,
-            "ticket_text": payload.text,
-            "needs_human": False,
-            "status": "processing"
-        })
-
-        # Update ticket with results
-        ticket.intent = result.get("intent")
-        ticket.confidence = result.get("confidence")
-        ticket.proposed_solution = result.get("proposed_solution")
-        ticket.status = result.get("status", "resolved")
-        ticket.error_message = result.get("error_message")
+    # Process through graph (tracked so a shutdown drain can requeue it)
+    with lifecycle.track(ticket_id, CREATE_ROUTE, payload.text, idempotency_key=idempotency_key):
+        try:
+            graph = get_graph()
+            admission.graph_started()
+            with priority(resolve_priority(x_priority, STANDARD)):
+                result = graph.invoke(
+                    {
+                        "ticket_id": ticket_id,
+                        "ticket_text": payload.text,
+                        "needs_human": False,
+                        "status": "processing"
+                    },
+                    config={"configurable": {"deadline": deadline}}
+                )
+
+            # Update ticket with results
+            ticket.intent = result.get("intent")
+            ticket.confidence = result.get("confidence")
+            ticket.proposed_solution = result.get("proposed_solution")
+            ticket.status = result.get("status", "resolved")
+            ticket.error_message = result.get("error_message")
         
-        db.commit()
+            db.commit()
 
-        return TicketResponse(
-            ticket_id=ticket_id,
-            status=ticket.status,
-            result=TicketResult(
+            ticket_response = TicketResponse(
+                ticket_id=ticket_id,
                 status=ticket.status,
-                ticket_text=payload.text,
-                intent=ticket.intent,
-                confidence=ticket.confidence,
-                proposed_solution=ticket.proposed_solution,
-                final_response=result.get("final_response"),
-                error_message=ticket.error_message
+                result=TicketResult(
+                    status=ticket.status,
+                    ticket_text=payload.text,
+                    intent=ticket.intent,
+                    confidence=ticket.confidence,
+                    proposed_solution=ticket.proposed_solution,
+                    final_response=result.get("final_response"),
+                    error_message=ticket.error_message
+                )
             )
-        )
 
-    except Exception as e:
-        # Mark ticket as failed but don't lose it
-        logger.error(f"Ticket processing failed: {e}")
-        ticket.status = "failed"
-        ticket.error_message = str(e)
+        except Exception as e:
+            # Mark ticket as failed but don't lose it
+            logger.error(f"Ticket processing failed: {e}")
+            ticket.status = "failed"
+            ticket.error_message = str(e)
         
-        try:
-            db.commit()
-        except SQLAlchemyError:
-            db.rollback()
+            try:
+                db.commit()
+            except SQLAlchemyError:
+                db.rollback()
 
-        return TicketResponse(
-            ticket_id=ticket_id,
-            status="failed",
-            result=TicketResult(
+            ticket_response = TicketResponse(
+                ticket_id=ticket_id,
                 status="failed",
-                error_message=str(e)
+                result=TicketResult(
+                    status="failed",
+                    error_message=str(e)
+                )
             )
-        )
 
+    if idempotency_key:
+        if ticket_response.status == "failed":
+            # Likely transient (LLM outage, timeout): let a retry run again
+            idempotency.release(CREATE_ROUTE, idempotency_key)
+        else:
+            idempotency.complete(CREATE_ROUTE, idempotency_key, ticket_response.model_dump())
+    return ticket_response
 
-from typing import List, Optional
 
 @router.get("/", response_model=List[TicketResponse])
 def list_tickets(
@@ -170,28 +252,84 @@ def get_ticket(
     )
 
 # Streaming Implementation
+import contextvars
 import threading
 import queue
 import json
 from fastapi.responses import StreamingResponse
 
+
+def _sse_event(item) -> str:
+    if isinstance(item, dict) and item.get("type") in ["ticket_id", "final_result", "error"]:
+        # Structured event
+        return f"data: {json.dumps(item)}\n\n"
+    # Raw token chunk (string)
+    # JSON encode it to stay safe
+    return f"data: {json.dumps({'type': 'chunk', 'content': item})}\n\n"
+
+
+def _replay_stream(key: str, record: dict) -> StreamingResponse:
+    """
+    Answer a retried stream: follow the first request's stream if it is
+    still running in this process, otherwise send its stored outcome.
+    """
+    broadcast = None
+    if record["status"] != idempotency.COMPLETED:
+        broadcast = idempotency.get_stream(STREAM_ROUTE, key)
+    stored = None if broadcast is not None else _idempotent_response(STREAM_ROUTE, key, record)
+
+    def event_generator():
+        if broadcast is not None:
+            yield _sse_event({"type": "ticket_id", "id": broadcast.ticket_id})
+            for item in broadcast.subscribe():
+                yield _sse_event(item)
+        else:
+            yield _sse_event({"type": "ticket_id", "id": stored["ticket_id"]})
+            yield _sse_event(stored["final_result"])
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={idempotency.REPLAYED_HEADER: "true"}
+    )
+
+
 @router.post("/stream", response_class=StreamingResponse)
 def stream_ticket(
     payload: TicketCreate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    x_priority: Optional[str] = Header(None),
+    x_request_timeout_ms: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None)
 ):
     """
     Stream a ticket response using Server-Sent Events (SSE).
     This allows the frontend to display the AI's response token-by-token.
     
     If ticket_id is provided, this is a follow-up on an existing ticket.
-    The original ticket text is preserved as context for Review Queue.
+    The original ticket text is preserved as context for Review Queue, and
+    the ticket's stored intent is reused unless the message needs
+    reclassifying (FOLLOWUP_* settings).
+    LLM calls run at the X-Priority class (interactive by default), within
+    the X-Request-Timeout-Ms budget (default DEADLINE_STREAM_MS).
+
+    With an Idempotency-Key header, a retry does not start a second run: it
+    follows the first request's stream from the beginning, or gets its
+    final result once finished. A failed run releases the key instead, so a
+    later retry runs again.
     """
-    stream_queue = queue.Queue()
+    deadline = request_deadline.for_request(x_request_timeout_ms, settings.deadline_stream_ms)
+
+    if idempotency_key:
+        existing = _claim_idempotency_key(STREAM_ROUTE, idempotency_key, payload, payload.ticket_id)
+        if existing is not None:
+            admission.no_graph_run()
+            return _replay_stream(idempotency_key, existing)
     
     # Check if this is a follow-up on existing ticket
     is_followup = payload.ticket_id is not None
     original_ticket_text = None
+    prior_intent = prior_confidence = None
     
     if is_followup:
         # Use existing ticket
@@ -205,8 +343,14 @@ def stream_ticket(
                 original_ticket_text = payload.text
             else:
                 original_ticket_text = existing_ticket.text  # Preserve original context
+                if settings.followup_reuse_intent:
+                    # Lets the graph skip reclassifying (see carry_over_intent)
+                    prior_intent = existing_ticket.intent
+                    prior_confidence = existing_ticket.confidence
             
             existing_ticket.status = "processing"
+            existing_ticket.idempotency_route = STREAM_ROUTE if idempotency_key else None
+            existing_ticket.idempotency_key = idempotency_key
             db.commit()
         else:
             # Ticket not found, create new one
@@ -219,7 +363,9 @@ def stream_ticket(
         ticket = Ticket(
             id=ticket_id,
             text=payload.text,
-            status="processing"
+            status="processing",
+            idempotency_route=STREAM_ROUTE if idempotency_key else None,
+            idempotency_key=idempotency_key
         )
         try:
             db.add(ticket)
@@ -227,80 +373,113 @@ def stream_ticket(
         except SQLAlchemyError as e:
             db.rollback()
             logger.error(f"Failed to create ticket: {e}")
+            if idempotency_key:
+                idempotency.release(STREAM_ROUTE, idempotency_key)
             raise HTTPException(status_code=500, detail="Failed to create ticket")
 
+    if idempotency_key:
+        # Kept in full so retries can attach and replay from the start
+        stream_queue = idempotency.StreamBroadcast(ticket_id)
+        idempotency.register_stream(STREAM_ROUTE, idempotency_key, stream_queue)
+    else:
+        stream_queue = queue.Queue()
+
     # Background definition: What runs in the thread
     def run_graph_in_background():
+        STREAM_THREADS_IN_FLIGHT.inc()
+        outcome = None
         try:
-            graph = get_graph()
+            with lifecycle.track(
+                ticket_id, STREAM_ROUTE, payload.text, original_ticket_text, stream_queue,
+                idempotency_key=idempotency_key
+            ):
+                if lease is not None:
+                    lease.start()
+                graph = get_graph()
             
-            # Invoke graph with queue injected into config
-            # Use current message text but keep original context for display
-            result = graph.invoke(
-                {
-                    "ticket_id": ticket_id,
-                    "ticket_text": payload.text,  # Current message for processing
-                    "original_ticket_text": original_ticket_text,  # Original for review queue
-                    "needs_human": False,
-                    "status": "processing"
-                },
-                config={
-                    "configurable": {
-                        "stream_queue": stream_queue
+                # Invoke graph with queue injected into config
+                # Use current message text but keep original context for display
+                result = graph.invoke(
+                    {
+                        "ticket_id": ticket_id,
+                        "ticket_text": payload.text,  # Current message for processing
+                        "original_ticket_text": original_ticket_text,  # Original for review queue
+                        "prior_intent": prior_intent,
+                        "prior_confidence": prior_confidence,
+                        "needs_human": False,
+                        "status": "processing"
+                    },
+                    config={
+                        "configurable": {
+                            "stream_queue": stream_queue,
+                            "deadline": deadline
+                        }
                     }
-                }
-            )
+                )
 
-            # Update ticket in DB with new session (thread-safe)
-            from app.db.session import SessionLocal
-            thread_db = SessionLocal()
-            try:
-                ticket_record = thread_db.query(Ticket).filter(Ticket.id == ticket_id).first()
-                if ticket_record:
-                    ticket_record.intent = result.get("intent")
-                    ticket_record.confidence = result.get("confidence")
-                    ticket_record.proposed_solution = result.get("proposed_solution")
-                    ticket_record.status = result.get("status", "resolved")
-                    ticket_record.error_message = result.get("error_message")
-                    thread_db.commit()
-                    logger.info(f"Updated ticket {ticket_id} with status: {ticket_record.status}")
-            except SQLAlchemyError as db_err:
-                thread_db.rollback()
-                logger.error(f"Failed to update ticket {ticket_id}: {db_err}")
-            finally:
-                thread_db.close()
+                # Update ticket in DB with new session (thread-safe)
+                from app.db.session import SessionLocal
+                thread_db = SessionLocal()
+                try:
+                    ticket_record = thread_db.query(Ticket).filter(Ticket.id == ticket_id).first()
+                    if ticket_record:
+                        ticket_record.intent = result.get("intent")
+                        ticket_record.confidence = result.get("confidence")
+                        ticket_record.proposed_solution = result.get("proposed_solution")
+                        ticket_record.status = result.get("status", "resolved")
+                        ticket_record.error_message = result.get("error_message")
+                        thread_db.commit()
+                        logger.info(f"Updated ticket {ticket_id} with status: {ticket_record.status}")
+                except SQLAlchemyError as db_err:
+                    thread_db.rollback()
+                    logger.error(f"Failed to update ticket {ticket_id}: {db_err}")
+                finally:
+                    thread_db.close()
             
-            # Signal Completion
-            stream_queue.put({"type": "final_result", "data": result})
+                # Signal Completion
+                outcome = {"type": "final_result", "data": result}
+                stream_queue.put(outcome)
 
         except Exception as e:
             logger.error(f"Background processing failed: {e}")
-            stream_queue.put({"type": "error", "error": str(e)})
+            outcome = {"type": "error", "error": str(e)}
+            stream_queue.put(outcome)
         finally:
+            STREAM_THREADS_IN_FLIGHT.dec()
             stream_queue.put(None) # Sentinel
+            if idempotency_key:
+                if outcome is None or outcome["type"] == "error" or outcome["data"].get("status") == "failed":
+                    # Likely transient (LLM outage, timeout): let a retry run again
+                    idempotency.release(STREAM_ROUTE, idempotency_key)
+                else:
+                    idempotency.complete(
+                        STREAM_ROUTE, idempotency_key, {"ticket_id": ticket_id, "final_result": outcome}
+                    )
+                idempotency.unregister_stream(STREAM_ROUTE, idempotency_key)
+            if lease is not None:
+                lease.release()
+
+    # The run keeps the request's admission budget until it finishes,
+    # even if the client disconnects first
+    lease = admission.hold()
 
-    # Start thread
-    thread = threading.Thread(target=run_graph_in_background)
+    # Start thread (with this request's context, e.g. an active profile)
+    with priority(resolve_priority(x_priority, INTERACTIVE)):
+        context = contextvars.copy_context()
+    thread = threading.Thread(target=context.run, args=(run_graph_in_background,))
     thread.start()
 
     # Generator: Yields SSE events
     def event_generator():
         # Yield initial ticket ID
-        yield f"data: {json.dumps({'type': 'ticket_id', 'id': ticket_id})}\n\n"
+        yield _sse_event({"type": "ticket_id", "id": ticket_id})
+
+        if idempotency_key:
+            items = stream_queue.subscribe()
+        else:
+            items = iter(stream_queue.get, None)  # until the sentinel
+        for item in items:
+            yield _sse_event(item)
 
-        while True:
-            item = stream_queue.get()
-            
-            if item is None: # Done
-                break
-            
-            if isinstance(item, dict) and item.get("type") in ["final_result", "error"]:
-                # Structured event
-                yield f"data: {json.dumps(item)}\n\n"
-            else:
-                # Raw token chunk (string)
-                # JSON encode it to stay safe
-                yield f"data: {json.dumps({'type': 'chunk', 'content': item})}\n\n"
-                
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
@@ -5,9 +5,138 @@ from pydantic import Field
 class Settings(BaseSettings):
     openrouter_api_key: str = Field(..., env="OPENROUTER_API_KEY")
     openrouter_model: str = Field(..., env="OPENROUTER_MODEL")
+    # OpenAI-compatible endpoint; point at benchmarks/mock_llm_server.py for load tests
+    llm_base_url: str = Field("https://openrouter.ai/api/v1", env="LLM_BASE_URL")
     database_url: str = Field(..., env="DATABASE_URL")
     app_env: str = Field("development", env="APP_ENV")
 
+    # Build the graph, load embeddings and map the index in the background at
+    # startup; /health/ready reports 503 until this has finished
+    warmup_enabled: bool = Field(True, env="WARMUP_ENABLED")
+
+    # Preforking server (python -m app.server): workers share the model,
+    # index and graph loaded by the master
+    prefork_workers: int = Field(2, env="PREFORK_WORKERS")
+    prefork_memory_report_interval: float = Field(60.0, env="PREFORK_MEMORY_REPORT_INTERVAL")
+
+    # LLM record/replay cassette: off | record | replay (see llm_cassette)
+    llm_cassette_mode: str = Field("off", env="LLM_CASSETTE_MODE")
+    llm_cassette_path: str = Field("data/llm_cassette.sqlite", env="LLM_CASSETTE_PATH")
+
+    # LLM scheduling: concurrent upstream calls per process, shared between
+    # priority classes by weighted fair queuing (see llm_scheduler)
+    llm_max_concurrency: int = Field(16, env="LLM_MAX_CONCURRENCY")
+    llm_weight_interactive: float = Field(8.0, env="LLM_WEIGHT_INTERACTIVE")
+    llm_weight_standard: float = Field(4.0, env="LLM_WEIGHT_STANDARD")
+    llm_weight_batch: float = Field(1.0, env="LLM_WEIGHT_BATCH")
+    llm_batch_max_concurrency: int = Field(8, env="LLM_BATCH_MAX_CONCURRENCY")
+
+    # Request deadlines (ms; X-Request-Timeout-Ms overrides the route default
+    # up to the max, a default of 0 disables). Below the minimums, nodes
+    # degrade instead of calling out.
+    deadline_tickets_ms: int = Field(30000, env="DEADLINE_TICKETS_MS")
+    deadline_stream_ms: int = Field(60000, env="DEADLINE_STREAM_MS")
+    deadline_max_ms: int = Field(120000, env="DEADLINE_MAX_MS")
+    deadline_min_llm_ms: int = Field(1500, env="DEADLINE_MIN_LLM_MS")
+    deadline_retrieval_reserve_ms: int = Field(3000, env="DEADLINE_RETRIEVAL_RESERVE_MS")
+    deadline_min_db_ms: int = Field(100, env="DEADLINE_MIN_DB_MS")
+
+    # Shutdown drain: in-flight graph runs get this long to finish before
+    # they are checkpointed and their tickets requeued (seconds)
+    shutdown_drain_s: float = Field(20.0, env="SHUTDOWN_DRAIN_S")
+
+    # Startup recovery of requeued and orphaned tickets; "processing" tickets
+    # older than RECOVERY_STALE_AFTER_S (must exceed DEADLINE_MAX_MS) are orphans
+    recovery_enabled: bool = Field(True, env="RECOVERY_ENABLED")
+    recovery_stale_after_s: float = Field(300.0, env="RECOVERY_STALE_AFTER_S")
+    recovery_max_attempts: int = Field(3, env="RECOVERY_MAX_ATTEMPTS")
+
+    # Admission control for ticket routes: in-flight graph runs per process
+    # (0: unlimited), per client and route, and how long the oldest admitted
+    # run may wait to start before new requests are shed
+    admission_enabled: bool = Field(True, env="ADMISSION_ENABLED")
+    admission_tickets_max_inflight: int = Field(32, env="ADMISSION_TICKETS_MAX_INFLIGHT")
+    admission_stream_max_inflight: int = Field(64, env="ADMISSION_STREAM_MAX_INFLIGHT")
+    admission_client_max_inflight: int = Field(8, env="ADMISSION_CLIENT_MAX_INFLIGHT")
+    admission_max_queue_ms: float = Field(5000.0, env="ADMISSION_MAX_QUEUE_MS")
+    admission_defer_ms: float = Field(1000.0, env="ADMISSION_DEFER_MS")
+
+    # Idempotency-Key on ticket creation: how long keys are remembered, and
+    # how long a retry waits for the first request to finish (seconds)
+    idempotency_ttl_s: int = Field(86400, env="IDEMPOTENCY_TTL_S")
+    idempotency_wait_s: float = Field(60.0, env="IDEMPOTENCY_WAIT_S")
+
+    # Request profiling (off unless a secret or sample rate is set)
+    profiling_secret: str = Field("", env="PROFILING_SECRET")
+    profiling_sample_rate: float = Field(0.0, env="PROFILING_SAMPLE_RATE")
+    profiling_interval_ms: float = Field(5.0, env="PROFILING_INTERVAL_MS")
+    profiling_dir: str = Field("data/profiles", env="PROFILING_DIR")
+    profiling_max_profiles: int = Field(50, env="PROFILING_MAX_PROFILES")
+
+    # Knowledge base index persistence
+    vectorstore_dir: str = Field("data/vectorstore", env="VECTORSTORE_DIR")
+    vectorstore_keep_snapshots: int = Field(3, env="VECTORSTORE_KEEP_SNAPSHOTS")
+    vectorstore_refresh_interval: float = Field(1.0, env="VECTORSTORE_REFRESH_INTERVAL")
+
+    # ANN index selection: auto | flat | ivf_flat | hnsw | ivf_pq
+    ann_index_type: str = Field("auto", env="ANN_INDEX_TYPE")
+    ann_flat_max_vectors: int = Field(20000, env="ANN_FLAT_MAX_VECTORS")
+    ann_ivf_flat_max_vectors: int = Field(1000000, env="ANN_IVF_FLAT_MAX_VECTORS")
+    ann_nprobe: int = Field(16, env="ANN_NPROBE")
+    ann_hnsw_m: int = Field(32, env="ANN_HNSW_M")
+    ann_hnsw_ef_search: int = Field(64, env="ANN_HNSW_EF_SEARCH")
+    ann_pq_m: int = Field(48, env="ANN_PQ_M")
+    ann_drift_threshold: float = Field(1.5, env="ANN_DRIFT_THRESHOLD")
+
+    # Hybrid retrieval (BM25 + vector, reciprocal rank fusion)
+    retrieval_lexical_budget_ms: float = Field(20.0, env="RETRIEVAL_LEXICAL_BUDGET_MS")
+    retrieval_candidate_multiplier: int = Field(4, env="RETRIEVAL_CANDIDATE_MULTIPLIER")
+    retrieval_rrf_k: int = Field(60, env="RETRIEVAL_RRF_K")
+
+    # Solution prompt context budget (tokens)
+    prompt_context_token_budget: int = Field(800, env="PROMPT_CONTEXT_TOKEN_BUDGET")
+    prompt_passage_max_tokens: int = Field(300, env="PROMPT_PASSAGE_MAX_TOKENS")
+
+    # Follow-ups keep the ticket's stored intent unless the message drifts
+    # from the original (similarity below the minimum; shorter messages are
+    # never considered drifted)
+    followup_reuse_intent: bool = Field(True, env="FOLLOWUP_REUSE_INTENT")
+    followup_min_similarity: float = Field(0.35, env="FOLLOWUP_MIN_SIMILARITY")
+    followup_drift_min_words: int = Field(6, env="FOLLOWUP_DRIFT_MIN_WORDS")
+
+    # Direct reuse of human-approved resolutions (skips the solution LLM call)
+    answer_reuse_enabled: bool = Field(True, env="ANSWER_REUSE_ENABLED")
+    answer_reuse_min_similarity: float = Field(0.92, env="ANSWER_REUSE_MIN_SIMILARITY")
+
+    # Near-duplicate suppression for learned documents
+    dedup_enabled: bool = Field(True, env="DEDUP_ENABLED")
+    dedup_max_hamming: int = Field(3, env="DEDUP_MAX_HAMMING")
+    dedup_min_similarity: float = Field(0.95, env="DEDUP_MIN_SIMILARITY")
+
+    # Embedding cache (disk tier is disabled when the path is empty)
+    embedding_cache_size: int = Field(10000, env="EMBEDDING_CACHE_SIZE")
+    embedding_cache_path: str = Field("", env="EMBEDDING_CACHE_PATH")
+
+    # Bulk knowledge base import (0 workers embeds in-process); API job
+    # status is kept for KB_IMPORT_JOB_TTL_S seconds after the job finishes
+    kb_import_chunk_size: int = Field(1200, env="KB_IMPORT_CHUNK_SIZE")
+    kb_import_chunk_overlap: int = Field(200, env="KB_IMPORT_CHUNK_OVERLAP")
+    kb_import_workers: int = Field(0, env="KB_IMPORT_WORKERS")
+    kb_import_embed_batch: int = Field(256, env="KB_IMPORT_EMBED_BATCH")
+    kb_import_write_batch: int = Field(5000, env="KB_IMPORT_WRITE_BATCH")
+    kb_import_job_ttl_s: int = Field(604800, env="KB_IMPORT_JOB_TTL_S")
+
+    # Query embedding micro-batching (1 disables batching)
+    embedding_batch_size: int = Field(32, env="EMBEDDING_BATCH_SIZE")
+    embedding_batch_wait_ms: float = Field(5.0, env="EMBEDDING_BATCH_WAIT_MS")
+
+    # Background learner (feedback -> knowledge base)
+    learner_enabled: bool = Field(True, env="LEARNER_ENABLED")
+    learner_batch_size: int = Field(64, env="LEARNER_BATCH_SIZE")
+    learner_poll_interval: float = Field(2.0, env="LEARNER_POLL_INTERVAL")
+    learner_batch_wait: float = Field(5.0, env="LEARNER_BATCH_WAIT")
+    learner_max_attempts: int = Field(5, env="LEARNER_MAX_ATTEMPTS")
+
     model_config = {
         "env_file": ".env",
         "extra": "ignore"
@@ -0,0 +1,66 @@
+import logging
+
+from sqlalchemy import inspect, text
+
+from app.db.base import Base
+from app.db.session import engine
+
+# Import models so they are registered on Base.metadata
+from app.models import (  # noqa: F401
+    analytics, answer_reuse, feedback, idempotency, kb_import_job, ticket, ticket_checkpoint
+)
+
+logger = logging.getLogger(__name__)
+
+# Value existing rows get for a column added to their table, where the
+# column's default is wrong for them. Anything not listed gets the default.
+BACKFILL = {
+    # Feedback stored before the background learner was learned on submission
+    ("feedback", "status"): "learned",
+}
+
+
+def _backfill_value(table, column):
+    if (table.name, column.name) in BACKFILL:
+        return BACKFILL[(table.name, column.name)]
+    default = column.default
+    if default is None or not default.is_scalar and not default.is_callable:
+        return None
+    return default.arg(None) if default.is_callable else default.arg
+
+
+def _add_missing_columns(conn) -> None:
+    """
+    Add model columns missing from existing tables (create_all only creates
+    tables), and backfill existing rows.
+
+    Added columns are nullable in the database; the models always supply a
+    value. Only additive changes are handled: nothing is dropped or altered.
+    """
+    inspector = inspect(conn)
+    if_not_exists = "IF NOT EXISTS " if conn.dialect.name == "postgresql" else ""
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        added = [column for column in table.columns if column.name not in existing]
+        for column in added:
+            conn.execute(text(
+                f"ALTER TABLE {table.name} ADD COLUMN {if_not_exists}"
+                f"{column.name} {column.type.compile(dialect=conn.dialect)}"
+            ))
+            value = _backfill_value(table, column)
+            if value is not None:
+                conn.execute(table.update().where(table.c[column.name].is_(None)).values({column.name: value}))
+            logger.info(f"Added column {table.name}.{column.name}")
+        added_names = {column.name for column in added}
+        for index in table.indexes:
+            if added_names.intersection(column.name for column in index.columns):
+                index.create(conn, checkfirst=True)
+
+
+def init_db():
+    """Create missing tables and add columns missing from existing ones."""
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        _add_missing_columns(conn)
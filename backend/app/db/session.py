@@ -1,8 +1,10 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.config.settings import settings
+from app.services.metrics import instrument_pool
 
 engine = create_engine(settings.database_url, pool_pre_ping=True)
+instrument_pool(engine.pool)
 
 SessionLocal = sessionmaker(
     autocommit=False,
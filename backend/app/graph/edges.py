@@ -4,6 +4,19 @@ Determines conditional transitions between nodes.
 """
 
 
+def route_entry(state: dict) -> str:
+    """
+    Decide how to classify the message.
+
+    Routes to:
+    - followup: A follow-up on a ticket with a stored intent (may reuse it)
+    - classify: Otherwise, full intent classification
+    """
+    if state.get("prior_intent"):
+        return "followup"
+    return "classify"
+
+
 def route_after_intent(state: dict) -> str:
     """
     Decide routing after intent classification.
@@ -19,6 +32,19 @@ def route_after_intent(state: dict) -> str:
     return "continue"
 
 
+def route_after_retrieval(state: dict) -> str:
+    """
+    Decide how to answer after knowledge retrieval.
+    
+    Routes to:
+    - reuse: A human-approved resolution matches the ticket closely enough
+    - generate: Otherwise, generate a fresh solution
+    """
+    if state.get("reuse_candidate"):
+        return "reuse"
+    return "generate"
+
+
 def route_after_solution(state: dict) -> str:
     """
     Decide the next step after solution generation.
@@ -2,13 +2,22 @@
 LangGraph workflow definition for the support agent.
 Defines nodes, edges, and state transitions.
 """
+import threading
+
 from langgraph.graph import StateGraph, END
 
 from app.graph.state import SupportState
 from app.graph.nodes.intent import detect_intent
+from app.graph.nodes.followup import carry_over_intent
+from app.graph.nodes.retrieval import retrieve_knowledge
 from app.graph.nodes.solution import generate_solution
-from app.graph.edges import route_after_solution, route_after_intent
+from app.graph.nodes.reuse import reuse_answer
+from app.graph.edges import route_after_solution, route_after_intent, route_after_retrieval, route_entry
 from app.services.escalation import build_escalation_payload
+from app.services.metrics import instrument_node
+
+_graph = None
+_graph_lock = threading.Lock()
 
 
 def escalate_node(state: dict) -> dict:
@@ -48,7 +57,8 @@ def finalize_resolved(state: dict) -> dict:
         "final_response": {
             "message": "Your issue has been resolved",
             "solution": state.get("proposed_solution"),
-            "ticket_id": state["ticket_id"]
+            "ticket_id": state["ticket_id"],
+            "answer_source": state.get("answer_source") or {"type": "generated"}
         }
     }
 
@@ -75,43 +85,67 @@ def build_graph() -> StateGraph:
     
     Flow:
     1. intent -> Classify ticket intent (check for explicit escalation)
+       (followup instead for follow-ups on a classified ticket: keeps the
+       stored intent unless the message needs reclassifying)
     2. If explicit escalation -> immediate_escalate
-       Else -> solution -> Conditional: escalate or finalize
+       Else -> retrieve (intent-partitioned KB search)
+    3. If a human-approved resolution matches -> reuse, else -> solution
+       -> Conditional: escalate or finalize
     """
     graph = StateGraph(SupportState)
 
     # Add nodes
-    graph.add_node("intent", detect_intent)
-    graph.add_node("solution", generate_solution)
-    graph.add_node("escalate", escalate_node)
-    graph.add_node("immediate_escalate", explicit_escalate_node)
-    graph.add_node("off_topic", off_topic_node)
-    graph.add_node("finalize", finalize_resolved)
-
-    # Set entry point
-    graph.set_entry_point("intent")
-
-    # Conditional routing after intent - check for explicit escalation or off-topic
-    graph.add_conditional_edges(
-        "intent",
-        route_after_intent,
+    graph.add_node("intent", instrument_node("intent", detect_intent))
+    graph.add_node("followup", instrument_node("followup", carry_over_intent))
+    graph.add_node("retrieve", instrument_node("retrieve", retrieve_knowledge))
+    graph.add_node("solution", instrument_node("solution", generate_solution))
+    graph.add_node("reuse", instrument_node("reuse", reuse_answer))
+    graph.add_node("escalate", instrument_node("escalate", escalate_node))
+    graph.add_node("immediate_escalate", instrument_node("immediate_escalate", explicit_escalate_node))
+    graph.add_node("off_topic", instrument_node("off_topic", off_topic_node))
+    graph.add_node("finalize", instrument_node("finalize", finalize_resolved))
+
+    # Entry point: follow-ups on classified tickets skip reclassification
+    graph.set_conditional_entry_point(
+        route_entry,
         {
-            "escalate": "immediate_escalate",
-            "off_topic": "off_topic",
-            "continue": "solution"
+            "followup": "followup",
+            "classify": "intent"
         }
     )
 
-    # Conditional routing after solution
+    # Conditional routing after intent - check for explicit escalation or off-topic
+    for node in ("intent", "followup"):
+        graph.add_conditional_edges(
+            node,
+            route_after_intent,
+            {
+                "escalate": "immediate_escalate",
+                "off_topic": "off_topic",
+                "continue": "retrieve"
+            }
+        )
+
     graph.add_conditional_edges(
-        "solution",
-        route_after_solution,
+        "retrieve",
+        route_after_retrieval,
         {
-            "escalate": "escalate",
-            "finish": "finalize"
+            "reuse": "reuse",
+            "generate": "solution"
         }
     )
 
+    # Conditional routing after solution (generated or reused)
+    for node in ("solution", "reuse"):
+        graph.add_conditional_edges(
+            node,
+            route_after_solution,
+            {
+                "escalate": "escalate",
+                "finish": "finalize"
+            }
+        )
+
     # Terminal edges
     graph.add_edge("escalate", END)
     graph.add_edge("immediate_escalate", END)
@@ -120,3 +154,12 @@ def build_graph() -> StateGraph:
 
     return graph.compile()
 
+
+def get_graph():
+    """Compiled workflow graph, built once per process."""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = build_graph()
+    return _graph
@@ -0,0 +1,83 @@
+"""
+Follow-up intent node.
+Carries the ticket's stored intent over to a follow-up message instead of
+classifying it again, saving an LLM round trip per conversational turn.
+"""
+import logging
+
+from langchain_core.runnables import RunnableConfig
+
+from app.config.settings import settings
+from app.graph.nodes.intent import detect_intent, is_escalation_request
+from app.services.deadline import bound, from_config
+from app.services.dedup import cosine
+from app.services.metrics import FOLLOWUP_INTENT
+from app.utils.confidence import needs_human_review
+
+logger = logging.getLogger(__name__)
+
+# Stored intents that say nothing about what a follow-up is about
+NON_CARRYING_INTENTS = ("off_topic", "escalate_request")
+
+
+def _has_drifted(message: str, original: str, deadline) -> bool:
+    """
+    True if the follow-up is about something else than the original ticket.
+
+    Messages shorter than FOLLOWUP_DRIFT_MIN_WORDS ("still broken", "any
+    update?") lean on the conversation for their meaning and are never
+    considered drifted; their embeddings are not comparable with the
+    original's.
+    """
+    if len(message.split()) < settings.followup_drift_min_words:
+        return False
+    from app.services.vectorstore import get_embedding
+
+    embedding = get_embedding()
+    with bound(deadline):
+        similarity = cosine(embedding.embed_query(message), embedding.embed_query(original))
+    return similarity < settings.followup_min_similarity
+
+
+def carry_over_intent(state: dict, config: RunnableConfig = None) -> dict:
+    """
+    Reuse the ticket's stored intent and confidence for a follow-up message.
+
+    Falls back to full classification (detect_intent) when:
+    - the message asks for a human (explicit escalation)
+    - the stored classification would be escalated anyway (low confidence)
+      or does not describe an issue (off_topic, escalate_request)
+    - the message drifts from the original ticket (embedding similarity
+      below FOLLOWUP_MIN_SIMILARITY)
+
+    Returns:
+        Same fields as detect_intent.
+    """
+    ticket_text = state["ticket_text"]
+    prior_intent = state.get("prior_intent")
+    prior_confidence = state.get("prior_confidence")
+
+    if is_escalation_request(ticket_text):
+        outcome = "escalation"
+    elif prior_intent in NON_CARRYING_INTENTS or needs_human_review(prior_confidence):
+        outcome = "low_confidence"
+    else:
+        original = state.get("original_ticket_text") or ticket_text
+        try:
+            outcome = "drift" if _has_drifted(ticket_text, original, from_config(config)) else "reused"
+        except Exception as e:
+            logger.warning(f"Follow-up drift check failed for ticket {state['ticket_id']}: {e}")
+            outcome = "drift"
+
+    FOLLOWUP_INTENT.labels(outcome=outcome).inc()
+    if outcome != "reused":
+        logger.info(f"Reclassifying follow-up on ticket {state['ticket_id']} ({outcome})")
+        return detect_intent(state, config)
+
+    logger.info(f"Follow-up on ticket {state['ticket_id']} keeps intent {prior_intent} ({prior_confidence:.2f})")
+    return {
+        "intent": prior_intent,
+        "confidence": prior_confidence,
+        "status": "processing",
+        "explicit_escalation": False
+    }
@@ -6,6 +6,10 @@ Includes explicit escalation phrase detection.
 import logging
 import re
 
+from langchain_core.runnables import RunnableConfig
+
+from app.config.settings import settings
+from app.services.deadline import append_error, from_config, has_time
 from app.services.llm import invoke_llm_json
 from app.services.exceptions import LLMError
 from app.utils.prompts import INTENT_CLASSIFICATION_PROMPT
@@ -36,7 +40,7 @@ def is_escalation_request(text: str) -> bool:
     return False
 
 
-def detect_intent(state: dict) -> dict:
+def detect_intent(state: dict, config: RunnableConfig = None) -> dict:
     """
     Classify the intent of the support ticket.
     
@@ -45,7 +49,8 @@ def detect_intent(state: dict) -> dict:
     
     Returns:
         Dict with intent, confidence, and updated status.
-        Falls back to safe defaults on LLM failure.
+        Falls back to safe defaults on LLM failure, or without calling the
+        LLM when the request deadline is too close.
     """
     ticket_text = state["ticket_text"]
     
@@ -59,13 +64,24 @@ def detect_intent(state: dict) -> dict:
             "explicit_escalation": True
         }
     
+    deadline = from_config(config)
+    if not has_time(deadline, settings.deadline_min_llm_ms / 1000):
+        logger.warning(f"Skipping intent classification for ticket {state['ticket_id']}: {deadline}")
+        return {
+            "intent": FALLBACK_INTENT.intent,
+            "confidence": FALLBACK_INTENT.confidence,
+            "status": "processing",
+            "error_message": append_error(state, "Intent classification skipped (deadline)"),
+            "explicit_escalation": False
+        }
+
     # Standard LLM-based classification
     prompt = INTENT_CLASSIFICATION_PROMPT.format(
         ticket_text=ticket_text
     )
 
     try:
-        result = invoke_llm_json(prompt, IntentClassification)
+        result = invoke_llm_json(prompt, IntentClassification, deadline=deadline)
         return {
             "intent": result.intent,
             "confidence": result.confidence,
@@ -80,6 +96,6 @@ def detect_intent(state: dict) -> dict:
             "intent": FALLBACK_INTENT.intent,
             "confidence": FALLBACK_INTENT.confidence,
             "status": "processing",
-            "error_message": f"Intent classification failed: {e.message}",
+            "error_message": append_error(state, f"Intent classification failed: {e.message}"),
             "explicit_escalation": False
         }
@@ -4,6 +4,7 @@ Converts human feedback into knowledge base documents.
 """
 import logging
 
+from app.services.feedback_documents import build_feedback_document, feedback_document_id
 from app.services.knowledge_base import add_knowledge_document
 
 logger = logging.getLogger(__name__)
@@ -16,26 +17,17 @@ def learning_from_feedback(state: dict) -> dict:
     Returns:
         Dict with updated status.
     """
-    feedback = state.get("human_feedback")
-    solution = state.get("final_response")
-
-    if not feedback or not solution:
+    document = build_feedback_document(state)
+    if document is None:
         return {}
 
-    document_text = f"""Issue: {state['ticket_text']}
-
-Resolution: {solution}
-
-Agent Notes: {feedback}"""
+    document_text, metadata = document
 
     try:
         add_knowledge_document(
             text=document_text,
-            metadata={
-                "source": "human_feedback",
-                "ticket_id": state["ticket_id"],
-                "intent": state.get("intent")
-            }
+            metadata=metadata,
+            doc_id=feedback_document_id(state["ticket_id"])
         )
         logger.info(f"Learned from feedback for ticket {state['ticket_id']}")
         return {"status": "learned"}
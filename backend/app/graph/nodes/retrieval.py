@@ -4,24 +4,55 @@ Retrieves relevant documents from the knowledge base for context.
 """
 import logging
 
+from langchain_core.runnables import RunnableConfig
+
+from app.config.settings import settings
+from app.services.answer_reuse import find_reusable_answer
+from app.services.deadline import append_error, from_config, has_time
 from app.services.knowledge_base import search_knowledge_base
 
 logger = logging.getLogger(__name__)
 
 
-def retrieve_knowledge(state: dict) -> dict:
+def retrieve_knowledge(state: dict, config: RunnableConfig = None) -> dict:
     """
     Retrieve relevant KB docs for the ticket.
+
+    Searches the detected intent's partition first (see search_knowledge_base),
+    then checks the results for a human-approved resolution that can be
+    reused as-is (see find_reusable_answer).
     
+    Skipped when the request deadline leaves less than
+    DEADLINE_RETRIEVAL_RESERVE_MS, which is kept for solution generation.
+
     Returns:
-        Dict with retrieved_docs list.
+        Dict with retrieved_docs list and reuse_candidate (or None).
         Returns empty list on failure (non-critical).
     """
+    deadline = from_config(config)
+    if not has_time(deadline, settings.deadline_retrieval_reserve_ms / 1000):
+        logger.warning(f"Skipping retrieval for ticket {state['ticket_id']}: {deadline}")
+        return {
+            "retrieved_docs": [],
+            "reuse_candidate": None,
+            "error_message": append_error(state, "Knowledge retrieval skipped (deadline)")
+        }
+
     try:
-        results = search_knowledge_base(state["ticket_text"], k=3)
-        return {"retrieved_docs": results}
-    
+        results = search_knowledge_base(
+            state["ticket_text"],
+            k=3,
+            intent=state.get("intent"),
+            deadline=deadline
+        )
     except Exception as e:
         logger.warning(f"Knowledge retrieval failed: {e}")
         # Non-critical - continue without context
-        return {"retrieved_docs": []}
+        return {"retrieved_docs": [], "reuse_candidate": None}
+
+    try:
+        reuse = find_reusable_answer(state["ticket_text"], state.get("intent"), results, deadline=deadline)
+    except Exception as e:
+        logger.warning(f"Answer reuse check failed: {e}")
+        reuse = None
+    return {"retrieved_docs": results, "reuse_candidate": reuse}
@@ -0,0 +1,56 @@
+"""
+Answer reuse node.
+Answers the ticket with a matching human-approved resolution, skipping the
+solution LLM call.
+"""
+import logging
+
+from langchain_core.runnables import RunnableConfig
+
+from app.services.answer_reuse import record_answer_reuse, stream_answer
+from app.services.deadline import from_config
+from app.utils.confidence import needs_human_review
+
+logger = logging.getLogger(__name__)
+
+
+def reuse_answer(state: dict, config: RunnableConfig = None) -> dict:
+    """
+    Return the reusable resolution found during retrieval as the solution.
+
+    Streams it to the client in chunks when a stream queue is present, and
+    records the reuse for audit (except in replays, configurable["replay"]).
+
+    Returns:
+        Dict with proposed_solution, needs_human flag, status and answer_source.
+    """
+    reuse = state["reuse_candidate"]
+
+    stream_queue = None
+    replay = False
+    if config and "configurable" in config:
+        stream_queue = config["configurable"].get("stream_queue")
+        replay = config["configurable"].get("replay", False)
+    if stream_queue:
+        stream_answer(reuse["resolution"], stream_queue)
+
+    if not replay:
+        record_answer_reuse(state["ticket_id"], reuse, deadline=from_config(config))
+    logger.info(
+        f"Ticket {state['ticket_id']} answered from {reuse['document_id']} "
+        f"(similarity {reuse['similarity']})"
+    )
+
+    # Same confidence gate as generated answers
+    needs_human = needs_human_review(state.get("confidence"))
+    return {
+        "proposed_solution": reuse["resolution"],
+        "needs_human": needs_human,
+        "status": "waiting_human" if needs_human else "resolved",
+        "answer_source": {
+            "type": "reused",
+            "document_id": reuse["document_id"],
+            "source_ticket_id": reuse.get("source_ticket_id"),
+            "similarity": reuse["similarity"],
+        }
+    }
@@ -5,6 +5,11 @@ Supports prose streaming for real-time token display.
 """
 import logging
 
+from langchain_core.runnables import RunnableConfig
+
+from app.config.settings import settings
+from app.services.context_assembly import assemble_context
+from app.services.deadline import append_error, from_config, has_time
 from app.services.llm import invoke_llm, invoke_llm_stream, invoke_llm_json
 from app.services.exceptions import LLMError
 from app.utils.prompts import SOLUTION_GENERATION_PROMPT, SOLUTION_GENERATION_PROMPT_PROSE
@@ -14,7 +19,7 @@ from app.schemas.llm_outputs import SolutionOutput, FALLBACK_SOLUTION
 logger = logging.getLogger(__name__)
 
 
-def generate_solution(state: dict, config: dict = None) -> dict:
+def generate_solution(state: dict, config: RunnableConfig = None) -> dict:
     """
     Generate a solution for the support ticket.
     
@@ -23,18 +28,34 @@ def generate_solution(state: dict, config: dict = None) -> dict:
     
     Returns:
         Dict with proposed_solution, needs_human flag, and status.
-        Falls back to escalation on LLM failure.
+        Falls back to escalation on LLM failure, or without calling the LLM
+        when the request deadline is too close.
     """
     # Extract stream queue from config if present
     stream_queue = None
     if config and "configurable" in config:
         stream_queue = config["configurable"].get("stream_queue")
 
-    # Format retrieved docs for the prompt
-    docs = state.get("retrieved_docs") or []
-    docs_text = "\n".join(
-        [f"- {doc.get('content', '')}" for doc in docs]
-    ) if docs else "No relevant knowledge found."
+    deadline = from_config(config)
+    if not has_time(deadline, settings.deadline_min_llm_ms / 1000):
+        logger.warning(f"Skipping solution generation for ticket {state['ticket_id']}: {deadline}")
+        return {
+            "proposed_solution": FALLBACK_SOLUTION.solution,
+            "needs_human": True,
+            "status": "waiting_human",
+            "error_message": append_error(state, "Solution generation skipped (deadline)")
+        }
+
+    # Fit retrieved docs to the prompt's context budget
+    docs_text, context_stats = assemble_context(
+        state.get("retrieved_docs") or [],
+        state["ticket_text"]
+    )
+    logger.info(
+        f"Ticket {state['ticket_id']} context: {context_stats['docs_used']}/"
+        f"{context_stats['docs_in']} docs, {context_stats['tokens_after']} tokens "
+        f"({context_stats['tokens_saved']} saved)"
+    )
 
     try:
         if stream_queue:
@@ -44,7 +65,7 @@ def generate_solution(state: dict, config: dict = None) -> dict:
                 intent=state.get("intent", "unknown"),
                 retrieved_docs=docs_text
             )
-            solution = invoke_llm_stream(prompt, stream_queue)
+            solution = invoke_llm_stream(prompt, stream_queue, deadline=deadline)
         else:
             # Non-streaming mode: Use JSON prompt for structured output
             prompt = SOLUTION_GENERATION_PROMPT.format(
@@ -52,7 +73,7 @@ def generate_solution(state: dict, config: dict = None) -> dict:
                 intent=state.get("intent", "unknown"),
                 retrieved_docs=docs_text
             )
-            result = invoke_llm_json(prompt, SolutionOutput)
+            result = invoke_llm_json(prompt, SolutionOutput, deadline=deadline)
             solution = result.solution
         
         # Determine if human review is needed based on confidence ONLY
@@ -73,5 +94,5 @@ def generate_solution(state: dict, config: dict = None) -> dict:
             "proposed_solution": FALLBACK_SOLUTION.solution,
             "needs_human": True,
             "status": "waiting_human",
-            "error_message": f"Solution generation failed: {e.message}"
+            "error_message": append_error(state, f"Solution generation failed: {e.message}")
         }
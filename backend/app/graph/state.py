@@ -17,6 +17,11 @@ class SupportState(TypedDict):
     # Required fields
     ticket_id: str
     ticket_text: str
+
+    # Follow-ups: the ticket's first message and its stored classification
+    original_ticket_text: Optional[str]
+    prior_intent: Optional[str]
+    prior_confidence: Optional[float]
     
     # Status tracking
     status: str  # processing, resolved, waiting_human, failed
@@ -38,3 +43,7 @@ class SupportState(TypedDict):
     
     # Retrieved context (for RAG)
     retrieved_docs: Optional[List[dict]]
+    
+    # Answer reuse: matching human-approved resolution, and what answered the ticket
+    reuse_candidate: Optional[dict]
+    answer_source: Optional[dict]
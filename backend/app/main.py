@@ -3,11 +3,19 @@ FastAPI application entry point.
 Configures the app, registers routes, and sets up error handling.
 """
 import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api.routes import tickets, feedback, health
+from app.api.middleware import AdmissionMiddleware, MetricsMiddleware, ProfilingMiddleware
+from app.api.routes import tickets, feedback, health, analytics, knowledge, metrics, admin
+from app.db.init_db import init_db
+from app.services.learner import start_learner, stop_learner
+from app.services import admission, lifecycle, profiling
+from app.services.metrics import mark_process_dead
+from app.services.warmup import start_warmup
 
 # Configure logging
 logging.basicConfig(
@@ -16,11 +24,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup and shutdown hooks."""
+    try:
+        init_db()
+    except Exception as e:
+        logger.error(f"Database initialization failed: {e}")
+    start_learner()
+    start_warmup()
+    lifecycle.install_signal_handlers()
+    lifecycle.start_recovery()
+    yield
+    lifecycle.drain()
+    stop_learner()
+    mark_process_dead()
+
+
 # Create app
 app = FastAPI(
     title="LangGraph Support Agent",
     description="AI-powered customer support agent using LangGraph",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -32,6 +59,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# On-demand request profiling (not installed unless configured)
+if profiling.enabled():
+    app.add_middleware(ProfilingMiddleware)
+
+# Load shedding for ticket routes (outside profiling: shed requests are not profiled)
+if admission.enabled():
+    app.add_middleware(AdmissionMiddleware)
+
+# Request latency metrics (outermost, so it sees every response)
+app.add_middleware(MetricsMiddleware)
+
 
 # Global exception handler
 @app.exception_handler(Exception)
@@ -53,6 +91,10 @@ async def global_exception_handler(request: Request, exc: Exception):
 app.include_router(health.router)
 app.include_router(tickets.router)
 app.include_router(feedback.router)
+app.include_router(analytics.router)
+app.include_router(knowledge.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
 
 
 # Root endpoint
@@ -0,0 +1,32 @@
+"""
+Analytics rollup database models.
+Pre-aggregated ticket counters per time bucket, maintained incrementally.
+"""
+from sqlalchemy import Column, String, DateTime, BigInteger, Float
+
+from app.db.base import Base
+
+
+class _RollupColumns:
+    """
+    Shared rollup layout.
+
+    Each row is one counter for a (bucket, metric, dimension) triple, e.g.
+    ("2024-05-01 10:42", "completed", "resolved") or ("...", "latency", "412").
+    """
+    bucket_start = Column(DateTime, primary_key=True)
+    metric = Column(String, primary_key=True)
+    dimension = Column(String, primary_key=True, default="")
+
+    count = Column(BigInteger, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0.0)
+
+
+class TicketRollupMinute(_RollupColumns, Base):
+    """Per-minute ticket rollups (used for range edges and short windows)."""
+    __tablename__ = "ticket_rollups_minute"
+
+
+class TicketRollupHour(_RollupColumns, Base):
+    """Per-hour ticket rollups (used for the aligned body of long windows)."""
+    __tablename__ = "ticket_rollups_hour"
@@ -0,0 +1,28 @@
+"""
+Answer reuse database model.
+Audit trail for tickets answered directly from a learned resolution.
+"""
+from datetime import datetime
+from sqlalchemy import Column, String, Float, DateTime
+
+from app.db.base import Base
+
+
+class AnswerReuse(Base):
+    """
+    One row per ticket answered with a human-approved resolution instead of
+    a fresh LLM answer.
+    """
+    __tablename__ = "answer_reuse"
+
+    id = Column(String, primary_key=True)
+    ticket_id = Column(String, index=True, nullable=False)
+
+    # Knowledge base document reused, and the ticket it was learned from
+    document_id = Column(String, index=True, nullable=False)
+    source_ticket_id = Column(String, nullable=True)
+
+    intent = Column(String, nullable=True)
+    similarity = Column(Float, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
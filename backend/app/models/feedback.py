@@ -1,9 +1,39 @@
-from sqlalchemy import Column, String, Text
+"""
+Feedback database model.
+Queues human feedback for the background learner.
+"""
+from datetime import datetime
+from sqlalchemy import Column, String, Text, Integer, DateTime
+
 from app.db.base import Base
 
+
 class Feedback(Base):
+    """
+    Human feedback on a ticket, persisted before it is learned.
+
+    Status values:
+    - pending: Waiting for the background learner
+    - learned: Added to the knowledge base
+    - failed: Gave up after max attempts (see last_error)
+    """
     __tablename__ = "feedback"
 
     id = Column(String, primary_key=True)
     ticket_id = Column(String, index=True)
     content = Column(Text)
+
+    # Snapshot of the ticket at feedback time (the learned document is built from these)
+    ticket_text = Column(Text, nullable=True)
+    final_response = Column(Text, nullable=True)
+    intent = Column(String, nullable=True)
+
+    # Learner bookkeeping
+    status = Column(String, default="pending", nullable=False, index=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime, nullable=True)
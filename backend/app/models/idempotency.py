@@ -0,0 +1,34 @@
+"""
+Idempotency key database model.
+Remembers ticket requests by client-supplied Idempotency-Key so retries are
+answered from the first run instead of creating and processing a new ticket.
+"""
+from datetime import datetime
+from sqlalchemy import Column, String, Text, DateTime
+
+from app.db.base import Base
+
+
+class IdempotencyKey(Base):
+    """
+    One row per (route, Idempotency-Key) until it expires.
+
+    Status values:
+    - in_progress: the first request is still running
+    - completed: response holds the result to replay
+    """
+    __tablename__ = "idempotency_keys"
+
+    # "<route>:<client key>", so the primary key index serves lookups
+    key = Column(String, primary_key=True)
+    route = Column(String, nullable=False)
+
+    # sha256 of the request body: a reused key with a different body is rejected
+    request_hash = Column(String, nullable=False)
+    ticket_id = Column(String, nullable=True)
+
+    status = Column(String, default="in_progress", nullable=False)
+    response = Column(Text, nullable=True)  # JSON
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, index=True, nullable=False)
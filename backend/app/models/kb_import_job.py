@@ -0,0 +1,31 @@
+"""
+Knowledge import job database model.
+Status of bulk imports queued through the API, readable from any worker.
+"""
+from datetime import datetime
+from sqlalchemy import Column, String, Text, Integer, DateTime
+
+from app.db.base import Base
+
+
+class KnowledgeImportJob(Base):
+    """
+    One row per POST /knowledge/import, deleted KB_IMPORT_JOB_TTL_S after it finishes.
+
+    Status values:
+    - queued: Waiting for the importing worker's job thread
+    - running: Articles are being chunked, embedded and written
+    - completed: stats holds the import counters
+    - failed: error holds the reason
+    """
+    __tablename__ = "kb_import_jobs"
+
+    id = Column(String, primary_key=True)
+    status = Column(String, default="queued", nullable=False)
+    articles = Column(Integer, nullable=False)
+    articles_done = Column(Integer, default=0, nullable=False)
+    stats = Column(Text, nullable=True)  # JSON
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, index=True, nullable=True)
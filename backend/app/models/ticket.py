@@ -36,3 +36,12 @@ class Ticket(Base):
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    # Idempotency-Key of the request running the ticket, so recovery can
+    # complete it if the process dies mid-run
+    idempotency_route = Column(String, nullable=True)
+    idempotency_key = Column(String, nullable=True)
+
+    # Refreshed while a long graph run is in progress, so the orphan sweep
+    # leaves the ticket alone (updated_at still marks when the run started)
+    heartbeat_at = Column(DateTime, nullable=True)
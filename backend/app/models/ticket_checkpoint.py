@@ -0,0 +1,37 @@
+"""
+Ticket checkpoint database model.
+Keeps the inputs of a graph run that did not finish (shutdown or crash) so
+the ticket can be processed again after a restart.
+"""
+from datetime import datetime
+from sqlalchemy import Column, String, Text, Integer, DateTime
+
+from app.db.base import Base
+
+
+class TicketCheckpoint(Base):
+    """
+    One row per ticket waiting to be re-run (ticket status "requeued").
+
+    Reason values:
+    - shutdown: the run was still in flight when the drain deadline passed
+    - orphaned: found in "processing" at startup, long after any run could
+      still be going (the process died without draining)
+    """
+    __tablename__ = "ticket_checkpoints"
+
+    ticket_id = Column(String, primary_key=True)
+
+    # The message being processed (differs from tickets.text for follow-ups)
+    ticket_text = Column(Text, nullable=False)
+    original_ticket_text = Column(Text, nullable=True)
+
+    # Idempotency-Key of the interrupted request, completed when the ticket is re-run
+    idempotency_route = Column(String, nullable=True)
+    idempotency_key = Column(String, nullable=True)
+
+    reason = Column(String, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -0,0 +1,18 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+
+class KnowledgeArticle(BaseModel):
+    text: str = Field(..., min_length=1)
+    id: Optional[str] = Field(None, description="Stable article id; re-importing it replaces its chunks")
+    title: Optional[str] = None
+    format: Literal["text", "markdown", "html"] = "text"
+    url: Optional[str] = None
+    intent: Optional[str] = None
+
+
+class KnowledgeImportRequest(BaseModel):
+    articles: List[KnowledgeArticle] = Field(..., min_length=1)
+    chunk_size: Optional[int] = Field(None, gt=100)
+    overlap: Optional[int] = Field(None, ge=0)
+    deduplicate: bool = False
@@ -2,8 +2,9 @@
 API response schemas.
 All API responses use these structured models.
 """
+from datetime import datetime
 from pydantic import BaseModel
-from typing import Optional, Any
+from typing import Optional, Any, Dict
 
 
 class HealthResponse(BaseModel):
@@ -12,6 +13,13 @@ class HealthResponse(BaseModel):
     service: str
 
 
+class ReadinessResponse(BaseModel):
+    """Readiness check response (startup warm-up progress)."""
+    status: str
+    duration_s: Optional[float] = None
+    steps: Dict[str, Dict[str, Any]] = {}
+
+
 class EscalationPayload(BaseModel):
     """Payload for escalated tickets requiring human review."""
     ticket_id: str
@@ -47,3 +55,32 @@ class FeedbackResponse(BaseModel):
     status: str
     ticket_id: str
     message: str
+
+
+class AnalyticsResponse(BaseModel):
+    """Ticket analytics aggregated over a time range."""
+    start: datetime
+    end: datetime
+    tickets_created: int
+    runs_completed: int
+    resolution_rate: Optional[float] = None
+    escalation_rate: Optional[float] = None
+    human_resolved: int
+    outcomes: Dict[str, int]
+    status_transitions: Dict[str, int]
+    intent_mix: Dict[str, int]
+    confidence_histogram: Dict[str, int]
+    mean_confidence: Optional[float] = None
+    latency_ms: Dict[str, Optional[float]]
+
+
+class KnowledgeImportResponse(BaseModel):
+    """Status of a bulk knowledge base import job."""
+    job_id: str
+    status: str  # queued, running, completed, failed
+    articles: int
+    articles_done: int
+    stats: Optional[Dict[str, int]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,212 @@
+"""
+Preforking server.
+
+`uvicorn --workers N` starts N independent interpreters, and each loads its
+own embedding model, index and graph. Here the master loads them once
+(warmup.preload), freezes the GC so the shared objects are never touched by
+collections (which would write to their pages and unshare them), then forks
+N uvicorn workers serving one shared socket. The workers share that memory
+copy-on-write.
+
+The master restarts workers that die, forwards SIGINT/SIGTERM for a graceful
+shutdown, and periodically reports RSS, PSS and USS for itself and every
+worker (log line and the worker_memory_bytes metric). PSS is the number to
+size a node by: shared pages are split between the processes mapping them.
+
+Prometheus multiprocess mode is required for one scrape to cover all workers;
+if PROMETHEUS_MULTIPROC_DIR is unset a temporary directory is used.
+
+Usage (from backend/):
+    python -m app.server --host 0.0.0.0 --port 8000 --workers 4
+"""
+import argparse
+import gc
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger("app.server")
+
+# Workers that die faster than this after starting are not respawned in a loop
+MIN_WORKER_LIFETIME = 5.0
+
+
+def _prepare_multiproc_dir() -> None:
+    """Point prometheus_client at an empty shared directory (before it is imported)."""
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+    else:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+
+
+def read_memory(pid: int) -> Optional[Dict[str, int]]:
+    """RSS, PSS and USS (private) bytes of a process, from /proc (Linux)."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                parts = value.split()
+                if len(parts) == 2 and parts[1] == "kB":
+                    fields[name] = int(parts[0]) * 1024
+    except OSError:
+        return None
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+class PreforkServer:
+    def __init__(self, app, sock: socket.socket, workers: int, log_level: str, report_interval: float):
+        self.app = app
+        self.sock = sock
+        self.n_workers = workers
+        self.log_level = log_level
+        self.report_interval = report_interval
+        self.workers: Dict[int, tuple] = {}  # pid -> (slot, started_at)
+        self.stopping = False
+
+    def _spawn(self, slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+            os._exit(0)
+        self.workers[pid] = (slot, time.monotonic())
+        logger.info(f"Started worker {slot} (pid {pid})")
+
+    def _run_worker(self) -> None:
+        import uvicorn
+
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        gc.enable()
+
+        config = uvicorn.Config(self.app, log_level=self.log_level)
+        try:
+            uvicorn.Server(config).run(sockets=[self.sock])
+        except Exception:
+            logger.exception("Worker crashed")
+            os._exit(1)
+
+    def _stop(self, signum, frame) -> None:
+        if not self.stopping:
+            logger.info(f"Received {signal.Signals(signum).name}, stopping workers")
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self) -> None:
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                return
+            if pid == 0:
+                return
+            slot, started_at = self.workers.pop(pid)
+            code = os.waitstatus_to_exitcode(status)
+            if self.stopping:
+                continue
+            logger.warning(f"Worker {slot} (pid {pid}) exited with {code}, restarting")
+            if time.monotonic() - started_at < MIN_WORKER_LIFETIME:
+                time.sleep(MIN_WORKER_LIFETIME)
+            self._spawn(slot)
+
+    def report_memory(self) -> None:
+        from app.services.metrics import WORKER_MEMORY
+
+        processes = [("master", os.getpid())] + [
+            (str(slot), pid) for pid, (slot, _) in sorted(self.workers.items(), key=lambda i: i[1][0])
+        ]
+        lines = []
+        for name, pid in processes:
+            memory = read_memory(pid)
+            if memory is None:
+                continue
+            for kind, value in memory.items():
+                WORKER_MEMORY.labels(worker=name, kind=kind).set(value)
+            lines.append(
+                f"{name}(pid {pid}) rss={memory['rss'] >> 20}MB "
+                f"pss={memory['pss'] >> 20}MB uss={memory['uss'] >> 20}MB"
+            )
+        if lines:
+            logger.info("Memory: " + ", ".join(lines))
+
+    def run(self) -> None:
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGTERM, self._stop)
+
+        for slot in range(1, self.n_workers + 1):
+            self._spawn(slot)
+
+        next_report = time.monotonic() + min(self.report_interval, 30.0)
+        while self.workers:
+            self._reap()
+            if not self.stopping and self.report_interval > 0 and time.monotonic() >= next_report:
+                self.report_memory()
+                next_report = time.monotonic() + self.report_interval
+            time.sleep(0.5)
+        logger.info("All workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="default: PREFORK_WORKERS")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--memory-report-interval", type=float, default=None,
+                        help="seconds (0 disables); default: PREFORK_MEMORY_REPORT_INTERVAL")
+    args = parser.parse_args()
+
+    _prepare_multiproc_dir()
+
+    # Objects created while preloading go straight to the frozen generation
+    gc.disable()
+
+    from app.config.settings import settings
+    from app.main import app  # also configures logging
+    from app.services.warmup import preload
+
+    sock = socket.socket(socket.AF_INET6 if ":" in args.host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(args.backlog)
+    sock.set_inheritable(True)
+
+    preload()
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Froze {gc.get_freeze_count()} objects; forking workers on {args.host}:{args.port}")
+
+    server = PreforkServer(
+        app,
+        sock,
+        workers=args.workers or settings.prefork_workers,
+        log_level=args.log_level,
+        report_interval=(
+            settings.prefork_memory_report_interval
+            if args.memory_report_interval is None else args.memory_report_interval
+        ),
+    )
+    server.run()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
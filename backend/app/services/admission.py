@@ -0,0 +1,293 @@
+"""
+Admission control for ticket work.
+
+Each POST /tickets/ and /tickets/stream request runs a graph, holding a
+threadpool thread or a background thread, LLM slots and memory until the
+graph finishes. When the LLM provider slows down, runs pile up. Without a
+limit the process ends up with unbounded threads and queues, and latency
+grows for every request.
+
+AdmissionMiddleware asks the controller before the route runs. A request
+is shed when:
+
+- the process is draining for shutdown (see lifecycle): 503
+- the client already has ADMISSION_CLIENT_MAX_INFLIGHT runs in flight on
+  this route: 429
+- the oldest admitted run on the route has waited ADMISSION_MAX_QUEUE_MS
+  without starting (threadpool or thread start-up backlog): 503. Requests
+  that will not start a run (idempotent replays, which may wait for the
+  first request) say so with no_graph_run() and are not counted.
+- the route has its ADMISSION_*_MAX_INFLIGHT runs in flight and none
+  finishes within ADMISSION_DEFER_MS: 503
+
+Every rejection carries Retry-After. The value is estimated from recent
+run durations.
+
+The lease taken on admission is held until the request's graph run has
+finished. For streams that is the background thread, which may outlive
+the response. Budgets are per process and per route; the client key is
+the X-Client-Id header, or the peer address without it.
+"""
+import asyncio
+import contextvars
+import logging
+import math
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from app.config.settings import settings
+from app.services import lifecycle
+from app.services.metrics import ADMISSION_QUEUE_LATENCY, ADMISSION_REJECTED, GRAPH_RUNS_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+CLIENT_HEADER = "x-client-id"
+
+# POST paths under admission control -> route budget name
+ROUTES = {
+    "/tickets/": "tickets",
+    "/tickets/stream": "tickets_stream",
+}
+
+MAX_RETRY_AFTER = 60
+# Assumed run duration until one has been measured (seconds)
+DEFAULT_RUN_DURATION = 5.0
+# Weight of the newest sample in the run duration average
+DURATION_ALPHA = 0.2
+DEFER_POLL_INTERVAL = 0.05
+# While draining: long enough for the load balancer to see /health/ready fail
+SHUTDOWN_RETRY_AFTER = 5
+
+_lease: contextvars.ContextVar[Optional["Lease"]] = contextvars.ContextVar("admission_lease", default=None)
+
+
+class Rejection(NamedTuple):
+    status_code: int
+    reason: str  # shutting_down | client | queue_latency | capacity
+    retry_after: int
+    detail: str
+
+
+class Lease:
+    """
+    An admitted request's claim on its route and client budgets.
+
+    Starts with one reference, held by the middleware for the response;
+    background runs take another with hold(). The budget is returned
+    when the last reference is released.
+    """
+
+    def __init__(self, controller: "AdmissionController", route: str, client: str, arrived_at: float):
+        self.controller = controller
+        self.route = route
+        self.client = client
+        self.arrived_at = arrived_at
+        self.started_at: Optional[float] = None
+        self.refs = 1
+
+    def start(self) -> None:
+        """Mark the graph run as started (records queue latency once)."""
+        self.controller._start(self)
+
+    def no_run(self) -> None:
+        """Mark that this request will not start a graph run; it stops counting as queued."""
+        self.controller._no_run(self)
+
+    def hold(self) -> None:
+        self.controller._hold(self)
+
+    def release(self) -> None:
+        self.controller._release(self)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        budgets: Dict[str, int],
+        client_max_inflight: int,
+        max_queue_ms: float,
+        defer_ms: float
+    ):
+        self.budgets = budgets  # route -> max in-flight runs (0: unlimited)
+        self.client_max_inflight = client_max_inflight
+        self.max_queue = max_queue_ms / 1000
+        self.defer = defer_ms / 1000
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, int] = {route: 0 for route in budgets}
+        self._clients: Dict[Tuple[str, str], int] = {}
+        self._waiting: Dict[str, Dict[int, Lease]] = {route: {} for route in budgets}
+        self._run_duration: Dict[str, float] = {route: DEFAULT_RUN_DURATION for route in budgets}
+
+    # -- admission ------------------------------------------------------------
+
+    def _retry_after(self, route: str, running: int) -> int:
+        """Seconds until one of `running` runs is expected to free its slot."""
+        estimate = self._run_duration[route] / max(running, 1)
+        return min(max(math.ceil(estimate), 1), MAX_RETRY_AFTER)
+
+    def try_admit(self, route: str, client: str, arrived_at: Optional[float] = None):
+        """
+        Admit a request now or say why not.
+
+        Returns:
+            (Lease, None) if admitted, otherwise (None, Rejection)
+        """
+        if lifecycle.is_draining():
+            return None, Rejection(503, "shutting_down", SHUTDOWN_RETRY_AFTER, "Server is shutting down")
+
+        now = time.monotonic()
+        with self._lock:
+            client_running = self._clients.get((route, client), 0)
+            if self.client_max_inflight and client_running >= self.client_max_inflight:
+                return None, Rejection(
+                    429, "client", self._retry_after(route, client_running),
+                    "Too many ticket requests in flight for this client"
+                )
+
+            waiting = self._waiting[route]
+            if self.max_queue and waiting:
+                oldest = min(lease.arrived_at for lease in waiting.values())
+                if now - oldest > self.max_queue:
+                    return None, Rejection(
+                        503, "queue_latency", min(max(math.ceil(now - oldest), 1), MAX_RETRY_AFTER),
+                        "Ticket processing is backlogged"
+                    )
+
+            running = self._inflight[route]
+            limit = self.budgets[route]
+            if limit and running >= limit:
+                return None, Rejection(
+                    503, "capacity", self._retry_after(route, running),
+                    "Ticket processing is at capacity"
+                )
+
+            lease = Lease(self, route, client, arrived_at or now)
+            self._inflight[route] = running + 1
+            self._clients[(route, client)] = client_running + 1
+            waiting[id(lease)] = lease
+        GRAPH_RUNS_IN_FLIGHT.labels(route=route).inc()
+        return lease, None
+
+    async def admit(self, route: str, client: str):
+        """
+        Admit a request, deferring it up to ADMISSION_DEFER_MS while the
+        route is at capacity. Returns (Lease, None) or (None, Rejection).
+        """
+        arrived_at = time.monotonic()
+        while True:
+            lease, rejection = self.try_admit(route, client, arrived_at)
+            if lease is not None:
+                return lease, None
+            if rejection.reason != "capacity" or time.monotonic() - arrived_at >= self.defer:
+                ADMISSION_REJECTED.labels(route=route, reason=rejection.reason).inc()
+                logger.warning(
+                    f"Rejected {route} request from {client}: {rejection.reason} "
+                    f"(retry after {rejection.retry_after}s)"
+                )
+                return None, rejection
+            await asyncio.sleep(DEFER_POLL_INTERVAL)
+
+    # -- lease lifecycle ------------------------------------------------------
+
+    def _start(self, lease: Lease) -> None:
+        with self._lock:
+            if lease.started_at is not None:
+                return
+            lease.started_at = time.monotonic()
+            self._waiting[lease.route].pop(id(lease), None)
+        ADMISSION_QUEUE_LATENCY.labels(route=lease.route).observe(lease.started_at - lease.arrived_at)
+
+    def _no_run(self, lease: Lease) -> None:
+        with self._lock:
+            self._waiting[lease.route].pop(id(lease), None)
+
+    def _hold(self, lease: Lease) -> None:
+        with self._lock:
+            lease.refs += 1
+
+    def _release(self, lease: Lease) -> None:
+        with self._lock:
+            lease.refs -= 1
+            if lease.refs > 0:
+                return
+            route, key = lease.route, (lease.route, lease.client)
+            self._inflight[route] -= 1
+            self._clients[key] -= 1
+            if not self._clients[key]:
+                del self._clients[key]
+            self._waiting[route].pop(id(lease), None)
+            if lease.started_at is not None:
+                duration = time.monotonic() - lease.started_at
+                self._run_duration[route] += DURATION_ALPHA * (duration - self._run_duration[route])
+        GRAPH_RUNS_IN_FLIGHT.labels(route=route).dec()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                route: {
+                    "in_flight": self._inflight[route],
+                    "limit": self.budgets[route],
+                    "waiting": len(self._waiting[route]),
+                    "run_duration_s": round(self._run_duration[route], 3),
+                }
+                for route in self.budgets
+            }
+
+
+controller = AdmissionController(
+    budgets={
+        "tickets": settings.admission_tickets_max_inflight,
+        "tickets_stream": settings.admission_stream_max_inflight,
+    },
+    client_max_inflight=settings.admission_client_max_inflight,
+    max_queue_ms=settings.admission_max_queue_ms,
+    defer_ms=settings.admission_defer_ms,
+)
+
+
+def enabled() -> bool:
+    return settings.admission_enabled
+
+
+def route_for(method: str, path: str) -> Optional[str]:
+    """The budget a request counts against, or None if it is not admission-controlled."""
+    return ROUTES.get(path) if method == "POST" else None
+
+
+def bind(lease: Lease) -> contextvars.Token:
+    """Make the lease visible to the route (and threads copying its context)."""
+    return _lease.set(lease)
+
+
+def unbind(token: contextvars.Token) -> None:
+    _lease.reset(token)
+
+
+def current() -> Optional[Lease]:
+    return _lease.get()
+
+
+def graph_started() -> None:
+    """Record that the current request's graph run is starting."""
+    lease = current()
+    if lease is not None:
+        lease.start()
+
+
+def no_graph_run() -> None:
+    """Record that the current request will not start a graph run (e.g. an idempotent replay)."""
+    lease = current()
+    if lease is not None:
+        lease.no_run()
+
+
+def hold() -> Optional[Lease]:
+    """
+    Keep the current request's budget until the returned lease is released,
+    for graph runs that outlive the response (streams).
+    """
+    lease = current()
+    if lease is not None:
+        lease.hold()
+    return lease
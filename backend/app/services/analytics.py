@@ -0,0 +1,291 @@
+"""
+Analytics service.
+Maintains per-minute and per-hour ticket rollups incrementally and answers
+time-range queries from them instead of scanning the tickets table.
+
+Rollups are updated in the same transaction as the ticket change that caused
+them, via a before_flush hook on SessionLocal, so every code path that moves a
+ticket between statuses is counted exactly once.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.analytics import TicketRollupMinute, TicketRollupHour
+from app.models.ticket import Ticket
+from app.utils.sketch import LatencySketch, bucket_index
+
+logger = logging.getLogger(__name__)
+
+# Statuses that end a processing run
+TERMINAL_STATUSES = ("resolved", "waiting_human", "failed", "dismissed")
+
+CONFIDENCE_BINS = 10
+
+LATENCY_PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+RollupKey = Tuple[datetime, str, str]
+
+
+def _floor_minute(ts: datetime) -> datetime:
+    return ts.replace(second=0, microsecond=0)
+
+
+def _floor_hour(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(ts: datetime) -> datetime:
+    floored = _floor_hour(ts)
+    return floored if floored == ts else floored + timedelta(hours=1)
+
+
+def _confidence_bin(confidence: float | None) -> str:
+    if confidence is None:
+        return "none"
+    index = min(int(confidence * CONFIDENCE_BINS), CONFIDENCE_BINS - 1)
+    return str(max(index, 0))
+
+
+# =============================================================================
+# Incremental maintenance
+# =============================================================================
+
+@event.listens_for(Ticket.status, "set", active_history=True)
+def _load_previous_status(target, value, oldvalue, initiator):
+    """
+    No-op listener registered only for active_history.
+
+    Routes often assign status on an expired instance (right after a commit);
+    active_history makes SQLAlchemy load the committed row first, so
+    before_flush sees the real previous status and updated_at.
+    """
+    return value
+
+
+def _ticket_deltas(session: Session) -> Dict[RollupKey, List[float]]:
+    """
+    Compute rollup increments for pending ticket changes.
+
+    Returns:
+        Mapping of (minute_bucket, metric, dimension) -> [count, total].
+    """
+    now = datetime.utcnow()
+    minute = _floor_minute(now)
+    deltas: Dict[RollupKey, List[float]] = defaultdict(lambda: [0, 0.0])
+
+    def bump(metric: str, dimension: str = "", total: float = 0.0):
+        delta = deltas[(minute, metric, dimension)]
+        delta[0] += 1
+        delta[1] += total
+
+    for obj in session.new:
+        if isinstance(obj, Ticket):
+            bump("created")
+            if obj.status:
+                bump("status", obj.status)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Ticket):
+            continue
+        history = inspect(obj).attrs.status.history
+        if not history.added:
+            continue
+        new_status = history.added[0]
+        old_status = history.deleted[0] if history.deleted else None
+        if new_status == old_status:
+            continue
+
+        bump("status", new_status)
+
+        if old_status == "processing" and new_status in TERMINAL_STATUSES:
+            # One completed run: attribute its outcome, intent and confidence
+            bump("completed", new_status)
+            bump("intent", obj.intent or "unknown")
+            bump("confidence", _confidence_bin(obj.confidence))
+            if obj.confidence is not None:
+                bump("confidence_sum", total=obj.confidence)
+
+            # updated_at still holds the commit that moved it to processing
+            started = inspect(obj).attrs.updated_at.loaded_value
+            if isinstance(started, datetime):
+                latency_ms = max((now - started).total_seconds() * 1000, 0.0)
+                bump("latency", str(bucket_index(latency_ms)))
+        elif old_status == "waiting_human" and new_status == "resolved":
+            bump("human_resolved")
+
+    return deltas
+
+
+def _upsert_rows(session: Session, model, rows: List[dict]) -> None:
+    """Add counts to rollup rows, creating them if needed."""
+    table = model.__table__
+    dialect = session.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        insert = None
+
+    if insert is not None:
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["bucket_start", "metric", "dimension"],
+            set_={
+                "count": table.c.count + stmt.excluded.count,
+                "total": table.c.total + stmt.excluded.total,
+            }
+        )
+        session.execute(stmt)
+        return
+
+    # Portable fallback (not atomic across concurrent writers)
+    for row in rows:
+        existing = session.get(model, (row["bucket_start"], row["metric"], row["dimension"]))
+        if existing is None:
+            session.execute(table.insert().values(**row))
+        else:
+            session.execute(
+                table.update()
+                .where(table.c.bucket_start == row["bucket_start"])
+                .where(table.c.metric == row["metric"])
+                .where(table.c.dimension == row["dimension"])
+                .values(count=table.c.count + row["count"], total=table.c.total + row["total"])
+            )
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _update_rollups(session: Session, flush_context, instances) -> None:
+    """Apply rollup increments in the same transaction as the ticket change."""
+    deltas = _ticket_deltas(session)
+    if not deltas:
+        return
+
+    minute_rows = []
+    hour_rows: Dict[RollupKey, List[float]] = defaultdict(lambda: [0, 0.0])
+    for (bucket, metric, dimension), (count, total) in deltas.items():
+        minute_rows.append({
+            "bucket_start": bucket, "metric": metric, "dimension": dimension,
+            "count": count, "total": total
+        })
+        hour = hour_rows[(_floor_hour(bucket), metric, dimension)]
+        hour[0] += count
+        hour[1] += total
+
+    # Analytics must never block ticket updates. The upserts run in a
+    # savepoint so a failure (which aborts the whole transaction on
+    # PostgreSQL) rolls back only the rollups. The savepoint is taken on the
+    # connection: Session.begin_nested() would flush, which is not allowed
+    # from inside a flush hook.
+    try:
+        with session.connection().begin_nested():
+            _upsert_rows(session, TicketRollupMinute, minute_rows)
+            _upsert_rows(session, TicketRollupHour, [
+                {"bucket_start": b, "metric": m, "dimension": d, "count": c, "total": t}
+                for (b, m, d), (c, t) in hour_rows.items()
+            ])
+    except Exception as e:
+        logger.error(f"Failed to update analytics rollups: {e}")
+
+
+# =============================================================================
+# Queries
+# =============================================================================
+
+def _sum_range(db: Session, model, start: datetime, end: datetime) -> Iterable[tuple]:
+    if start >= end:
+        return []
+    return db.execute(
+        select(model.metric, model.dimension, func.sum(model.count), func.sum(model.total))
+        .where(model.bucket_start >= start)
+        .where(model.bucket_start < end)
+        .group_by(model.metric, model.dimension)
+    ).all()
+
+
+def _collect(db: Session, start: datetime, end: datetime) -> Dict[Tuple[str, str], List[float]]:
+    """
+    Sum rollups over [start, end).
+
+    The hour-aligned body of the range is read from the hourly table and only
+    the ragged edges from the minute table, so the number of rows read is
+    bounded by the window length, not by ticket volume.
+    """
+    start = _floor_minute(start)
+    end = _floor_minute(end)
+    body_start, body_end = _ceil_hour(start), _floor_hour(end)
+
+    if body_start < body_end:
+        parts = [
+            _sum_range(db, TicketRollupHour, body_start, body_end),
+            _sum_range(db, TicketRollupMinute, start, body_start),
+            _sum_range(db, TicketRollupMinute, body_end, end),
+        ]
+    else:
+        parts = [_sum_range(db, TicketRollupMinute, start, end)]
+
+    totals: Dict[Tuple[str, str], List[float]] = defaultdict(lambda: [0, 0.0])
+    for rows in parts:
+        for metric, dimension, count, total in rows:
+            entry = totals[(metric, dimension)]
+            entry[0] += int(count or 0)
+            entry[1] += float(total or 0.0)
+    return totals
+
+
+def _rate(numerator: int, denominator: int) -> float | None:
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def get_analytics(db: Session, start: datetime, end: datetime) -> dict:
+    """
+    Build the analytics summary for a time range.
+
+    Returns:
+        Dict matching AnalyticsResponse schema.
+    """
+    totals = _collect(db, start, end)
+
+    def by_dimension(metric: str) -> Dict[str, int]:
+        return {
+            dimension: int(count)
+            for (m, dimension), (count, _) in totals.items()
+            if m == metric and count
+        }
+
+    completed = by_dimension("completed")
+    completed_total = sum(completed.values())
+    confidence_sum = totals.get(("confidence_sum", ""), [0, 0.0])
+
+    sketch = LatencySketch.from_buckets(
+        (int(dimension), count) for dimension, count in by_dimension("latency").items()
+    )
+    latency_ms = {
+        f"p{int(q * 100)}": (round(value, 1) if (value := sketch.quantile(q)) is not None else None)
+        for q in LATENCY_PERCENTILES
+    }
+
+    return {
+        "start": start,
+        "end": end,
+        "tickets_created": int(totals.get(("created", ""), [0])[0]),
+        "runs_completed": completed_total,
+        "resolution_rate": _rate(completed.get("resolved", 0), completed_total),
+        "escalation_rate": _rate(completed.get("waiting_human", 0), completed_total),
+        "human_resolved": int(totals.get(("human_resolved", ""), [0])[0]),
+        "outcomes": completed,
+        "status_transitions": by_dimension("status"),
+        "intent_mix": by_dimension("intent"),
+        "confidence_histogram": by_dimension("confidence"),
+        "mean_confidence": (
+            round(confidence_sum[1] / confidence_sum[0], 4) if confidence_sum[0] else None
+        ),
+        "latency_ms": latency_ms,
+    }
@@ -0,0 +1,283 @@
+"""
+Approximate nearest neighbour index selection for the knowledge base.
+
+Supported index types (FAISS, L2 distance):
+- flat:     exact search, cost linear in corpus size
+- ivf_flat: inverted file over k-means cells, full vectors
+- hnsw:     graph index; fast and accurate but memory-heavy, no deletes
+            (callers exclude removed positions at search time instead)
+- ivf_pq:   inverted file with product-quantized (compressed) vectors
+
+"auto" picks flat -> ivf_flat -> ivf_pq as the corpus grows. Trained
+(IVF) indexes record the mean distance of their training vectors to the
+nearest centroid; when newly added vectors sit much further from the
+centroids than that baseline, the index is retrained.
+
+This module has no settings dependency so benchmarks can import it directly.
+"""
+import math
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# FAISS guidance: ~39 training points per centroid / PQ code
+MIN_POINTS_PER_CENTROID = 39
+PQ_NBITS = 8
+
+
+def choose_index_type(
+    n_vectors: int,
+    configured: str = "auto",
+    flat_max: int = 20000,
+    ivf_flat_max: int = 1000000
+) -> str:
+    """Resolve the index type for a corpus of n_vectors."""
+    if configured != "auto":
+        if configured not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type: {configured}")
+        return configured
+    if n_vectors <= flat_max:
+        return "flat"
+    if n_vectors <= ivf_flat_max:
+        return "ivf_flat"
+    return "ivf_pq"
+
+
+def buildable_index_type(n_vectors: int, index_type: str) -> str:
+    """Downgrade trained index types when there is too little data to train them."""
+    if index_type == "ivf_pq" and n_vectors < (1 << PQ_NBITS) * MIN_POINTS_PER_CENTROID:
+        index_type = "ivf_flat"
+    if index_type == "ivf_flat" and n_vectors < MIN_POINTS_PER_CENTROID * 4:
+        index_type = "flat"
+    return index_type
+
+
+def index_type_of(index) -> str:
+    """Identify which of INDEX_TYPES a FAISS index is."""
+    import faiss
+
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    ivf = _extract_ivf(index)
+    if ivf is not None:
+        return "ivf_pq" if isinstance(ivf, faiss.IndexIVFPQ) else "ivf_flat"
+    return "flat"
+
+
+def _extract_ivf(index):
+    import faiss
+    try:
+        return faiss.downcast_index(faiss.extract_index_ivf(index))
+    except RuntimeError:
+        return None
+
+
+def _nlist_for(n_vectors: int) -> int:
+    """Number of IVF cells: ~4*sqrt(n), bounded by available training data."""
+    nlist = int(4 * math.sqrt(max(n_vectors, 1)))
+    nlist = min(nlist, max(n_vectors // MIN_POINTS_PER_CENTROID, 1))
+    return max(min(nlist, 65536), 1)
+
+
+def _pq_m_for(dim: int, requested: int) -> int:
+    """Largest sub-quantizer count <= requested that divides dim."""
+    m = max(min(requested, dim), 1)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def build_index(
+    vectors,
+    index_type: str,
+    hnsw_m: int = 32,
+    pq_m: int = 48,
+    train_sample: int = 100000,
+    seed: int = 1234
+):
+    """
+    Build and populate a FAISS index.
+
+    Args:
+        vectors: float32 array of shape (n, dim); row i gets id i.
+        index_type: One of INDEX_TYPES.
+
+    Returns:
+        Populated index. Falls back to flat when there is too little data
+        to train the requested type.
+    """
+    import faiss
+    import numpy as np
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+
+    index_type = buildable_index_type(n, index_type)
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+    else:
+        nlist = _nlist_for(n)
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_m_for(dim, pq_m), PQ_NBITS)
+
+        sample = vectors
+        if n > train_sample:
+            rng = np.random.default_rng(seed)
+            sample = vectors[rng.choice(n, train_sample, replace=False)]
+        index.train(sample)
+
+    if n:
+        index.add(vectors)
+    return index
+
+
+def configure_search(index, nprobe: int = 16, hnsw_ef_search: int = 64) -> None:
+    """Apply query-time parameters (safe to call on any index type)."""
+    import faiss
+
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = hnsw_ef_search
+        return
+    ivf = _extract_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+
+
+def search(
+    index,
+    queries,
+    k: int,
+    positions=None,
+    exclude=None,
+    nprobe: int = 16,
+    hnsw_ef_search: int = 64
+):
+    """
+    k-NN search, optionally restricted to a subset of positions.
+
+    The restriction is a pre-filter (FAISS IDSelector): non-member vectors are
+    skipped during the scan instead of being fetched and discarded, so k is
+    not wasted and distance work scales with the subset. `exclude` is the
+    inverse filter, applied when no `positions` are given.
+
+    Returns:
+        (distances, positions) arrays of shape (n_queries, k); -1 marks empty slots.
+    """
+    import faiss
+    import numpy as np
+
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    if positions is not None:
+        members = np.ascontiguousarray(positions, dtype=np.int64)
+        batch = faiss.IDSelectorBatch(members.size, faiss.swig_ptr(members))
+        selector = batch
+    elif exclude is not None and len(exclude):
+        members = np.ascontiguousarray(exclude, dtype=np.int64)
+        batch = faiss.IDSelectorBatch(members.size, faiss.swig_ptr(members))
+        selector = faiss.IDSelectorNot(batch)
+    else:
+        return index.search(queries, k)
+
+    if isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=hnsw_ef_search)
+    elif (ivf := _extract_ivf(index)) is not None:
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=min(nprobe, ivf.nlist))
+    else:
+        params = faiss.SearchParameters(sel=selector)
+
+    # `members` and `batch` must outlive the search: selectors only hold pointers
+    result = index.search(queries, k, params=params)
+    del members, batch
+    return result
+
+
+def remove_positions(index, positions) -> dict:
+    """
+    Remove vectors from an IVF index in place, keeping positions contiguous.
+
+    The highest surviving vectors are moved into the freed positions, so the
+    index keeps ids 0..ntotal-1 (as LangChain's id mapping requires) without
+    retraining. Moved ivf_pq vectors are re-encoded from their approximate
+    reconstruction.
+
+    Returns:
+        {old_position: new_position} for every moved vector.
+    """
+    import faiss
+    import numpy as np
+
+    ivf = _extract_ivf(index)
+    if ivf is None:
+        raise ValueError("Only IVF indexes support in-place removal")
+
+    n = ivf.ntotal
+    removed = np.unique(np.asarray(positions, dtype=np.int64))
+    if not removed.size:
+        return {}
+
+    remaining = n - removed.size
+    holes = removed[removed < remaining]
+    movers = np.setdiff1d(np.arange(remaining, n, dtype=np.int64), removed)
+
+    # remove_ids and reconstruct need an id -> list map on IVF indexes
+    ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+    try:
+        vectors = ivf.reconstruct_batch(movers) if movers.size else None
+        ivf.remove_ids(np.concatenate([removed, movers]))
+        if movers.size:
+            ivf.add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32), holes)
+    finally:
+        ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+    return dict(zip(movers.tolist(), holes.tolist()))
+
+
+def centroid_distance(index, vectors) -> Optional[float]:
+    """
+    Mean squared L2 distance from vectors to their nearest IVF centroid.
+
+    Returns:
+        None for untrained index types.
+    """
+    import numpy as np
+
+    ivf = _extract_ivf(index)
+    if ivf is None or len(vectors) == 0:
+        return None
+    distances, _ = ivf.quantizer.search(np.ascontiguousarray(vectors, dtype=np.float32), 1)
+    return float(distances.mean())
+
+
+def reconstruct(index, positions):
+    """
+    Stored vectors for the given positions (exact for flat/hnsw/ivf_flat,
+    approximate for ivf_pq).
+    """
+    import numpy as np
+
+    ivf = _extract_ivf(index)
+    if ivf is not None and ivf.direct_map.type == 0:
+        # NoMap: IVF needs an id -> list map before it can reconstruct
+        ivf.make_direct_map()
+
+    keys = np.asarray(positions, dtype=np.int64)
+    if hasattr(index, "reconstruct_batch"):
+        return index.reconstruct_batch(keys)
+    return np.vstack([index.reconstruct(int(key)) for key in keys])
+
+
+def bytes_per_vector(index) -> float:
+    """Serialized index size divided by vector count."""
+    import faiss
+
+    if index.ntotal == 0:
+        return 0.0
+    return len(faiss.serialize_index(index)) / index.ntotal
@@ -0,0 +1,102 @@
+"""
+Direct reuse of human-approved resolutions.
+
+When a learned document (source: human_feedback) describes the same issue as
+a new ticket, with the same intent and embedding similarity above a strict
+threshold, its resolution is returned as the answer instead of generating a
+fresh one. Every reuse is recorded in the answer_reuse table for audit.
+"""
+import re
+import uuid
+import logging
+from typing import List, Optional
+
+from app.config.settings import settings
+from app.db.session import SessionLocal
+from app.models.answer_reuse import AnswerReuse
+from app.services.deadline import Deadline, apply_statement_timeout, bound
+from app.services.dedup import cosine
+from app.services.feedback_documents import parse_feedback_document
+from app.services.vectorstore import get_embedding
+
+logger = logging.getLogger(__name__)
+
+# Roughly word-sized pieces, like a model's token stream
+_STREAM_CHUNK = re.compile(r"\S+\s*|\s+")
+
+
+def find_reusable_answer(
+    ticket_text: str,
+    intent: Optional[str],
+    docs: List[dict],
+    deadline: Optional[Deadline] = None
+) -> Optional[dict]:
+    """
+    Best learned resolution that can answer this ticket as-is.
+
+    Compares the ticket with each learned document's original issue text
+    (not the whole document, whose resolution and notes dilute similarity).
+
+    Returns:
+        {document_id, source_ticket_id, intent, similarity, resolution}, or None.
+    """
+    if not settings.answer_reuse_enabled or not intent or not docs:
+        return None
+
+    candidates = []
+    for doc in docs:
+        metadata = doc.get("metadata") or {}
+        if metadata.get("source") != "human_feedback" or metadata.get("intent") != intent:
+            continue
+        parsed = parse_feedback_document(doc.get("content") or "")
+        if parsed and parsed["resolution"].strip():
+            candidates.append((doc, parsed))
+    if not candidates:
+        return None
+
+    embedding = get_embedding()
+    with bound(deadline):
+        ticket_vector = embedding.embed_query(ticket_text)
+    issue_vectors = embedding.embed_documents([parsed["issue"] for _, parsed in candidates])
+
+    best = None
+    for (doc, parsed), vector in zip(candidates, issue_vectors):
+        similarity = cosine(ticket_vector, vector)
+        if similarity >= settings.answer_reuse_min_similarity and (
+            best is None or similarity > best["similarity"]
+        ):
+            best = {
+                "document_id": doc.get("id"),
+                "source_ticket_id": doc["metadata"].get("ticket_id"),
+                "intent": intent,
+                "similarity": round(similarity, 4),
+                "resolution": parsed["resolution"].strip(),
+            }
+    return best
+
+
+def stream_answer(text: str, stream_queue) -> None:
+    """Push a ready answer to the SSE queue in word-sized chunks."""
+    for chunk in _STREAM_CHUNK.findall(text):
+        stream_queue.put(chunk)
+
+
+def record_answer_reuse(ticket_id: str, reuse: dict, deadline: Optional[Deadline] = None) -> None:
+    """Write the audit row for a reused answer. Failures are logged, not raised."""
+    db = SessionLocal()
+    try:
+        apply_statement_timeout(db, deadline)
+        db.add(AnswerReuse(
+            id=str(uuid.uuid4()),
+            ticket_id=ticket_id,
+            document_id=reuse["document_id"],
+            source_ticket_id=reuse.get("source_ticket_id"),
+            intent=reuse.get("intent"),
+            similarity=reuse["similarity"]
+        ))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to record answer reuse for ticket {ticket_id}: {e}")
+    finally:
+        db.close()
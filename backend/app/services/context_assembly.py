@@ -0,0 +1,208 @@
+"""
+Context assembly for solution prompts.
+
+Retrieved documents are passed to the LLM through a token budget instead of
+being joined whole. Learned documents carry full previous solutions and
+agent notes, so without a budget prompt size (and latency and cost) grows
+with knowledge base verbosity.
+
+Steps:
+1. Score each document: retrieval rank plus term overlap with the ticket.
+2. Drop near-duplicate documents, repeated paragraphs and the Issue field
+   of learned feedback documents when it only restates the ticket.
+3. Truncate each passage to a per-passage cap at a sentence boundary.
+4. Fill the budget best-first and emit passages in score order.
+
+Token counts use tiktoken's cl100k_base when it is available locally and a
+character-based estimate otherwise.
+"""
+import logging
+import re
+import threading
+from typing import List, Optional
+
+from app.config.settings import settings
+from app.services.dedup import hamming, simhash
+from app.services.feedback_documents import parse_feedback_document
+from app.services.lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+NO_KNOWLEDGE = "No relevant knowledge found."
+
+# Passages shorter than this after truncation are not worth including
+MIN_PASSAGE_TOKENS = 24
+
+# SimHash distance at or below which two passages count as duplicates
+DUPLICATE_DISTANCE = 3
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """tiktoken encoding, or None if tiktoken or its BPE file is unavailable."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    logger.info(f"tiktoken unavailable ({type(e).__name__}), estimating tokens")
+                _encoding_loaded = True
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count of text for budgeting (exact with tiktoken, ~4 chars/token otherwise)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, (len(text) + 3) // 4)
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Longest prefix within max_tokens, cut at a sentence (else word) boundary."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    kept = ""
+    for sentence in _SENTENCE_END.split(text):
+        candidate = f"{kept} {sentence}" if kept else sentence
+        if estimate_tokens(candidate) > max_tokens:
+            break
+        kept = candidate
+    if not kept:
+        words = text.split()
+        # Binary search the word count that fits
+        lo, hi = 0, len(words)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if estimate_tokens(" ".join(words[:mid])) <= max_tokens:
+                lo = mid
+            else:
+                hi = mid - 1
+        kept = " ".join(words[:lo])
+    return f"{kept} ..." if kept else ""
+
+
+def _score(rank: int, content: str, ticket_terms: set) -> float:
+    """Retrieval rank blended with the share of ticket terms the passage covers."""
+    rank_score = 1.0 / (1 + rank)
+    if not ticket_terms:
+        return rank_score
+    overlap = len(ticket_terms & set(tokenize(content))) / len(ticket_terms)
+    return 0.5 * rank_score + 0.5 * overlap
+
+
+def _repeats_ticket(paragraph: str, ticket_terms: set) -> bool:
+    """True if the paragraph only restates the ticket. Allows one extra term for a label."""
+    terms = set(tokenize(paragraph))
+    return len(terms) >= 3 and len(terms - ticket_terms) <= 1
+
+
+def _sections(content: str, ticket_terms: set) -> List[str]:
+    """
+    A document's paragraphs, minus any known to restate the ticket.
+
+    Only the Issue field of a learned feedback document is checked, and
+    dropped when it restates the ticket (already in the prompt). Resolutions
+    and other documents are always kept, however many words they share
+    with the ticket: "Reset your password." answers "How do I reset my
+    password?".
+    """
+    parsed = parse_feedback_document(content)
+    if parsed is None:
+        return re.split(r"\n\s*\n", content)
+    issue = f"Issue: {parsed['issue']}"
+    return ([] if _repeats_ticket(issue, ticket_terms) else [issue]) + [
+        f"Resolution: {parsed['resolution']}",
+        f"Agent Notes: {parsed['notes']}",
+    ]
+
+
+def _is_duplicate(fingerprint: int, seen: List[int]) -> bool:
+    return any(hamming(fingerprint, other) <= DUPLICATE_DISTANCE for other in seen)
+
+
+def assemble_context(
+    docs: List[dict],
+    ticket_text: str,
+    budget_tokens: Optional[int] = None,
+    passage_max_tokens: Optional[int] = None
+) -> tuple[str, dict]:
+    """
+    Build the "Relevant Knowledge" section of the solution prompt.
+
+    Args:
+        docs: Retrieved documents ({"content", "metadata"}), best first.
+
+    Returns:
+        (docs_text, stats) where stats has docs_in, docs_used,
+        tokens_before (naive join), tokens_after and tokens_saved.
+    """
+    budget_tokens = settings.prompt_context_token_budget if budget_tokens is None else budget_tokens
+    passage_max_tokens = passage_max_tokens or settings.prompt_passage_max_tokens
+
+    naive = "\n".join(f"- {doc.get('content', '')}" for doc in docs) if docs else NO_KNOWLEDGE
+    stats = {
+        "docs_in": len(docs),
+        "docs_used": 0,
+        "tokens_before": estimate_tokens(naive),
+    }
+
+    ticket_terms = set(tokenize(ticket_text))
+    seen_paragraphs: List[int] = []
+    seen_docs: List[int] = []
+
+    scored = []
+    for rank, doc in enumerate(docs):
+        content = (doc.get("content") or "").strip()
+        if not content:
+            continue
+        fingerprint = simhash(content)
+        if _is_duplicate(fingerprint, seen_docs):
+            continue
+        seen_docs.append(fingerprint)
+
+        paragraphs = []
+        for paragraph in _sections(content, ticket_terms):
+            paragraph = " ".join(paragraph.split())
+            if not paragraph:
+                continue
+            paragraph_fingerprint = simhash(paragraph)
+            if _is_duplicate(paragraph_fingerprint, seen_paragraphs):
+                continue
+            seen_paragraphs.append(paragraph_fingerprint)
+            paragraphs.append(paragraph)
+        if paragraphs:
+            scored.append((_score(rank, content, ticket_terms), rank, " ".join(paragraphs)))
+
+    # Best first; rank breaks ties so identical retrievals give identical prompts
+    scored.sort(key=lambda item: (-item[0], item[1]))
+
+    lines = []
+    remaining = budget_tokens
+    for _, _, passage in scored:
+        # Two tokens for the "- " bullet and newline
+        allowance = min(passage_max_tokens, remaining - 2)
+        if allowance < MIN_PASSAGE_TOKENS:
+            break
+        passage = _truncate(passage, allowance)
+        if not passage:
+            continue
+        lines.append(f"- {passage}")
+        remaining -= estimate_tokens(passage) + 2
+
+    docs_text = "\n".join(lines) if lines else NO_KNOWLEDGE
+    stats["docs_used"] = len(lines)
+    stats["tokens_after"] = estimate_tokens(docs_text)
+    stats["tokens_saved"] = max(0, stats["tokens_before"] - stats["tokens_after"])
+    return docs_text, stats
@@ -0,0 +1,118 @@
+"""
+Per-request deadlines.
+
+A ticket request gets a time budget from the X-Request-Timeout-Ms header or
+its route's default (DEADLINE_TICKETS_MS, DEADLINE_STREAM_MS). The Deadline
+travels in the graph config (configurable["deadline"]); nodes read it with
+from_config() and hand it to the LLM, search and DB calls they make. Those
+bound their own waits by what is left (per-attempt LLM timeouts, scheduler
+queueing, embedding batches, statement timeouts).
+
+When the budget runs short nodes degrade instead of overrunning: retrieval
+is skipped, LLM retries are skipped, intent falls back to FALLBACK_INTENT
+and the solution to FALLBACK_SOLUTION (escalating to a human). Each skip is
+appended to the ticket's error_message.
+"""
+import contextvars
+import math
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from app.config.settings import settings
+
+DEADLINE_HEADER = "x-request-timeout-ms"
+
+_current: contextvars.ContextVar[Optional["Deadline"]] = contextvars.ContextVar(
+    "request_deadline", default=None
+)
+
+
+class Deadline:
+    """An absolute point in time (monotonic clock) a request must finish by."""
+
+    def __init__(self, timeout_s: float):
+        self.timeout = timeout_s
+        self.expires_at = time.monotonic() + timeout_s
+
+    def remaining(self) -> float:
+        """Seconds left (never negative)."""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def remaining_ms(self) -> int:
+        return int(self.remaining() * 1000)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def allows(self, seconds: float) -> bool:
+        """True if at least `seconds` are left."""
+        return self.remaining() >= seconds
+
+    def __repr__(self) -> str:
+        return f"Deadline({self.remaining_ms()}ms of {int(self.timeout * 1000)}ms left)"
+
+
+def for_request(header_value: Optional[str], default_ms: int) -> Optional[Deadline]:
+    """
+    Deadline from the request header, clamped to [1, DEADLINE_MAX_MS], or
+    the route default. Only the server side can disable deadlines: None when
+    there is no header and the default is 0.
+    """
+    if header_value and header_value.strip().isdigit():
+        timeout_ms = max(int(header_value.strip()), 1)
+    else:
+        timeout_ms = default_ms
+    if timeout_ms > 0 and settings.deadline_max_ms > 0:
+        timeout_ms = min(timeout_ms, settings.deadline_max_ms)
+    return Deadline(timeout_ms / 1000) if timeout_ms > 0 else None
+
+
+def from_config(config) -> Optional[Deadline]:
+    """The request deadline carried in a graph config, if any."""
+    if config and "configurable" in config:
+        return config["configurable"].get("deadline")
+    return None
+
+
+def has_time(deadline: Optional[Deadline], seconds: float) -> bool:
+    """True without a deadline, otherwise whether `seconds` are left."""
+    return deadline is None or deadline.allows(seconds)
+
+
+def time_left(deadline: Optional[Deadline], default: Optional[float] = None) -> Optional[float]:
+    """Seconds a blocking call may wait: what is left, or `default` without a deadline."""
+    if deadline is None:
+        return default
+    remaining = deadline.remaining()
+    return remaining if default is None else min(remaining, default)
+
+
+@contextmanager
+def bound(deadline: Optional[Deadline]):
+    """Make the deadline visible to lower layers (embeddings) called in this block."""
+    token = _current.set(deadline)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[Deadline]:
+    return _current.get()
+
+
+def apply_statement_timeout(db, deadline: Optional[Deadline]) -> None:
+    """Bound the session's current transaction by the deadline (PostgreSQL only)."""
+    if deadline is None or db.get_bind().dialect.name != "postgresql":
+        return
+    from sqlalchemy import text
+
+    ms = max(math.ceil(deadline.remaining() * 1000), settings.deadline_min_db_ms)
+    db.execute(text(f"SET LOCAL statement_timeout = {int(ms)}"))
+
+
+def append_error(state: dict, message: str) -> str:
+    """state's error_message with `message` added (notes from several nodes accumulate)."""
+    existing = state.get("error_message")
+    return f"{existing}; {message}" if existing else message
@@ -0,0 +1,184 @@
+"""
+Near-duplicate detection for knowledge base documents.
+
+Two-stage check on insert:
+1. SimHash (64-bit, over word 3-shingles) with LSH banding finds documents
+   whose fingerprints differ in at most a few bits, without a full scan.
+2. Candidates are confirmed by embedding cosine similarity, so documents that
+   merely share boilerplate ("Issue: ... Resolution: ...") are kept apart.
+
+Duplicates are merged into the canonical document's metadata
+(occurrence_count, merged_ids) instead of being indexed again.
+"""
+import hashlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.services.lexical_index import tokenize
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 3
+
+# Keep at most this many merged ids on a canonical document
+MAX_MERGED_IDS = 50
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of a document's word shingles."""
+    tokens = tokenize(text)
+    if len(tokens) >= SHINGLE_SIZE:
+        features = [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+    else:
+        features = [" ".join(tokens)]
+
+    import numpy as np
+
+    hashes = np.fromiter((_feature_hash(f) for f in features), dtype=np.uint64, count=len(features))
+    bits = (hashes[:, None] >> np.arange(FINGERPRINT_BITS, dtype=np.uint64)) & np.uint64(1)
+    # Bit is set where more features have it set than not
+    majority = bits.sum(axis=0) * 2 > len(features)
+
+    fingerprint = 0
+    for bit in np.flatnonzero(majority):
+        fingerprint |= 1 << int(bit)
+    return fingerprint
+
+
+def content_digest(text: str) -> str:
+    """Exact-content digest, to tell an unchanged resubmission from an edit."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def cosine(a, b) -> float:
+    import numpy as np
+
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    denom = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(a @ b) / denom if denom else 0.0
+
+
+class NearDuplicateIndex:
+    """
+    SimHash fingerprints with LSH bands, keyed by docstore id.
+
+    With max_distance + 1 bands, any two fingerprints within max_distance
+    bits agree exactly on at least one band (pigeonhole), so band lookups
+    find every candidate.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.band_bits = FINGERPRINT_BITS // self.bands
+        self.fingerprints: Dict[str, int] = {}
+        self.buckets: Dict[Tuple[int, int], Set[str]] = {}
+        # Duplicate id -> canonical id it was merged into, and the
+        # content_digest() of the text that was merged
+        self.aliases: Dict[str, str] = {}
+        self.alias_digests: Dict[str, str] = {}
+
+    def __setstate__(self, state: dict) -> None:
+        # Snapshots pickled before alias digests were kept
+        state.setdefault("alias_digests", {})
+        self.__dict__.update(state)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.fingerprints
+
+    def _band_keys(self, fingerprint: int) -> Iterable[Tuple[int, int]]:
+        mask = (1 << self.band_bits) - 1
+        for band in range(self.bands):
+            yield band, (fingerprint >> (band * self.band_bits)) & mask
+
+    def add(self, doc_id: str, fingerprint: int) -> None:
+        self.remove(doc_id)
+        self.fingerprints[doc_id] = fingerprint
+        for key in self._band_keys(fingerprint):
+            self.buckets.setdefault(key, set()).add(doc_id)
+
+    def remove(self, doc_id: str) -> None:
+        fingerprint = self.fingerprints.pop(doc_id, None)
+        if fingerprint is None:
+            return
+        for key in self._band_keys(fingerprint):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(doc_id)
+                if not bucket:
+                    del self.buckets[key]
+
+    def add_alias(self, doc_id: str, canonical_id: str, text: str) -> None:
+        """Record that `doc_id` (with this text) was merged into `canonical_id`."""
+        self.aliases[doc_id] = canonical_id
+        self.alias_digests[doc_id] = content_digest(text)
+
+    def remove_alias(self, doc_id: str) -> None:
+        self.aliases.pop(doc_id, None)
+        self.alias_digests.pop(doc_id, None)
+
+    def candidates(self, fingerprint: int) -> List[Tuple[str, int]]:
+        """Ids within max_distance bits, closest first."""
+        seen: Set[str] = set()
+        for key in self._band_keys(fingerprint):
+            seen.update(self.buckets.get(key, ()))
+        found = [
+            (doc_id, hamming(fingerprint, self.fingerprints[doc_id]))
+            for doc_id in seen
+        ]
+        return sorted(
+            [(doc_id, distance) for doc_id, distance in found if distance <= self.max_distance],
+            key=lambda item: item[1]
+        )
+
+
+def find_duplicate(
+    index: NearDuplicateIndex,
+    fingerprint: int,
+    vector,
+    candidate_vector,
+    min_similarity: float
+) -> Optional[str]:
+    """
+    Canonical id that a new document duplicates, or None.
+
+    Args:
+        candidate_vector: Callable(doc_id) -> embedding of an indexed
+            document, or None to skip the candidate.
+    """
+    for doc_id, _ in index.candidates(fingerprint):
+        other = candidate_vector(doc_id)
+        if other is not None and cosine(vector, other) >= min_similarity:
+            return doc_id
+    return None
+
+
+def merge_metadata(canonical: dict, duplicate_id: Optional[str], duplicate: dict) -> None:
+    """Record a merged duplicate on the canonical document's metadata (in place)."""
+    canonical["occurrence_count"] = int(canonical.get("occurrence_count", 1)) + int(
+        duplicate.get("occurrence_count", 1)
+    )
+    merged = list(canonical.get("merged_ids", []))
+    for doc_id in [duplicate_id, *duplicate.get("merged_ids", [])]:
+        if doc_id and doc_id not in merged:
+            merged.append(doc_id)
+    canonical["merged_ids"] = merged[-MAX_MERGED_IDS:]
+    if duplicate.get("ticket_id"):
+        canonical["last_ticket_id"] = duplicate["ticket_id"]
+
+
+def unmerge_metadata(canonical: dict, duplicate_id: str) -> None:
+    """Take a merged duplicate back out of the canonical document's metadata (in place)."""
+    merged = list(canonical.get("merged_ids", []))
+    if duplicate_id not in merged:
+        return
+    merged.remove(duplicate_id)
+    canonical["merged_ids"] = merged
+    canonical["occurrence_count"] = max(int(canonical.get("occurrence_count", 1)) - 1, 1)
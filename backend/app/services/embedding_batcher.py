@@ -0,0 +1,109 @@
+"""
+Micro-batching for query embeddings.
+
+Concurrent tickets each embed one query at a time, which leaves the model's
+batched forward pass mostly idle. MicroBatchEmbeddings queues single-query
+calls and a worker thread embeds everything that arrives within a short
+window (max_wait_ms, or until max_batch_size items) with one
+embed_documents call, then hands each caller its own vector.
+
+Document batches already arrive batched and go straight to the model.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from app.services.deadline import current, time_left
+from app.services.metrics import QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatchEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that coalesces concurrent embed_query calls.
+
+    Usage:
+        embedding = MicroBatchEmbeddings(model, max_batch_size=32, max_wait_ms=5)
+        embedding.embed_query("reset password")  # blocks until its batch runs
+    """
+
+    def __init__(self, inner: Embeddings, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.inner = inner
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+        self.batches = 0
+        self.batched_queries = 0
+        self._depth = QUEUE_DEPTH.labels(queue="embedding_batch")
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run,
+                    name="embedding-batcher",
+                    daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self) -> List[tuple]:
+        """Block for the first query, then gather more until the window closes."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._depth.dec(len(batch))
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self.inner.embed_documents(texts)
+            except Exception as e:
+                logger.warning(f"Batched embedding of {len(texts)} queries failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.batched_queries += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(list(vector))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.max_batch_size == 1:
+            return self.inner.embed_query(text)
+
+        self._ensure_worker()
+        future: Future = Future()
+        self._depth.inc()
+        self._queue.put((text, future))
+        # Raises TimeoutError if the request deadline (deadline.bound) passes first
+        return future.result(timeout=time_left(current()))
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "batched_queries": self.batched_queries,
+            "mean_batch_size": self.batched_queries / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,230 @@
+"""
+Content-addressed embedding cache.
+
+Wraps an embeddings model so identical text is embedded once. Entries are
+keyed by sha256(model name, normalized text):
+
+- memory tier: bounded LRU of float32 vectors (per process)
+- disk tier (optional): SQLite file of float16 vectors, shared by all
+  workers on the host and surviving restarts
+
+Misses within one call are de-duplicated and embedded in a single model call.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from app.services.metrics import EMBEDDING_DURATION, timed
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys (NFC, collapsed whitespace)."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+
+class _DiskTier:
+    """
+    float16 vectors in SQLite (WAL mode so several processes can share it).
+
+    The connection is per process: a forked worker opens its own instead of
+    sharing the parent's.
+    """
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._path = path
+        self._lock = threading.Lock()
+        self._pid = None
+        self._connection = None
+        self._connect()
+
+    def _connect(self) -> None:
+        conn = sqlite3.connect(str(self._path), check_same_thread=False, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        conn.commit()
+        self._connection, self._pid = conn, os.getpid()
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            self._connect()
+        return self._connection
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        import numpy as np
+
+        found = {}
+        with self._lock:
+            # SQLite caps bound parameters; chunk large lookups
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[bytes(key)] = np.frombuffer(blob, dtype=np.float16).astype(np.float32).tolist()
+        return found
+
+    def put_many(self, items: Dict[bytes, List[float]]) -> None:
+        import numpy as np
+
+        rows = [
+            (key, np.asarray(vector, dtype=np.float16).tobytes())
+            for key, vector in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows
+            )
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with an LRU memory tier and optional disk tier.
+
+    Usage:
+        embedding = CachedEmbeddings(model, "all-MiniLM-L6-v2", max_entries=10000)
+        embedding.embed_query("reset password")   # miss -> model
+        embedding.embed_query("reset  password")  # hit (same normalized text)
+    """
+
+    def __init__(
+        self,
+        inner: Embeddings,
+        model_name: str,
+        max_entries: int = 10000,
+        disk_path: Optional[str] = None
+    ):
+        self.inner = inner
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[_DiskTier] = None
+        if disk_path:
+            try:
+                self._disk = _DiskTier(Path(disk_path))
+            except Exception as e:
+                logger.warning(f"Embedding disk cache unavailable: {e}")
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _memory_get(self, key: bytes) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+            return vector
+
+    def _memory_put(self, key: bytes, vector: List[float]) -> None:
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, texts: List[str]) -> tuple[List[bytes], Dict[bytes, List[float]]]:
+        """Resolve what the cache tiers can. Returns (keys, found)."""
+        keys = [cache_key(self.model_name, text) for text in texts]
+        found: Dict[bytes, List[float]] = {}
+
+        for key in keys:
+            if key not in found and (vector := self._memory_get(key)) is not None:
+                found[key] = vector
+                self.memory_hits += 1
+
+        if self._disk is not None:
+            pending = list({key for key in keys if key not in found})
+            if pending:
+                try:
+                    from_disk = self._disk.get_many(pending)
+                except Exception as e:
+                    logger.warning(f"Embedding disk cache read failed: {e}")
+                    from_disk = {}
+                for key, vector in from_disk.items():
+                    found[key] = vector
+                    self._memory_put(key, vector)
+                self.disk_hits += len(from_disk)
+
+        return keys, found
+
+    def _store(self, computed: Dict[bytes, List[float]]) -> None:
+        for key, vector in computed.items():
+            self._memory_put(key, vector)
+        if self._disk is not None and computed:
+            try:
+                self._disk.put_many(computed)
+            except Exception as e:
+                logger.warning(f"Embedding disk cache write failed: {e}")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found = self._lookup(texts)
+
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            self.misses += len(missing)
+            with timed(EMBEDDING_DURATION, op="documents"):
+                vectors = self.inner.embed_documents(list(missing.values()))
+            computed = {key: list(vector) for key, vector in zip(missing, vectors)}
+            self._store(computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found = self._lookup([text])
+        key = keys[0]
+        if key in found:
+            return found[key]
+
+        self.misses += 1
+        with timed(EMBEDDING_DURATION, op="query"):
+            vector = list(self.inner.embed_query(text))
+        self._store({key: vector})
+        return vector
+
+    def put(self, texts: List[str], vectors: List[List[float]]) -> None:
+        """Record vectors computed elsewhere (e.g. by an import worker pool)."""
+        self._store({
+            cache_key(self.model_name, text): list(vector)
+            for text, vector in zip(texts, vectors)
+        })
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process."""
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "model": self.model_name,
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+        }
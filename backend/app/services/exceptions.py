@@ -28,6 +28,11 @@ class LLMUnavailableError(LLMError):
     pass
 
 
+class LLMTimeoutError(LLMError):
+    """Raised when the request deadline leaves no time for an LLM call."""
+    pass
+
+
 class LLMResponseParseError(LLMError):
     """Raised when LLM response cannot be parsed as expected."""
     pass
@@ -0,0 +1,56 @@
+"""
+Knowledge base documents learned from human feedback.
+
+The learner writes one per ticket (build_feedback_document); retrieval and
+answer reuse split them back into their parts (parse_feedback_document).
+"""
+
+
+def feedback_document_id(ticket_id: str) -> str:
+    """Knowledge base id for a ticket's learned document (one per ticket)."""
+    return f"feedback:{ticket_id}"
+
+
+def build_feedback_document(state: dict) -> tuple[str, dict] | None:
+    """
+    Build the knowledge base document for a piece of feedback.
+
+    Returns:
+        (text, metadata), or None if there is nothing to learn.
+    """
+    feedback = state.get("human_feedback")
+    solution = state.get("final_response")
+
+    if not feedback or not solution:
+        return None
+
+    document_text = f"""Issue: {state['ticket_text']}
+
+Resolution: {solution}
+
+Agent Notes: {feedback}"""
+
+    metadata = {
+        "source": "human_feedback",
+        "ticket_id": state["ticket_id"],
+        "intent": state.get("intent")
+    }
+    return document_text, metadata
+
+
+def parse_feedback_document(text: str) -> dict | None:
+    """
+    Split a learned document (see build_feedback_document) back into its
+    issue, resolution and agent notes, or None if it isn't in that format.
+    """
+    if not text.startswith("Issue: "):
+        return None
+    resolution_at = text.find("\n\nResolution: ")
+    notes_at = text.rfind("\n\nAgent Notes: ")
+    if resolution_at < 0 or notes_at < resolution_at:
+        return None
+    return {
+        "issue": text[len("Issue: "):resolution_at],
+        "resolution": text[resolution_at + len("\n\nResolution: "):notes_at],
+        "notes": text[notes_at + len("\n\nAgent Notes: "):],
+    }
@@ -0,0 +1,250 @@
+"""
+Idempotency keys for ticket creation.
+
+A client (or proxy) retrying POST /tickets/ or /tickets/stream with the same
+Idempotency-Key header gets the first request's outcome instead of a new
+ticket and a second graph run:
+
+- completed: the stored response is replayed
+- in progress, same process (streams): the retry attaches to the running
+  stream's broadcast and sees every event from the start
+- in progress elsewhere: the retry waits for the stored response, up to
+  IDEMPOTENCY_WAIT_S, then gets 409
+- failed: the key is released rather than completed, so a retry runs the
+  request again instead of replaying a transient failure
+
+Keys are stored in idempotency_keys (primary key "<route>:<key>") with the
+request body's hash; reusing a key for a different body is rejected. Rows
+expire after IDEMPOTENCY_TTL_S and are purged in passing.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from app.config.settings import settings
+from app.db.session import SessionLocal
+from app.models.idempotency import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+# Returned by wait_for_completion when the first request failed and let go of the key
+RELEASED = "released"
+
+# Key scopes (the same key may be used once per route)
+CREATE_ROUTE = "tickets"
+STREAM_ROUTE = "tickets_stream"
+
+# How often a claim also deletes expired rows (seconds)
+PURGE_INTERVAL = 300
+_last_purge = 0.0
+
+
+def request_hash(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def scoped_key(route: str, key: str) -> str:
+    return f"{route}:{key}"
+
+
+def _record(row: IdempotencyKey) -> dict:
+    return {
+        "key": row.key,
+        "request_hash": row.request_hash,
+        "ticket_id": row.ticket_id,
+        "status": row.status,
+        "response": json.loads(row.response) if row.response else None,
+    }
+
+
+def claim(route: str, key: str, body_hash: str, ticket_id: Optional[str]) -> Optional[dict]:
+    """
+    Claim a key for a new request.
+
+    Returns:
+        None if this request owns the key and should run; otherwise the
+        existing record ({status, request_hash, ticket_id, response}).
+    """
+    _maybe_purge()
+    now = datetime.utcnow()
+    row_key = scoped_key(route, key)
+    db = SessionLocal()
+    try:
+        for _ in range(2):
+            db.add(IdempotencyKey(
+                key=row_key,
+                route=route,
+                request_hash=body_hash,
+                ticket_id=ticket_id,
+                status=IN_PROGRESS,
+                created_at=now,
+                expires_at=now + timedelta(seconds=settings.idempotency_ttl_s)
+            ))
+            try:
+                db.commit()
+                return None
+            except IntegrityError:
+                db.rollback()
+
+            existing = db.get(IdempotencyKey, row_key)
+            if existing is None:
+                continue  # expired and purged meanwhile: claim again
+            if existing.expires_at > now:
+                return _record(existing)
+            db.delete(existing)
+            db.commit()
+        raise RuntimeError(f"Could not claim idempotency key {row_key}")
+    finally:
+        db.close()
+
+
+def complete(route: str, key: str, response: dict) -> None:
+    """Store the response to replay for this key. Failures are logged, not raised."""
+    db = SessionLocal()
+    try:
+        row = db.get(IdempotencyKey, scoped_key(route, key))
+        if row is not None:
+            row.status = COMPLETED
+            row.response = json.dumps(response, default=str)
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to store idempotent response for {route}:{key}: {e}")
+    finally:
+        db.close()
+
+
+def release(route: str, key: str) -> None:
+    """Forget a claim whose request failed, so a retry can run."""
+    db = SessionLocal()
+    try:
+        db.query(IdempotencyKey).filter(IdempotencyKey.key == scoped_key(route, key)).delete()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to release idempotency key {route}:{key}: {e}")
+    finally:
+        db.close()
+
+
+def wait_for_completion(route: str, key: str, timeout: float, poll_interval: float = 0.25) -> Optional[dict]:
+    """
+    Poll until the key's request completes.
+
+    Returns:
+        Its record; {"status": RELEASED} if the request failed and released
+        the key; None on timeout.
+    """
+    deadline = time.monotonic() + timeout
+    row_key = scoped_key(route, key)
+    while True:
+        db = SessionLocal()
+        try:
+            row = db.get(IdempotencyKey, row_key)
+            if row is None:
+                return {"status": RELEASED}
+            if row.status == COMPLETED:
+                return _record(row)
+        finally:
+            db.close()
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(poll_interval)
+
+
+def purge_expired() -> int:
+    """Delete expired keys. Returns how many were removed."""
+    db = SessionLocal()
+    try:
+        removed = db.query(IdempotencyKey).filter(
+            IdempotencyKey.expires_at <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.commit()
+        return removed
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Failed to purge expired idempotency keys: {e}")
+        return 0
+    finally:
+        db.close()
+
+
+def _maybe_purge() -> None:
+    global _last_purge
+    if time.monotonic() - _last_purge < PURGE_INTERVAL:
+        return
+    _last_purge = time.monotonic()
+    removed = purge_expired()
+    if removed:
+        logger.info(f"Purged {removed} expired idempotency keys")
+
+
+# =============================================================================
+# In-progress streams (per process)
+# =============================================================================
+
+class StreamBroadcast:
+    """
+    Stand-in for the stream queue that any number of readers can follow.
+
+    The graph put()s chunks and events as it would on a queue.Queue; each
+    subscribe() iterator yields everything from the first item, then live
+    items, until the None sentinel.
+    """
+
+    def __init__(self, ticket_id: str):
+        self.ticket_id = ticket_id
+        self._items = []
+        self._done = False
+        self._cond = threading.Condition()
+
+    def put(self, item) -> None:
+        with self._cond:
+            if item is None:
+                self._done = True
+            else:
+                self._items.append(item)
+            self._cond.notify_all()
+
+    def subscribe(self) -> Iterator:
+        position = 0
+        while True:
+            with self._cond:
+                while position >= len(self._items) and not self._done:
+                    self._cond.wait()
+                if position >= len(self._items):
+                    return
+                items = self._items[position:]
+            position += len(items)
+            yield from items
+
+
+_streams: Dict[str, StreamBroadcast] = {}
+_streams_lock = threading.Lock()
+
+
+def register_stream(route: str, key: str, broadcast: StreamBroadcast) -> None:
+    with _streams_lock:
+        _streams[scoped_key(route, key)] = broadcast
+
+
+def unregister_stream(route: str, key: str) -> None:
+    with _streams_lock:
+        _streams.pop(scoped_key(route, key), None)
+
+
+def get_stream(route: str, key: str) -> Optional[StreamBroadcast]:
+    with _streams_lock:
+        return _streams.get(scoped_key(route, key))
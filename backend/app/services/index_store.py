@@ -0,0 +1,227 @@
+"""
+On-disk snapshots for the FAISS knowledge index.
+
+Layout under the configured directory:
+
+    CURRENT                    # name of the live snapshot, replaced atomically
+    snapshots/000000000042/    # immutable snapshot directory
+        index.faiss            # FAISS index (same names as FAISS.save_local)
+        index.pkl              # (docstore, index_to_docstore_id)
+        meta.json              # index bookkeeping (type, training stats)
+        <name>.pkl             # attachments kept in sync with the docstore
+
+    writer.lock                # held by the single active writer
+
+A snapshot is written to a temporary directory, fsynced, renamed into place,
+and only then published by swapping CURRENT, so readers never observe a
+partially written index. The FAISS index is loaded memory-mapped where the
+FAISS build supports it, so startup maps it instead of rebuilding, and every
+process reading the same snapshot shares its pages. index.pkl and the
+attachments are plain pickles: each reader holds a private copy.
+
+Writers across processes are serialized with an exclusive lock on
+writer.lock; a writer always starts from the version named by CURRENT, so
+concurrent updates from different workers are applied in sequence rather
+than overwriting each other.
+"""
+import os
+import json
+import pickle
+import shutil
+import logging
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+SNAPSHOTS_DIR = "snapshots"
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "index.pkl"
+META_FILE = "meta.json"
+LOCK_FILE = "writer.lock"
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _mmap_flags() -> int:
+    """FAISS read flags for zero-copy, read-only loading (when supported)."""
+    import faiss
+    # IO_FLAG_MMAP_IFC (zero-copy codes, FAISS >= 1.8) must not be combined
+    # with the older on-disk inverted-list flag
+    mmap = getattr(faiss, "IO_FLAG_MMAP_IFC", None) or faiss.IO_FLAG_MMAP
+    return mmap | getattr(faiss, "IO_FLAG_READ_ONLY", 0)
+
+
+@contextmanager
+def writer_lock(root: Path):
+    """
+    Exclusive cross-process lock for publishing snapshots.
+
+    Uses flock, which the OS releases if the holder dies.
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / LOCK_FILE, "a+") as f:
+        try:
+            import fcntl
+        except ImportError:
+            # Non-POSIX platforms: single-process only
+            yield
+            return
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def snapshot_path(root: Path, version: int) -> Path:
+    return root / SNAPSHOTS_DIR / f"{version:012d}"
+
+
+def current_version(root: Path) -> Optional[int]:
+    """Version named by CURRENT, or None if nothing is published yet."""
+    try:
+        return int((root / CURRENT_FILE).read_text().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def read_index(root: Path, version: int, mmap: bool = True) -> Any:
+    """Load only a snapshot's FAISS index (see read_snapshot for `mmap`)."""
+    import faiss
+
+    index_file = str(snapshot_path(root, version) / INDEX_FILE)
+    if mmap:
+        try:
+            return faiss.read_index(index_file, _mmap_flags())
+        except RuntimeError as e:
+            logger.warning(f"Memory-mapped load unsupported, reading into memory: {e}")
+    return faiss.read_index(index_file)
+
+
+def read_snapshot(root: Path, version: int, mmap: bool = True) -> Tuple[Any, Any, dict, dict]:
+    """
+    Load a snapshot.
+
+    Args:
+        mmap: Map the index read-only (shared page cache) instead of copying
+            it into private memory. Mapped indexes must not be written to.
+
+    Returns:
+        (faiss_index, docstore, index_to_docstore_id, meta)
+    """
+    path = snapshot_path(root, version)
+    index = read_index(root, version, mmap=mmap)
+
+    with open(path / DOCSTORE_FILE, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    try:
+        meta = json.loads((path / META_FILE).read_text())
+    except FileNotFoundError:
+        meta = {}
+
+    return index, docstore, index_to_docstore_id, meta
+
+
+def read_attachment(root: Path, version: int, name: str) -> Any:
+    """Load a named attachment from a snapshot, or None if it has none."""
+    try:
+        with open(snapshot_path(root, version) / f"{name}.pkl", "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_snapshot(
+    root: Path,
+    index: Any,
+    docstore: Any,
+    index_to_docstore_id: dict,
+    meta: Optional[dict] = None,
+    attachments: Optional[dict] = None
+) -> int:
+    """
+    Atomically write and publish a new snapshot.
+
+    Callers must hold writer_lock().
+
+    Returns:
+        The new version number.
+    """
+    import faiss
+
+    snapshots = root / SNAPSHOTS_DIR
+    snapshots.mkdir(parents=True, exist_ok=True)
+    version = (current_version(root) or 0) + 1
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix=".tmp-", dir=snapshots))
+    try:
+        faiss.write_index(index, str(tmp_dir / INDEX_FILE))
+        with open(tmp_dir / DOCSTORE_FILE, "wb") as f:
+            pickle.dump((docstore, index_to_docstore_id), f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        for name, obj in (attachments or {}).items():
+            with open(tmp_dir / f"{name}.pkl", "wb") as f:
+                pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+        with open(tmp_dir / META_FILE, "w") as f:
+            json.dump(meta or {}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(tmp_dir / INDEX_FILE, "rb+") as f:
+            os.fsync(f.fileno())
+        _fsync_dir(tmp_dir)
+
+        os.rename(tmp_dir, snapshot_path(root, version))
+        _fsync_dir(snapshots)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    # Publish: readers switch only once CURRENT names the complete snapshot
+    pointer_tmp = root / f".{CURRENT_FILE}.tmp"
+    with open(pointer_tmp, "w") as f:
+        f.write(str(version))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, root / CURRENT_FILE)
+    _fsync_dir(root)
+
+    return version
+
+
+def prune_snapshots(root: Path, keep: int) -> None:
+    """
+    Delete all but the newest `keep` snapshots.
+
+    Safe with live readers: unlinked files stay valid for processes that
+    already mapped them.
+    """
+    snapshots = root / SNAPSHOTS_DIR
+    if not snapshots.exists():
+        return
+    live = current_version(root)
+    versions = sorted(
+        int(p.name) for p in snapshots.iterdir() if p.is_dir() and p.name.isdigit()
+    )
+    for version in versions[:-keep] if keep > 0 else versions:
+        if version == live:
+            continue
+        shutil.rmtree(snapshot_path(root, version), ignore_errors=True)
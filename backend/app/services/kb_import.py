@@ -0,0 +1,655 @@
+"""
+Bulk knowledge base import.
+
+Loads help-center articles and macros into the knowledge index:
+
+1. Read sources: Markdown, HTML, or JSONL (one article per line).
+2. Chunk each article with overlap, on paragraph/sentence boundaries.
+3. Embed chunks in large batches, across a process pool when configured
+   (each worker loads its own copy of the model).
+4. Write to the index in bulk, one snapshot per write batch.
+5. Checkpoint after each write so an interrupted import resumes where it
+   stopped.
+
+Chunk ids are deterministic ("import:<article key hash>:<n>"), so
+re-importing an unchanged article is skipped before embedding and a changed
+one replaces its previous chunks; chunks beyond its new chunk count are
+deleted in the same write.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.config.settings import settings
+from app.db.session import SessionLocal
+from app.models.kb_import_job import KnowledgeImportJob
+from app.services.knowledge_base import _get_document, add_knowledge_documents
+from app.services.metrics import QUEUE_DEPTH
+from app.services.vectorstore import get_embedding, get_vectorstore, load_embedding_model
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    ".md": "markdown",
+    ".markdown": "markdown",
+    ".html": "html",
+    ".htm": "html",
+    ".jsonl": "jsonl",
+}
+
+# Keys read from JSONL records, in order of preference
+JSONL_TEXT_KEYS = ("text", "content", "body")
+
+CHUNK_ID_PREFIX = "import:"
+
+
+# =============================================================================
+# Readers
+# =============================================================================
+
+class _HTMLText(HTMLParser):
+    """Visible text of an HTML page, with block elements on their own lines."""
+
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6",
+                  "section", "article", "pre", "blockquote", "table", "ul", "ol"}
+    SKIP_TAGS = {"script", "style", "noscript", "head", "nav", "footer"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts: List[str] = []
+        self.title: Optional[str] = None
+        self._skip = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self._in_title = True
+        elif tag in self.SKIP_TAGS:
+            self._skip += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag in self.SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title = (self.title or "") + data.strip()
+        elif not self._skip:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> tuple[Optional[str], str]:
+    """Returns (title, text)."""
+    parser = _HTMLText()
+    parser.feed(html)
+    parser.close()
+    text = "".join(parser.parts)
+    text = re.sub(r"[ \t\r\f\v]+", " ", text)
+    text = re.sub(r"\s*\n\s*\n\s*", "\n\n", text)
+    return parser.title, text.strip()
+
+
+def markdown_to_text(markdown: str) -> tuple[Optional[str], str]:
+    """Returns (title, text). Keeps headings and lists; drops link/image URLs."""
+    text = re.sub(r"\A---\n.*?\n---\n", "", markdown, flags=re.S)  # front matter
+    text = re.sub(r"!\[([^\]]*)\]\([^)]*\)", r"\1", text)
+    text = re.sub(r"\[([^\]]*)\]\([^)]*\)", r"\1", text)
+    title = None
+    match = re.search(r"^#\s+(.+)$", text, flags=re.M)
+    if match:
+        title = match.group(1).strip()
+    return title, text.strip()
+
+
+def _article(key: str, title: Optional[str], text: str, metadata: dict) -> dict:
+    return {"key": key, "title": title, "text": text, "metadata": metadata}
+
+
+def read_source(path: Path) -> Iterator[dict]:
+    """
+    Articles in one source file.
+
+    Yields dicts with key (stable per article), title, text and metadata.
+    """
+    fmt = FORMATS.get(path.suffix.lower())
+    if fmt is None:
+        raise ValueError(f"Unsupported import format: {path}")
+
+    if fmt == "jsonl":
+        with path.open(encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                text = next((record[k] for k in JSONL_TEXT_KEYS if record.get(k)), None)
+                if not text:
+                    logger.warning(f"{path}:{line_no}: no text field, skipped")
+                    continue
+                if record.get("format") == "html":
+                    _, text = html_to_text(text)
+                elif record.get("format") == "markdown":
+                    _, text = markdown_to_text(text)
+                metadata = {k: record[k] for k in ("url", "intent") if record.get(k)}
+                key = str(record.get("id") or f"{path.name}:{line_no}")
+                yield _article(key, record.get("title"), text, metadata)
+        return
+
+    raw = path.read_text(encoding="utf-8")
+    title, text = html_to_text(raw) if fmt == "html" else markdown_to_text(raw)
+    yield _article(str(path), title or path.stem, text, {"path": str(path)})
+
+
+def iter_source_files(paths: Iterable[str]) -> Iterator[Path]:
+    """Expand directories into supported files, in a stable order."""
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            yield from sorted(p for p in path.rglob("*") if p.suffix.lower() in FORMATS)
+        else:
+            yield path
+
+
+# =============================================================================
+# Chunking
+# =============================================================================
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _pieces(text: str, chunk_size: int) -> Iterator[str]:
+    """Paragraphs, split further into sentences and then words when too long."""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= chunk_size:
+            yield paragraph
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            if len(sentence) <= chunk_size:
+                yield sentence
+                continue
+            words = sentence.split()
+            current = ""
+            for word in words:
+                if current and len(current) + 1 + len(word) > chunk_size:
+                    yield current
+                    current = word
+                else:
+                    current = f"{current} {word}" if current else word
+            if current:
+                yield current
+
+
+def chunk_text(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """
+    Split text into chunks of at most ~chunk_size characters.
+
+    Each chunk after the first starts with the last ~overlap characters of
+    the previous one (cut at a word boundary), so an answer spanning a
+    boundary is retrievable from either side.
+    """
+    overlap = max(0, min(overlap, chunk_size // 2))
+    chunks: List[str] = []
+    current = ""
+
+    for piece in _pieces(text, chunk_size):
+        separator = "\n\n" if current else ""
+        if current and len(current) + len(separator) + len(piece) > chunk_size:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap else ""
+            if len(current) > overlap and " " in tail:
+                # Don't start on a partial word
+                tail = tail.split(" ", 1)[1]
+            current = f"{tail} {piece}".strip() if tail else piece
+        else:
+            current = f"{current}{separator}{piece}"
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_prefix(article: dict) -> str:
+    """Id prefix shared by an article's chunks ("import:<key hash>")."""
+    return CHUNK_ID_PREFIX + hashlib.sha1(article["key"].encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_article(article: dict, chunk_size: int, overlap: int) -> List[tuple]:
+    """(chunk id, text, metadata) for each chunk of an article."""
+    prefix = chunk_prefix(article)
+    title = article["title"]
+    chunks = chunk_text(article["text"], chunk_size, overlap)
+    rows = []
+    for n, chunk in enumerate(chunks):
+        metadata = {
+            **article["metadata"],
+            "source": "import",
+            "article": article["key"],
+            "chunk": n,
+        }
+        if title:
+            metadata["title"] = title
+        text = f"{title}\n\n{chunk}" if title and not chunk.startswith(title) else chunk
+        rows.append((f"{prefix}:{n}", text, metadata))
+    return rows
+
+
+# =============================================================================
+# Embedding
+# =============================================================================
+
+_worker_model = None
+
+
+def _init_worker() -> None:
+    global _worker_model
+    # One model per process; keep each process to one BLAS thread so the
+    # pool, not the library, decides CPU parallelism. Workers are spawned,
+    # so torch is not loaded yet and reads this when the model is loaded.
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    if "torch" in sys.modules:
+        # Imported by the spawned main module; the variable is too late
+        sys.modules["torch"].set_num_threads(1)
+    _worker_model, _ = load_embedding_model()
+
+
+def _embed_in_worker(texts: List[str]) -> List[List[float]]:
+    return [list(map(float, v)) for v in _worker_model.embed_documents(texts)]
+
+
+class ChunkEmbedder:
+    """Embeds chunk batches in-process or across a process pool."""
+
+    def __init__(self, workers: int = 0, batch_size: int = 256):
+        self.batch_size = max(1, batch_size)
+        # Spawned, not forked: the API process has threads (and locks they
+        # may hold) that a forked child would inherit
+        self._pool = (
+            ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+            if workers > 0 else None
+        )
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if self._pool is None:
+            return get_embedding().embed_documents(texts)
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        vectors: List[List[float]] = []
+        for batch_vectors in self._pool.map(_embed_in_worker, batches):
+            vectors.extend(batch_vectors)
+        # Later writes (dedup checks, lossy-index rebuilds) re-embed by text
+        get_embedding().put(texts, vectors)
+        return vectors
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+
+
+# =============================================================================
+# Checkpoints
+# =============================================================================
+
+def _file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_checkpoint(path: Optional[Path]) -> dict:
+    if path is None or not path.exists():
+        return {"sources": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_checkpoint(path: Optional[Path], checkpoint: dict) -> None:
+    if path is None:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(checkpoint, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# =============================================================================
+# Import
+# =============================================================================
+
+class _Batch:
+    """Chunks waiting for the next bulk write, with the articles they finish."""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[dict] = []
+        # chunk_prefix() -> the article's chunk count
+        self.chunk_counts: Dict[str, int] = {}
+        # source -> number of its articles fully contained in this batch
+        self.finished: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _indexed_chunk_counts(store) -> Dict[str, int]:
+    """chunk_prefix() -> one past the highest chunk number indexed, for every imported article."""
+    counts: Dict[str, int] = {}
+    for doc_id in store.index_to_docstore_id.values():
+        if not doc_id.startswith(CHUNK_ID_PREFIX):
+            continue
+        prefix, _, n = doc_id.rpartition(":")
+        if n.isdigit():
+            counts[prefix] = max(counts.get(prefix, 0), int(n) + 1)
+    return counts
+
+
+def _stale_chunk_ids(store, indexed: Dict[str, int], chunk_counts: Dict[str, int]) -> List[str]:
+    """Indexed chunks numbered at or beyond their article's current chunk count."""
+    stale = []
+    for prefix, count in chunk_counts.items():
+        for n in range(count, indexed.get(prefix, 0)):
+            doc_id = f"{prefix}:{n}"
+            if _get_document(store, doc_id) is not None:
+                stale.append(doc_id)
+    return stale
+
+
+def import_articles(
+    articles: Iterable[tuple],
+    embedder: ChunkEmbedder,
+    chunk_size: Optional[int] = None,
+    overlap: Optional[int] = None,
+    write_batch: Optional[int] = None,
+    deduplicate: bool = False,
+    on_flush: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """
+    Chunk, embed and index articles.
+
+    Args:
+        articles: (source name, article dict) pairs, in source order.
+        on_flush: Called after each bulk write with
+            {source: articles completed in that write} and may checkpoint.
+
+    Returns:
+        Counters: articles, chunks, skipped (unchanged), written, deleted
+        (stale chunks of shortened articles).
+    """
+    chunk_size = chunk_size or settings.kb_import_chunk_size
+    overlap = settings.kb_import_chunk_overlap if overlap is None else overlap
+    write_batch = write_batch or settings.kb_import_write_batch
+
+    if get_vectorstore() is None:
+        raise RuntimeError("Vector store is not available")
+
+    stats = {"articles": 0, "chunks": 0, "skipped": 0, "written": 0, "deleted": 0}
+    batch = _Batch()
+    # Chunk counts already indexed, scanned once and kept current by flush()
+    indexed = _indexed_chunk_counts(get_vectorstore())
+
+    def flush():
+        nonlocal batch
+        if batch.ids:
+            store = get_vectorstore()
+            # Resume and re-import: drop chunks already indexed unchanged
+            keep = [
+                i for i, doc_id in enumerate(batch.ids)
+                if (existing := _get_document(store, doc_id)) is None
+                or existing.page_content != batch.texts[i]
+            ]
+            stats["skipped"] += len(batch.ids) - len(keep)
+            # Edited articles that now have fewer chunks
+            stale = _stale_chunk_ids(store, indexed, batch.chunk_counts)
+            stats["deleted"] += len(stale)
+            if keep or stale:
+                texts = [batch.texts[i] for i in keep]
+                stats["written"] += add_knowledge_documents(
+                    texts=texts,
+                    metadatas=[batch.metadatas[i] for i in keep],
+                    ids=[batch.ids[i] for i in keep],
+                    deduplicate=deduplicate,
+                    vectors=embedder.embed(texts) if texts else [],
+                    delete_ids=stale
+                )
+            indexed.update(batch.chunk_counts)
+            logger.info(
+                f"Knowledge import: {stats['chunks']} chunks seen, "
+                f"{stats['written']} written, {stats['skipped']} unchanged, "
+                f"{stats['deleted']} stale deleted"
+            )
+        if on_flush is not None and batch.finished:
+            on_flush(batch.finished)
+        batch = _Batch()
+
+    for source, article in articles:
+        rows = chunk_article(article, chunk_size, overlap)
+        for doc_id, text, metadata in rows:
+            batch.ids.append(doc_id)
+            batch.texts.append(text)
+            batch.metadatas.append(metadata)
+        batch.chunk_counts[chunk_prefix(article)] = len(rows)
+        batch.finished[source] = batch.finished.get(source, 0) + 1
+        stats["articles"] += 1
+        stats["chunks"] += len(rows)
+        # Flush on article boundaries so checkpoints never split an article
+        if len(batch) >= write_batch:
+            flush()
+
+    flush()
+    return stats
+
+
+def import_files(
+    paths: Iterable[str],
+    checkpoint_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    embed_batch: Optional[int] = None,
+    **options
+) -> dict:
+    """
+    Import Markdown/HTML/JSONL files (directories are walked recursively).
+
+    With a checkpoint file, sources whose content is unchanged since an
+    interrupted run skip the articles already written.
+    """
+    checkpoint_file = Path(checkpoint_path) if checkpoint_path else None
+    checkpoint = load_checkpoint(checkpoint_file)
+    sources = checkpoint.setdefault("sources", {})
+
+    files = list(iter_source_files(paths))
+    digests = {str(path): _file_digest(path) for path in files}
+
+    def articles():
+        for path in files:
+            name = str(path)
+            state = sources.get(name)
+            if state is None or state.get("sha256") != digests[name]:
+                state = sources[name] = {"sha256": digests[name], "articles": 0}
+            done = state["articles"]
+            for n, article in enumerate(read_source(path)):
+                if n >= done:
+                    yield name, article
+
+    def on_flush(finished: Dict[str, int]):
+        for name, count in finished.items():
+            sources[name]["articles"] += count
+        save_checkpoint(checkpoint_file, checkpoint)
+
+    embedder = ChunkEmbedder(
+        workers=settings.kb_import_workers if workers is None else workers,
+        batch_size=embed_batch or settings.kb_import_embed_batch
+    )
+    try:
+        stats = import_articles(articles(), embedder, on_flush=on_flush, **options)
+    finally:
+        embedder.close()
+    stats["files"] = len(files)
+    return stats
+
+
+# =============================================================================
+# API jobs
+# =============================================================================
+
+# Imports run one at a time in the background of the worker that accepted
+# them; their status is stored in kb_import_jobs so any worker can report it
+_job_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kb-import")
+
+# How often starting a job also deletes expired finished ones (seconds)
+JOB_PURGE_INTERVAL = 300
+_last_job_purge = 0.0
+
+
+def _job_record(row: KnowledgeImportJob) -> dict:
+    return {
+        "job_id": row.id,
+        "status": row.status,
+        "articles": row.articles,
+        "articles_done": row.articles_done,
+        "stats": json.loads(row.stats) if row.stats else None,
+        "error": row.error,
+        "created_at": row.created_at,
+        "finished_at": row.finished_at,
+    }
+
+
+def _update_job(job_id: str, **values) -> None:
+    """Update a job's row. Failures are logged, not raised (the import carries on)."""
+    db = SessionLocal()
+    try:
+        db.query(KnowledgeImportJob).filter(KnowledgeImportJob.id == job_id).update(
+            values, synchronize_session=False
+        )
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Failed to update knowledge import {job_id}: {e}")
+    finally:
+        db.close()
+
+
+def _run_job(job_id: str, articles: List[dict], options: dict) -> None:
+    _update_job(job_id, status="running")
+    QUEUE_DEPTH.labels(queue="kb_import").dec()
+
+    def on_flush(finished: Dict[str, int]):
+        _update_job(
+            job_id, articles_done=KnowledgeImportJob.articles_done + sum(finished.values())
+        )
+
+    embedder = ChunkEmbedder(workers=settings.kb_import_workers,
+                             batch_size=settings.kb_import_embed_batch)
+    try:
+        stats = import_articles(
+            (("api", article) for article in articles), embedder, on_flush=on_flush, **options
+        )
+        _update_job(job_id, status="completed", stats=json.dumps(stats), finished_at=datetime.utcnow())
+    except Exception as e:
+        logger.error(f"Knowledge import {job_id} failed: {e}")
+        _update_job(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+    finally:
+        embedder.close()
+
+
+def start_import_job(articles: List[dict], **options) -> dict:
+    """
+    Queue an import of already-parsed articles (from the API).
+
+    Articles are dicts with text and optional id, title, format
+    ("markdown", "html" or "text"), url and intent.
+    """
+    parsed = []
+    for n, article in enumerate(articles):
+        text, title = article["text"], article.get("title")
+        if article.get("format") == "html":
+            page_title, text = html_to_text(text)
+            title = title or page_title
+        elif article.get("format") == "markdown":
+            heading, text = markdown_to_text(text)
+            title = title or heading
+        key = article.get("id") or hashlib.sha1(f"{title}\n{text}".encode("utf-8")).hexdigest()
+        metadata = {k: article[k] for k in ("url", "intent") if article.get(k)}
+        parsed.append(_article(str(key), title, text, metadata))
+
+    _maybe_purge_jobs()
+    db = SessionLocal()
+    try:
+        row = KnowledgeImportJob(
+            id=str(uuid.uuid4()),
+            status="queued",
+            articles=len(parsed),
+            articles_done=0,
+            created_at=datetime.utcnow()
+        )
+        db.add(row)
+        db.commit()
+        job = _job_record(row)
+    finally:
+        db.close()
+
+    QUEUE_DEPTH.labels(queue="kb_import").inc()
+    _job_executor.submit(_run_job, job["job_id"], parsed, options)
+    return job
+
+
+def get_import_job(job_id: str) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        row = db.get(KnowledgeImportJob, job_id)
+        return _job_record(row) if row is not None else None
+    finally:
+        db.close()
+
+
+def purge_finished_jobs() -> int:
+    """Delete jobs that finished over KB_IMPORT_JOB_TTL_S ago. Returns how many were removed."""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.kb_import_job_ttl_s)
+    db = SessionLocal()
+    try:
+        removed = db.query(KnowledgeImportJob).filter(
+            KnowledgeImportJob.finished_at <= cutoff
+        ).delete(synchronize_session=False)
+        db.commit()
+        return removed
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.warning(f"Failed to purge finished knowledge imports: {e}")
+        return 0
+    finally:
+        db.close()
+
+
+def _maybe_purge_jobs() -> None:
+    global _last_job_purge
+    if time.monotonic() - _last_job_purge < JOB_PURGE_INTERVAL:
+        return
+    _last_job_purge = time.monotonic()
+    removed = purge_finished_jobs()
+    if removed:
+        logger.info(f"Purged {removed} finished knowledge import jobs")
@@ -1,27 +1,307 @@
-from app.services.vectorstore import get_vectorstore
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from typing import List, Optional
 
-def add_knowledge_document(text: str, metadata: dict):
+from app.config.settings import settings
+from app.services import ann_index
+from app.services.deadline import Deadline, bound
+from app.services.dedup import content_digest, find_duplicate, merge_metadata, simhash, unmerge_metadata
+from app.services.lexical_index import reciprocal_rank_fusion
+from app.services.metrics import KNOWLEDGE_SEARCH_DURATION
+from app.services.vectorstore import (
+    DEDUP_ATTACHMENT,
+    get_vectorstore,
+    get_embedding,
+    get_lexical_index,
+    update_vectorstore,
+    delete_documents,
+    get_intent_partitions,
+    get_tombstones,
+)
+
+logger = logging.getLogger(__name__)
+
+# Runs BM25 alongside the FAISS search
+_lexical_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="kb-lexical")
+
+
+def _get_document(vectorstore, doc_id: str):
+    """Look up a stored document by id, or None if absent."""
+    doc = vectorstore.docstore.search(doc_id)
+    return None if isinstance(doc, str) else doc
+
+
+def add_knowledge_document(text: str, metadata: dict, doc_id: Optional[str] = None):
     """
     Add a new document to the knowledge base
     """
-    vectorstore = get_vectorstore()
-    vectorstore.add_texts(
+    add_knowledge_documents(
         texts=[text],
-        metadatas=[metadata]
+        metadatas=[metadata],
+        ids=[doc_id] if doc_id else None
     )
 
 
-def search_knowledge_base(query: str, k: int = 3):
+def add_knowledge_documents(
+    texts: List[str],
+    metadatas: List[dict],
+    ids: Optional[List[str]] = None,
+    deduplicate: Optional[bool] = None,
+    vectors: Optional[List[List[float]]] = None,
+    delete_ids: Optional[List[str]] = None
+) -> int:
     """
-    Retrieve relevant docs for a support query
+    Add a batch of documents with one embedding call and one index write.
+
+    Callers that already embedded the texts (bulk import) pass `vectors`
+    and no embedding call is made. `delete_ids` are removed in the same
+    write (e.g. chunks an edited article no longer has).
+
+    When ids are given, writes are idempotent per id: an identical document
+    already in the index is skipped, a changed one replaces the old copy.
+
+    With deduplication on (settings.dedup_enabled by default), a document
+    that near-duplicates an indexed one (or an earlier one in the batch) is
+    merged into it: the canonical document's occurrence_count goes up and
+    the duplicate's id is recorded in merged_ids instead of being indexed.
+
+    Returns:
+        Number of documents written.
     """
     vectorstore = get_vectorstore()
-    results = vectorstore.similarity_search(query, k=k)
+    if vectorstore is None:
+        raise RuntimeError("Vector store is not available")
+
+    if deduplicate is None:
+        deduplicate = settings.dedup_enabled
+
+    if ids is not None:
+        # Skip unchanged documents before paying for embeddings
+        keep = [
+            i for i, doc_id in enumerate(ids)
+            if (existing := _get_document(vectorstore, doc_id)) is None
+            or existing.page_content != texts[i]
+        ]
+        texts = [texts[i] for i in keep]
+        metadatas = [metadatas[i] for i in keep]
+        ids = [ids[i] for i in keep]
+        if vectors is not None:
+            vectors = [vectors[i] for i in keep]
+    elif deduplicate:
+        # Merged duplicates are tracked by id, so every document needs one
+        ids = [str(uuid.uuid4()) for _ in texts]
+
+    delete_ids = [doc_id for doc_id in delete_ids or [] if doc_id not in (ids or ())]
+    if not texts and not delete_ids:
+        return 0
+
+    embedding = get_embedding()
+    if vectors is None:
+        vectors = embedding.embed_documents(texts) if texts else []
+    written = len(texts)
+
+    def write(store, attachments):
+        nonlocal written
+
+        rows = list(zip(texts, vectors, [dict(m or {}) for m in metadatas], ids or [None] * len(texts)))
+        if deduplicate:
+            rows = _merge_duplicates(store, attachments[DEDUP_ATTACHMENT], rows, embedding)
+        written = len(rows)
+
+        stale = [doc_id for doc_id in [*(ids or []), *delete_ids] if _get_document(store, doc_id) is not None]
+        if stale:
+            delete_documents(store, stale)
+        if not rows:
+            return
+        store.add_embeddings(
+            text_embeddings=[(text, vector) for text, vector, _, _ in rows],
+            metadatas=[metadata for _, _, metadata, _ in rows],
+            ids=[doc_id for _, _, _, doc_id in rows] if ids is not None else None
+        )
+
+    update_vectorstore(write)
+    return written
+
+
+def _merge_duplicates(store, dedup, rows, embedding) -> list:
+    """
+    Drop rows that near-duplicate an indexed or earlier pending document.
+
+    Runs inside the index write, so canonical documents are the ones in the
+    store being published. Their metadata is updated in place.
+    """
+    replaced = {doc_id for _, _, _, doc_id in rows}
+    pending = {}
+    kept = []
+
+    def candidate_vector(doc_id):
+        if doc_id in pending:
+            return pending[doc_id][1]
+        if doc_id in replaced:
+            # Superseded by this batch; its old text is not a canonical copy
+            return None
+        doc = _get_document(store, doc_id)
+        return None if doc is None else embedding.embed_documents([doc.page_content])[0]
+
+    for text, vector, metadata, doc_id in rows:
+        canonical_id = dedup.aliases.get(doc_id)
+        if canonical_id is not None:
+            canonical = _get_document(store, canonical_id)
+            if canonical is not None and dedup.alias_digests.get(doc_id) == content_digest(text):
+                # Already merged on an earlier write
+                continue
+            # Changed since it was merged (or its canonical is gone): the
+            # new text is evaluated afresh
+            if canonical is not None:
+                unmerge_metadata(canonical.metadata, doc_id)
+            dedup.remove_alias(doc_id)
+
+        fingerprint = simhash(text)
+        canonical_id = find_duplicate(
+            dedup, fingerprint, vector, candidate_vector, settings.dedup_min_similarity
+        )
+        if canonical_id is None:
+            dedup.add(doc_id, fingerprint)
+            pending[doc_id] = (text, vector, metadata, doc_id)
+            kept.append(pending[doc_id])
+            continue
 
+        canonical = pending.get(canonical_id)
+        merge_metadata(
+            canonical[2] if canonical else _get_document(store, canonical_id).metadata,
+            doc_id,
+            metadata
+        )
+        dedup.add_alias(doc_id, canonical_id, text)
+        logger.info(f"Merged near-duplicate knowledge document {doc_id} into {canonical_id}")
+
+    return kept
+
+
+def _to_result(doc_id: str, doc) -> dict:
+    return {
+        "id": doc_id,
+        "content": doc.page_content,
+        "metadata": doc.metadata
+    }
+
+
+def _vector_ranking(vectorstore, query_vector, k: int, positions=None) -> List[str]:
+    """Doc ids from a (possibly partition-restricted) vector search, best first."""
+    _, found = ann_index.search(
+        vectorstore.index,
+        [query_vector],
+        k,
+        positions=positions,
+        # Partitions only hold live documents; global searches skip deleted ones
+        exclude=get_tombstones(vectorstore) if positions is None else None,
+        nprobe=settings.ann_nprobe,
+        hnsw_ef_search=settings.ann_hnsw_ef_search
+    )
     return [
-        {
-            "content": doc.page_content,
-            "metadata": doc.metadata
-        }
-        for doc in results
+        vectorstore.index_to_docstore_id[int(position)]
+        for position in found[0]
+        if position >= 0
     ]
+
+
+def hybrid_search(
+    vectorstore,
+    lexical,
+    query: str,
+    query_vector,
+    k: int,
+    intent: Optional[str] = None,
+    positions=None,
+    budget_ms: Optional[float] = None
+) -> List[str]:
+    """
+    Lexical and vector search run together, merged by reciprocal rank fusion.
+
+    BM25 runs on a helper thread while FAISS searches on this one. If BM25
+    has not finished within the latency budget it is abandoned and the vector
+    ranking is returned alone.
+
+    Returns:
+        Doc ids, best first.
+    """
+    candidates = max(k * settings.retrieval_candidate_multiplier, k)
+    budget_ms = settings.retrieval_lexical_budget_ms if budget_ms is None else budget_ms
+
+    lexical_future = None
+    if lexical is not None and len(lexical):
+        deadline = time.monotonic() + budget_ms / 1000
+        lexical_future = _lexical_pool.submit(lexical.search, query, candidates, intent, deadline)
+
+    vector_ids = _vector_ranking(vectorstore, query_vector, candidates, positions)
+
+    lexical_ids: List[str] = []
+    if lexical_future is not None:
+        try:
+            remaining = max(deadline - time.monotonic(), 0.0)
+            lexical_ids = [doc_id for doc_id, _ in lexical_future.result(timeout=remaining)]
+        except FuturesTimeout:
+            # Frees the pool worker if the search has not started; a running
+            # search stops itself at the same deadline
+            lexical_future.cancel()
+            logger.warning(f"Lexical search exceeded {budget_ms}ms budget, using vector results only")
+
+    if not lexical_ids:
+        return vector_ids[:k]
+    return reciprocal_rank_fusion([vector_ids, lexical_ids], k, rrf_k=settings.retrieval_rrf_k)
+
+
+@KNOWLEDGE_SEARCH_DURATION.time()
+def search_knowledge_base(
+    query: str,
+    k: int = 3,
+    intent: Optional[str] = None,
+    deadline: Optional[Deadline] = None
+):
+    """
+    Retrieve relevant docs for a support query
+
+    Hybrid BM25 + vector retrieval (see hybrid_search). With an intent, only
+    that intent's documents are searched first (pre-filtered, so all k slots
+    go to same-intent documents). When that yields fewer than k hits, the
+    remaining slots are filled from a global search.
+
+    With a deadline, the query embedding waits no longer than the time left
+    and the lexical budget shrinks to fit it.
+    """
+    vectorstore = get_vectorstore()
+    lexical = get_lexical_index()
+    with bound(deadline):
+        query_vector = get_embedding().embed_query(query)
+
+    budget_ms = settings.retrieval_lexical_budget_ms
+    if deadline is not None:
+        budget_ms = min(budget_ms, deadline.remaining() * 1000)
+
+    doc_ids: List[str] = []
+    if intent:
+        positions = get_intent_partitions(vectorstore).get(intent)
+        if positions is not None and len(positions):
+            doc_ids = hybrid_search(
+                vectorstore, lexical, query, query_vector, k,
+                intent=intent, positions=positions, budget_ms=budget_ms
+            )
+
+    if len(doc_ids) < k:
+        # Over-fetch by the hits already held: the global search finds them again
+        for doc_id in hybrid_search(
+            vectorstore, lexical, query, query_vector, k + len(doc_ids), budget_ms=budget_ms
+        ):
+            if len(doc_ids) >= k:
+                break
+            if doc_id not in doc_ids:
+                doc_ids.append(doc_id)
+
+    results = []
+    for doc_id in doc_ids:
+        doc = _get_document(vectorstore, doc_id)
+        if doc is not None:
+            results.append(_to_result(doc_id, doc))
+    return results
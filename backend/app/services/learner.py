@@ -0,0 +1,160 @@
+"""
+Background learner.
+Drains pending feedback from the database into the knowledge base in batches.
+
+Feedback rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED so several
+workers can run a learner without double-processing. Each batch is embedded
+in one model call and written to the index in one operation; the document id
+is derived from the ticket id, so retries and resubmissions never duplicate.
+
+Every index write republishes the whole snapshot (see vectorstore), so its
+cost grows with the corpus, not with the batch. After a submission wakes the
+learner it waits LEARNER_BATCH_WAIT seconds for more feedback, so a steady
+trickle is learned in one write per window rather than one per submission.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.config.settings import settings
+from app.db.session import SessionLocal
+from app.models.feedback import Feedback
+from app.services.feedback_documents import build_feedback_document, feedback_document_id
+from app.services.knowledge_base import add_knowledge_documents
+
+logger = logging.getLogger(__name__)
+
+# Retry backoff for failed batches
+RETRY_BASE_DELAY = 5.0
+RETRY_BACKOFF_MULTIPLIER = 2.0
+
+_thread: threading.Thread | None = None
+_stop = threading.Event()
+_wake = threading.Event()
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=RETRY_BASE_DELAY * (RETRY_BACKOFF_MULTIPLIER ** (attempts - 1)))
+
+
+def _claim_query(db, now: datetime, batch_size: int):
+    """Due pending feedback, oldest first, skipping rows another learner has locked."""
+    return (
+        db.query(Feedback)
+        .filter(Feedback.status == "pending")
+        .filter(Feedback.next_attempt_at <= now)
+        .order_by(Feedback.created_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def drain_pending_feedback(batch_size: int | None = None) -> int:
+    """
+    Learn one batch of pending feedback.
+
+    Returns:
+        Number of feedback rows claimed (0 when the queue is empty).
+    """
+    batch_size = batch_size or settings.learner_batch_size
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        rows = _claim_query(db, now, batch_size).all()
+        if not rows:
+            db.rollback()
+            return 0
+
+        texts, metadatas, ids = [], [], []
+        for row in rows:
+            document = build_feedback_document({
+                "ticket_id": row.ticket_id,
+                "ticket_text": row.ticket_text,
+                "final_response": row.final_response,
+                "human_feedback": row.content,
+                "intent": row.intent
+            })
+            if document is None:
+                continue
+            doc_id = feedback_document_id(row.ticket_id)
+            if doc_id in ids:
+                # Newer feedback for the same ticket wins within a batch
+                index = ids.index(doc_id)
+                texts[index], metadatas[index] = document
+                continue
+            texts.append(document[0])
+            metadatas.append(document[1])
+            ids.append(doc_id)
+
+        try:
+            written = add_knowledge_documents(texts, metadatas, ids) if texts else 0
+        except Exception as e:
+            logger.error(f"Learning batch of {len(rows)} failed: {e}")
+            for row in rows:
+                row.attempts += 1
+                row.last_error = str(e)
+                if row.attempts >= settings.learner_max_attempts:
+                    row.status = "failed"
+                else:
+                    row.next_attempt_at = now + _retry_delay(row.attempts)
+            db.commit()
+            return len(rows)
+
+        processed_at = datetime.utcnow()
+        for row in rows:
+            row.status = "learned"
+            row.processed_at = processed_at
+            row.last_error = None
+        db.commit()
+        logger.info(f"Learned {written} documents from {len(rows)} feedback rows")
+        return len(rows)
+
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Failed to drain feedback queue: {e}")
+        return 0
+    finally:
+        db.close()
+
+
+def notify_feedback_pending() -> None:
+    """Wake the learner early after new feedback is committed."""
+    _wake.set()
+
+
+def _run() -> None:
+    while not _stop.is_set():
+        try:
+            claimed = drain_pending_feedback()
+        except Exception as e:
+            logger.error(f"Learner iteration failed: {e}")
+            claimed = 0
+
+        if claimed < settings.learner_batch_size:
+            # Queue drained: sleep until feedback arrives, then let more of
+            # it arrive so it shares one index write
+            woken = _wake.wait(settings.learner_poll_interval)
+            _wake.clear()
+            if woken:
+                _stop.wait(settings.learner_batch_wait)
+
+
+def start_learner() -> None:
+    """Start the background learner thread (idempotent)."""
+    global _thread
+    if not settings.learner_enabled or (_thread and _thread.is_alive()):
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="feedback-learner", daemon=True)
+    _thread.start()
+    logger.info("Background learner started")
+
+
+def stop_learner(timeout: float = 10.0) -> None:
+    """Stop the learner, letting an in-progress batch finish."""
+    _stop.set()
+    _wake.set()
+    if _thread:
+        _thread.join(timeout)
@@ -0,0 +1,159 @@
+"""
+In-process BM25 inverted index for the knowledge base.
+
+Complements vector search for exact identifiers (error codes, plan names,
+invoice numbers) that sentence embeddings blur together. Documents are keyed
+by docstore id, so the index survives FAISS position renumbering, and it is
+persisted inside each vector store snapshot.
+"""
+import math
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Identifier-friendly tokens: keeps "ERR-502", "INV_2024_001", "v2.3.1" whole
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+
+# Common English words that carry no retrieval signal
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have i if in is it its me my no not of on or
+our so that the their them there this to was we were what when which who will with you your
+""".split())
+
+# Postings scored between deadline checks (also checked before each term)
+_DEADLINE_CHECK_EVERY = 1024
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased tokens; compound identifiers also yield their parts."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if not token.isalnum():  # compound: contains - _ or .
+            tokens.extend(part for part in re.split(r"[-_.]", token) if part and part not in STOPWORDS)
+    return tokens
+
+
+def _expired(deadline: Optional[float]) -> bool:
+    return deadline is not None and time.monotonic() > deadline
+
+
+class BM25Index:
+    """
+    Incrementally updatable BM25 (Okapi) index.
+
+    Usage:
+        index = BM25Index()
+        index.add("feedback:123", "Error ERR-502 on checkout", intent="technical")
+        index.search("ERR-502", k=5)   # [("feedback:123", 2.1)]
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.doc_intents: Dict[str, str] = {}
+        self.doc_terms: Dict[str, Tuple[str, ...]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.doc_lengths
+
+    def add(self, doc_id: str, text: str, intent: Optional[str] = None) -> None:
+        """Index a document (replacing any previous version with the same id)."""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        length = sum(counts.values())
+        self.doc_terms[doc_id] = tuple(counts)
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+        if intent:
+            self.doc_intents[doc_id] = intent
+
+    def remove(self, doc_id: str) -> None:
+        length = self.doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        self.doc_intents.pop(doc_id, None)
+        for term in self.doc_terms.pop(doc_id, ()):
+            docs = self.postings.get(term)
+            if docs is None:
+                continue
+            docs.pop(doc_id, None)
+            if not docs:
+                del self.postings[term]
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        intent: Optional[str] = None,
+        deadline: Optional[float] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Top-k documents by BM25 score.
+
+        Args:
+            intent: Only score documents tagged with this intent.
+            deadline: time.monotonic() value; scoring stops early (returning
+                the best found so far) once it passes, and nothing is scored
+                if it already has.
+
+        Returns:
+            [(doc_id, score)] best first.
+        """
+        n_docs = len(self.doc_lengths)
+        if not n_docs or _expired(deadline):
+            return []
+        avg_length = self.total_length / n_docs
+
+        # Rarest terms first so an early stop keeps the most selective evidence
+        terms = sorted(
+            {t for t in tokenize(query) if t in self.postings},
+            key=lambda t: len(self.postings[t])
+        )
+
+        scores: Dict[str, float] = {}
+        scored = 0
+        expired = False
+        for term in terms:
+            if expired or _expired(deadline):
+                break
+            docs = self.postings[term]
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                scored += 1
+                if scored % _DEADLINE_CHECK_EVERY == 0 and _expired(deadline):
+                    expired = True
+                    break
+                if intent is not None and self.doc_intents.get(doc_id) != intent:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int, rrf_k: int = 60) -> List[str]:
+    """
+    Merge ranked id lists: score(d) = sum(1 / (rrf_k + rank)).
+
+    Returns:
+        Top-k ids, best first.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]]
@@ -0,0 +1,541 @@
+"""
+Graceful shutdown and recovery of ticket processing.
+
+Every graph run serving a ticket is tracked while it executes (track()).
+Stream runs are background threads that outlive their request. On SIGTERM
+or SIGINT the process starts draining:
+
+- /health/ready reports 503 and admission control rejects new ticket work
+  (503, reason shutting_down), so traffic moves to other instances
+- runs in flight get up to SHUTDOWN_DRAIN_S to finish
+- runs still going at the deadline are checkpointed (their inputs saved in
+  ticket_checkpoints), their tickets set to "requeued", and their streams
+  ended with an error event telling the client the ticket was queued
+- a checkpointed run's Idempotency-Key is completed with that "requeued"
+  outcome, so client retries are answered at once rather than waiting for
+  a run that is gone; the key is kept on the checkpoint and completed again
+  with the real result once recovery re-runs the ticket (or released, if
+  that fails, so a retry runs again)
+
+A checkpointed run that still finishes before the process exits stores its
+result as usual and drops its checkpoint.
+
+On startup, start_recovery() sweeps for work left behind once warm-up is
+done:
+
+- tickets stuck in "processing" for longer than RECOVERY_STALE_AFTER_S are
+  orphans of a process that died without draining; they are requeued from
+  their stored text, and the Idempotency-Key the routes stored on the ticket
+  when the run started is handled as for a checkpointed run
+- requeued tickets are claimed one at a time and run again at batch
+  priority, up to RECOVERY_MAX_ATTEMPTS times in total
+
+A run going on for longer than a third of RECOVERY_STALE_AFTER_S has its
+ticket's heartbeat_at refreshed at that interval, so another worker's sweep
+never requeues a ticket that is still being processed, even a run without a
+deadline. start_recovery() also refuses a staleness threshold below
+DEADLINE_MAX_MS.
+"""
+import logging
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.config.settings import settings
+from app.db.session import SessionLocal
+from app.models.ticket import Ticket
+from app.models.ticket_checkpoint import TicketCheckpoint
+from app.schemas.response import TicketResponse, TicketResult
+from app.services import idempotency
+
+logger = logging.getLogger(__name__)
+
+REQUEUED = "requeued"
+SHUTDOWN_MESSAGE = "Server shutting down; ticket queued for reprocessing"
+ORPHANED_MESSAGE = "Processing was interrupted; ticket queued for reprocessing"
+RECOVERY_ROUTE = "recovery"
+
+# How long the recovery sweep waits for warm-up before giving up (seconds)
+RECOVERY_READY_TIMEOUT = 600.0
+DRAIN_POLL_INTERVAL = 0.1
+# Heartbeats per RECOVERY_STALE_AFTER_S
+HEARTBEATS_PER_STALE_WINDOW = 3
+
+
+class GraphRun:
+    """A graph run in progress, with what is needed to run it again."""
+
+    def __init__(self, ticket_id: str, route: str, ticket_text: str,
+                 original_ticket_text: Optional[str], stream_queue=None,
+                 idempotency_route: Optional[str] = None, idempotency_key: Optional[str] = None):
+        self.ticket_id = ticket_id
+        self.route = route
+        self.ticket_text = ticket_text
+        self.original_ticket_text = original_ticket_text
+        self.stream_queue = stream_queue
+        self.idempotency_route = idempotency_route
+        self.idempotency_key = idempotency_key
+        self.started_at = time.monotonic()
+        self.checkpointed = False
+
+
+_runs: Dict[int, GraphRun] = {}
+_runs_lock = threading.Lock()
+_draining = threading.Event()
+_drain_thread: Optional[threading.Thread] = None
+_recovery_thread: Optional[threading.Thread] = None
+_heartbeat_thread: Optional[threading.Thread] = None
+
+
+def is_draining() -> bool:
+    return _draining.is_set()
+
+
+def in_flight() -> int:
+    with _runs_lock:
+        return len(_runs)
+
+
+@contextmanager
+def track(ticket_id: str, route: str, ticket_text: str,
+          original_ticket_text: Optional[str] = None, stream_queue=None,
+          idempotency_key: Optional[str] = None, idempotency_route: Optional[str] = None):
+    """
+    Track a graph run (including storing its result) for the shutdown drain.
+
+    `stream_queue` is ended with an error event if the run is checkpointed.
+    `idempotency_key` (scoped to `idempotency_route`, by default `route`) is
+    the request's Idempotency-Key, completed for it if it is checkpointed.
+    """
+    global _heartbeat_thread
+    run = GraphRun(
+        ticket_id, route, ticket_text, original_ticket_text, stream_queue,
+        idempotency_route or route if idempotency_key else None, idempotency_key
+    )
+    with _runs_lock:
+        _runs[id(run)] = run
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat, name="run-heartbeat", daemon=True)
+            _heartbeat_thread.start()
+    try:
+        yield run
+    finally:
+        with _runs_lock:
+            _runs.pop(id(run), None)
+            checkpointed = run.checkpointed
+        if checkpointed:
+            # Finished after all: the result is stored, nothing to re-run
+            _delete_checkpoint(run.ticket_id)
+
+
+def _heartbeat_interval() -> float:
+    return settings.recovery_stale_after_s / HEARTBEATS_PER_STALE_WINDOW
+
+
+def _touch(ticket_ids) -> None:
+    """Refresh heartbeat_at of tickets still being processed."""
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Ticket)
+            .where(Ticket.id.in_(ticket_ids))
+            .where(Ticket.status == "processing")
+            # updated_at must keep marking the start of the run (analytics latency)
+            .values(heartbeat_at=datetime.utcnow(), updated_at=Ticket.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Failed to refresh heartbeat of {len(ticket_ids)} tickets: {e}")
+    finally:
+        db.close()
+
+
+def _heartbeat() -> None:
+    """Keep tickets of long runs from looking orphaned (runs for the process lifetime)."""
+    while True:
+        interval = _heartbeat_interval()
+        time.sleep(interval)
+        now = time.monotonic()
+        with _runs_lock:
+            # Shorter runs are covered by the updated_at of their start
+            ticket_ids = sorted({run.ticket_id for run in _runs.values() if now - run.started_at >= interval})
+        if ticket_ids:
+            _touch(ticket_ids)
+
+
+# =============================================================================
+# Shutdown
+# =============================================================================
+
+def _complete_idempotency_key(route: str, key: str, ticket_id: str, status: str,
+                              result: Optional[dict] = None, error: Optional[str] = None) -> None:
+    """
+    Store a ticket's outcome for its Idempotency-Key, in the shape its route
+    replays. A failure releases the key instead, as the routes do.
+    """
+    if status == "failed":
+        idempotency.release(route, key)
+        return
+    if route == idempotency.STREAM_ROUTE:
+        if result is not None:
+            outcome = {"type": "final_result", "data": result}
+        else:
+            outcome = {"type": "error", "error": error, "ticket_id": ticket_id}
+        response = {"ticket_id": ticket_id, "final_result": outcome}
+    else:
+        result = result or {}
+        response = TicketResponse(
+            ticket_id=ticket_id,
+            status=status,
+            result=TicketResult(
+                status=status,
+                ticket_text=result.get("ticket_text"),
+                intent=result.get("intent"),
+                confidence=result.get("confidence"),
+                proposed_solution=result.get("proposed_solution"),
+                final_response=result.get("final_response"),
+                error_message=error or result.get("error_message")
+            )
+        ).model_dump()
+    idempotency.complete(route, key, response)
+
+
+def _checkpoint(run: GraphRun) -> None:
+    """Save an unfinished run's inputs and requeue its ticket."""
+    db = SessionLocal()
+    try:
+        checkpoint = db.get(TicketCheckpoint, run.ticket_id)
+        if checkpoint is None:
+            db.add(TicketCheckpoint(
+                ticket_id=run.ticket_id,
+                ticket_text=run.ticket_text,
+                original_ticket_text=run.original_ticket_text,
+                idempotency_route=run.idempotency_route,
+                idempotency_key=run.idempotency_key,
+                reason="shutdown"
+            ))
+        else:
+            checkpoint.reason = "shutdown"
+        ticket = db.get(Ticket, run.ticket_id)
+        requeued = ticket is not None and ticket.status == "processing"
+        if requeued:
+            ticket.status = REQUEUED
+        db.commit()
+    finally:
+        db.close()
+    if requeued and run.idempotency_key:
+        # Otherwise retries wait for a result that never comes, then get 409
+        # until the key expires
+        _complete_idempotency_key(
+            run.idempotency_route, run.idempotency_key, run.ticket_id, REQUEUED, error=SHUTDOWN_MESSAGE
+        )
+
+
+def _drain(timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    with _runs_lock:
+        pending = len(_runs)
+    if pending:
+        logger.info(f"Draining {pending} graph runs (up to {timeout:.0f}s)")
+    while time.monotonic() < deadline:
+        with _runs_lock:
+            if not _runs:
+                logger.info("Drain complete")
+                return
+        time.sleep(DRAIN_POLL_INTERVAL)
+
+    with _runs_lock:
+        unfinished = list(_runs.values())
+        for run in unfinished:
+            run.checkpointed = True
+    saved = 0
+    for run in unfinished:
+        try:
+            _checkpoint(run)
+            saved += 1
+        except SQLAlchemyError as e:
+            logger.error(f"Failed to checkpoint ticket {run.ticket_id}: {e}")
+        if run.stream_queue is not None:
+            run.stream_queue.put({"type": "error", "error": SHUTDOWN_MESSAGE, "ticket_id": run.ticket_id})
+            run.stream_queue.put(None)
+    logger.warning(f"Drain deadline passed: requeued {saved} of {len(unfinished)} unfinished graph runs")
+
+
+def begin_drain(timeout: Optional[float] = None) -> None:
+    """Stop taking new work and drain in-flight runs in the background (idempotent)."""
+    global _drain_thread
+    if _draining.is_set():
+        return
+    _draining.set()
+    timeout = settings.shutdown_drain_s if timeout is None else timeout
+    _drain_thread = threading.Thread(target=_drain, args=(timeout,), name="drain", daemon=True)
+    _drain_thread.start()
+
+
+def drain(timeout: Optional[float] = None) -> None:
+    """Drain (if not already started by a signal) and wait for it to finish."""
+    begin_drain(timeout)
+    if _drain_thread is not None:
+        _drain_thread.join()
+
+
+def install_signal_handlers() -> None:
+    """
+    Start draining as soon as SIGTERM/SIGINT arrives, then hand the signal
+    to the server's own handler. The server waits for open connections
+    before running shutdown hooks, and ending the streams of overdue runs is
+    what lets it get there within the drain deadline.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(sig)
+
+        def handler(signum, frame, previous=previous):
+            begin_drain()
+            if callable(previous):
+                previous(signum, frame)
+            elif previous == signal.SIG_DFL:
+                signal.signal(signum, signal.SIG_DFL)
+                signal.raise_signal(signum)
+
+        signal.signal(sig, handler)
+
+
+# =============================================================================
+# Startup recovery
+# =============================================================================
+
+def _delete_checkpoint(ticket_id: str) -> None:
+    db = SessionLocal()
+    try:
+        db.query(TicketCheckpoint).filter(TicketCheckpoint.ticket_id == ticket_id).delete()
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Failed to delete checkpoint for ticket {ticket_id}: {e}")
+    finally:
+        db.close()
+
+
+def _orphan_checkpoint(ticket: Ticket) -> TicketCheckpoint:
+    # The message of an interrupted follow-up is lost; re-run the ticket text
+    return TicketCheckpoint(
+        ticket_id=ticket.id,
+        ticket_text=ticket.text,
+        idempotency_route=ticket.idempotency_route,
+        idempotency_key=ticket.idempotency_key,
+        reason="orphaned"
+    )
+
+
+def requeue_orphans() -> int:
+    """
+    Requeue tickets left in "processing" by a process that died.
+
+    Returns:
+        Number of tickets requeued.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.recovery_stale_after_s)
+    db = SessionLocal()
+    try:
+        tickets = (
+            db.query(Ticket)
+            .filter(Ticket.status == "processing")
+            .filter(Ticket.updated_at < cutoff)
+            .filter(or_(Ticket.heartbeat_at.is_(None), Ticket.heartbeat_at < cutoff))
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        keys = []
+        for ticket in tickets:
+            if db.get(TicketCheckpoint, ticket.id) is None:
+                db.add(_orphan_checkpoint(ticket))
+            ticket.status = REQUEUED
+            if ticket.idempotency_key:
+                keys.append((ticket.idempotency_route, ticket.idempotency_key, ticket.id))
+        db.commit()
+        if tickets:
+            logger.warning(f"Requeued {len(tickets)} orphaned tickets")
+        for route, key, ticket_id in keys:
+            _complete_idempotency_key(route, key, ticket_id, REQUEUED, error=ORPHANED_MESSAGE)
+        return len(tickets)
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Orphaned ticket sweep failed: {e}")
+        return 0
+    finally:
+        db.close()
+
+
+def _claim_requeued() -> Tuple[bool, Optional[TicketCheckpoint]]:
+    """
+    Move the oldest requeued ticket back to processing.
+
+    Returns:
+        (False, None) if nothing is queued; otherwise (True, its checkpoint,
+        detached), with None instead if the ticket ran out of attempts.
+    """
+    db = SessionLocal()
+    try:
+        ticket = (
+            db.query(Ticket)
+            .filter(Ticket.status == REQUEUED)
+            .order_by(Ticket.updated_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if ticket is None:
+            db.rollback()
+            return False, None
+
+        checkpoint = db.get(TicketCheckpoint, ticket.id)
+        if checkpoint is None:
+            checkpoint = _orphan_checkpoint(ticket)
+            db.add(checkpoint)
+        checkpoint.attempts = (checkpoint.attempts or 0) + 1
+        if checkpoint.attempts > settings.recovery_max_attempts:
+            ticket.status = "failed"
+            ticket.error_message = f"Processing interrupted {checkpoint.attempts - 1} times; not retried"
+            idempotency_route, idempotency_key = checkpoint.idempotency_route, checkpoint.idempotency_key
+            db.delete(checkpoint)
+            db.commit()
+            logger.error(f"Ticket {ticket.id} gave up after {checkpoint.attempts - 1} interrupted runs")
+            if idempotency_key:
+                _complete_idempotency_key(
+                    idempotency_route, idempotency_key, ticket.id, "failed", error=ticket.error_message
+                )
+            return True, None
+
+        ticket.status = "processing"
+        db.commit()
+        db.refresh(checkpoint)
+        db.expunge(checkpoint)
+        return True, checkpoint
+    finally:
+        db.close()
+
+
+def _reprocess(checkpoint: TicketCheckpoint) -> None:
+    """Run a claimed ticket through the graph again and store the result."""
+    from app.graph.graph import get_graph
+    from app.services import deadline as request_deadline
+    from app.services.llm_scheduler import BATCH, priority
+
+    ticket_id = checkpoint.ticket_id
+    deadline = request_deadline.for_request(None, settings.deadline_tickets_ms)
+    result = None
+    with track(
+        ticket_id, RECOVERY_ROUTE, checkpoint.ticket_text, checkpoint.original_ticket_text,
+        idempotency_key=checkpoint.idempotency_key, idempotency_route=checkpoint.idempotency_route
+    ):
+        db = SessionLocal()
+        try:
+            ticket = db.get(Ticket, ticket_id)
+            try:
+                with priority(BATCH):
+                    result = get_graph().invoke(
+                        {
+                            "ticket_id": ticket_id,
+                            "ticket_text": checkpoint.ticket_text,
+                            "original_ticket_text": checkpoint.original_ticket_text or checkpoint.ticket_text,
+                            "needs_human": False,
+                            "status": "processing"
+                        },
+                        config={"configurable": {"deadline": deadline}}
+                    )
+                ticket.intent = result.get("intent")
+                ticket.confidence = result.get("confidence")
+                ticket.proposed_solution = result.get("proposed_solution")
+                ticket.status = result.get("status", "resolved")
+                ticket.error_message = result.get("error_message")
+            except Exception as e:
+                logger.error(f"Reprocessing ticket {ticket_id} failed: {e}")
+                ticket.status = "failed"
+                ticket.error_message = str(e)
+            db.commit()
+            status, error = ticket.status, ticket.error_message
+            logger.info(f"Recovered ticket {ticket_id} with status: {status}")
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Failed to update recovered ticket {ticket_id}: {e}")
+            return
+        finally:
+            db.close()
+    if checkpoint.idempotency_key:
+        _complete_idempotency_key(
+            checkpoint.idempotency_route, checkpoint.idempotency_key, ticket_id, status,
+            result=result if status != "failed" else None, error=error if status == "failed" else None
+        )
+    _delete_checkpoint(ticket_id)
+
+
+def recover() -> int:
+    """
+    Requeue orphans, then re-run requeued tickets until none are left or
+    the process starts draining.
+
+    Returns:
+        Number of tickets re-run.
+    """
+    requeue_orphans()
+    recovered = 0
+    while not is_draining():
+        try:
+            found, checkpoint = _claim_requeued()
+        except SQLAlchemyError as e:
+            logger.error(f"Failed to claim a requeued ticket: {e}")
+            break
+        if not found:
+            break
+        if checkpoint is None:
+            continue
+        _reprocess(checkpoint)
+        recovered += 1
+    if recovered:
+        logger.info(f"Recovery re-ran {recovered} tickets")
+    return recovered
+
+
+def _run_recovery() -> None:
+    from app.services.warmup import is_ready
+
+    waited = 0.0
+    while not is_ready() and not is_draining():
+        if waited >= RECOVERY_READY_TIMEOUT:
+            logger.error("Recovery skipped: warm-up did not finish")
+            return
+        time.sleep(1.0)
+        waited += 1.0
+    try:
+        recover()
+    except Exception as e:
+        logger.error(f"Recovery failed: {e}")
+
+
+def validate_settings() -> None:
+    """Raise ValueError if the orphan sweep could requeue a ticket whose run is still going."""
+    if settings.deadline_max_ms > 0 and settings.recovery_stale_after_s * 1000 <= settings.deadline_max_ms:
+        raise ValueError(
+            f"RECOVERY_STALE_AFTER_S ({settings.recovery_stale_after_s:g}) must exceed "
+            f"DEADLINE_MAX_MS ({settings.deadline_max_ms}) in seconds"
+        )
+
+
+def start_recovery() -> None:
+    """Run the startup recovery sweep on a background thread once warm-up is done."""
+    global _recovery_thread
+    if not settings.recovery_enabled or _recovery_thread is not None:
+        return
+    validate_settings()
+    _recovery_thread = threading.Thread(target=_run_recovery, name="recovery", daemon=True)
+    _recovery_thread.start()
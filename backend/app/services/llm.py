@@ -5,52 +5,135 @@ Uses OpenRouter API via the OpenAI client.
 import json
 import time
 import logging
+from contextlib import contextmanager
 from typing import TypeVar, Type
 
-from openai import OpenAI, APIError, RateLimitError, AuthenticationError
+from openai import OpenAI, APIError, APITimeoutError, RateLimitError, AuthenticationError
 from pydantic import BaseModel, ValidationError
 
 from app.config.settings import settings
+from app.services.context_assembly import estimate_tokens
+from app.services.deadline import Deadline, has_time, time_left
+from app.services.llm_cassette import get_cassette
+from app.services.llm_scheduler import current_priority, scheduler
+from app.services.metrics import (
+    LLM_ERRORS,
+    LLM_REQUEST_DURATION,
+    LLM_RETRIES,
+    LLM_TIME_TO_FIRST_TOKEN,
+    LLM_TOKENS,
+)
 from app.services.exceptions import (
     LLMError,
     LLMRateLimitError,
     LLMAuthError,
     LLMUnavailableError,
     LLMResponseParseError,
+    LLMTimeoutError,
 )
 
 logger = logging.getLogger(__name__)
 
 T = TypeVar("T", bound=BaseModel)
 
-# OpenRouter client
+# OpenRouter client (or any OpenAI-compatible endpoint, e.g. the local mock)
 client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
+    base_url=settings.llm_base_url,
     api_key=settings.openrouter_api_key,
 )
 
+# Sampling parameters of every call (also part of the cassette key)
+COMPLETION_PARAMS = {"temperature": 0.2}
+
 # Retry configuration
 MAX_RETRIES = 3
 BASE_DELAY = 1.0
 BACKOFF_MULTIPLIER = 2.0
 
 
-def _call_llm(prompt: str) -> str:
+def _client_for(deadline: Deadline | None):
+    """
+    Client for one attempt. Under a deadline each attempt is bounded by the
+    time left, and the client's own hidden retries are off (ours are
+    deadline-aware).
+    """
+    if deadline is None:
+        return client
+    return client.with_options(timeout=max(deadline.remaining(), 0.001), max_retries=0)
+
+
+def _check_time(deadline: Deadline | None) -> None:
+    if not has_time(deadline, settings.deadline_min_llm_ms / 1000):
+        LLM_ERRORS.labels(error_type="LLMTimeoutError").inc()
+        raise LLMTimeoutError(f"Deadline too close for an LLM call ({deadline.remaining_ms()}ms left)")
+
+
+@contextmanager
+def _slot(deadline: Deadline | None):
+    """Scheduler slot at the context's priority, queueing no longer than the deadline allows."""
+    priority_class = current_priority()
+    try:
+        scheduler.acquire(priority_class, timeout=time_left(deadline))
+    except LLMTimeoutError:
+        LLM_ERRORS.labels(error_type="LLMTimeoutError").inc()
+        raise
+    try:
+        yield
+    finally:
+        scheduler.release(priority_class)
+
+
+def _call_llm(prompt: str, deadline: Deadline | None = None) -> str:
     """
     Internal LLM call with retry and error mapping.
-    Raises custom exceptions on failure.
+    Raises custom exceptions on failure. With a deadline, retries that would
+    not fit in the time left are skipped. A cassette in replay mode answers
+    recorded prompts without calling upstream.
     """
+    cassette = get_cassette()
+    if cassette is not None:
+        chunks = cassette.lookup(prompt, settings.openrouter_model, COMPLETION_PARAMS)
+        if chunks is not None:
+            return "".join(chunks)
+
     last_exception: Exception | None = None
     delay = BASE_DELAY
+    retries_skipped = False
 
+    _check_time(deadline)
     for attempt in range(MAX_RETRIES):
+        start = time.perf_counter()
         try:
-            response = client.chat.completions.create(
-                model=settings.openrouter_model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
+            with _slot(deadline):
+                start = time.perf_counter()
+                response = _client_for(deadline).chat.completions.create(
+                    model=settings.openrouter_model,
+                    messages=[{"role": "user", "content": prompt}],
+                    **COMPLETION_PARAMS
+                )
+            content = response.choices[0].message.content or ""
+            LLM_REQUEST_DURATION.labels(mode="complete", outcome="ok").observe(
+                time.perf_counter() - start
             )
-            return response.choices[0].message.content or ""
+            _count_tokens(prompt, content, getattr(response, "usage", None))
+            if cassette is not None:
+                cassette.record(prompt, settings.openrouter_model, COMPLETION_PARAMS, [content])
+            return content
+
+        except LLMTimeoutError:
+            # No scheduler slot before the deadline
+            raise
+
+        except APITimeoutError as e:
+            # Under a deadline the attempt timeout is all the time left
+            if deadline is not None:
+                LLM_REQUEST_DURATION.labels(mode="complete", outcome="error").observe(
+                    time.perf_counter() - start
+                )
+                LLM_ERRORS.labels(error_type="LLMTimeoutError").inc()
+                raise LLMTimeoutError(f"LLM call timed out at the deadline: {e}", original_error=e)
+            last_exception = LLMError(f"API error: {e}", original_error=e)
+            logger.warning(f"LLM timeout, retry {attempt + 1}/{MAX_RETRIES}")
 
         except RateLimitError as e:
             last_exception = LLMRateLimitError(
@@ -60,10 +143,14 @@ def _call_llm(prompt: str) -> str:
 
         except AuthenticationError as e:
             # Don't retry auth errors
+            LLM_REQUEST_DURATION.labels(mode="complete", outcome="error").observe(
+                time.perf_counter() - start
+            )
+            LLM_ERRORS.labels(error_type="LLMAuthError").inc()
             raise LLMAuthError(f"Authentication failed: {e}", original_error=e)
 
         except APIError as e:
-            if e.status_code in (404, 503):
+            if getattr(e, "status_code", None) in (404, 503):
                 last_exception = LLMUnavailableError(
                     f"Service unavailable: {e}", original_error=e
                 )
@@ -75,23 +162,107 @@ def _call_llm(prompt: str) -> str:
             last_exception = LLMError(f"Unexpected error: {e}", original_error=e)
             logger.error(f"Unexpected LLM error: {e}")
 
+        LLM_REQUEST_DURATION.labels(mode="complete", outcome="error").observe(
+            time.perf_counter() - start
+        )
+
         # Exponential backoff
         if attempt < MAX_RETRIES - 1:
+            if not has_time(deadline, delay + settings.deadline_min_llm_ms / 1000):
+                retries_skipped = True
+                logger.warning(f"Skipping LLM retries: {deadline.remaining_ms()}ms left")
+                break
+            LLM_RETRIES.labels(error_type=type(last_exception).__name__).inc()
             time.sleep(delay)
             delay *= BACKOFF_MULTIPLIER
 
-    raise last_exception or LLMError("LLM call failed after retries")
+    last_exception = last_exception or LLMError("LLM call failed after retries")
+    if retries_skipped:
+        last_exception = type(last_exception)(
+            f"{last_exception.message} (retries skipped: deadline)",
+            original_error=last_exception.original_error
+        )
+    LLM_ERRORS.labels(error_type=type(last_exception).__name__).inc()
+    raise last_exception
+
+
+def _count_tokens(prompt: str, completion: str, usage=None) -> None:
+    """Token counters from provider usage, or a local estimate when absent."""
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        LLM_TOKENS.labels(direction="in").inc(usage.prompt_tokens)
+        LLM_TOKENS.labels(direction="out").inc(usage.completion_tokens or 0)
+    else:
+        LLM_TOKENS.labels(direction="in").inc(estimate_tokens(prompt))
+        LLM_TOKENS.labels(direction="out").inc(estimate_tokens(completion))
+
+
+def _stream_llm(prompt: str, stream_queue, deadline: Deadline | None = None) -> str:
+    """
+    Streaming LLM call that pushes content chunks to stream_queue.
+    Returns the complete text. Raises LLMError on failure (no retries: the
+    client may already have received part of the answer). A cassette in
+    replay mode pushes the recorded chunks instead of calling upstream.
+    """
+    cassette = get_cassette()
+    if cassette is not None:
+        chunks = cassette.lookup(prompt, settings.openrouter_model, COMPLETION_PARAMS)
+        if chunks is not None:
+            for content in chunks:
+                stream_queue.put(content)
+            return "".join(chunks)
+
+    chunks = []
+    raw_response = ""
+    first_token_at = None
+    _check_time(deadline)
+    with _slot(deadline):
+        start = time.perf_counter()
+        try:
+            response = _client_for(deadline).chat.completions.create(
+                model=settings.openrouter_model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+                **COMPLETION_PARAMS
+            )
+
+            for chunk in response:
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        LLM_TIME_TO_FIRST_TOKEN.observe(first_token_at - start)
+                    # Push to queue for real-time frontend display
+                    stream_queue.put(content)
+                    # Accumulate for backend
+                    raw_response += content
+                    chunks.append(content)
+
+        except Exception as e:
+            LLM_REQUEST_DURATION.labels(mode="stream", outcome="error").observe(
+                time.perf_counter() - start
+            )
+            LLM_ERRORS.labels(error_type=type(e).__name__).inc()
+            logger.error(f"Streaming LLM error: {e}")
+            raise LLMError(f"Streaming failed: {e}", original_error=e)
 
+    LLM_REQUEST_DURATION.labels(mode="stream", outcome="ok").observe(time.perf_counter() - start)
+    _count_tokens(prompt, raw_response)
+    if cassette is not None:
+        cassette.record(prompt, settings.openrouter_model, COMPLETION_PARAMS, chunks)
+    return raw_response
 
-def invoke_llm(prompt: str) -> str:
+
+def invoke_llm(prompt: str, deadline: Deadline | None = None) -> str:
     """
     Call the LLM and return raw text response.
-    Raises LLMError on failure.
+    Raises LLMError on failure (LLMTimeoutError when the deadline leaves no time).
     """
-    return _call_llm(prompt)
+    return _call_llm(prompt, deadline)
 
 
-def invoke_llm_stream(prompt: str, stream_queue) -> str:
+def invoke_llm_stream(prompt: str, stream_queue, deadline: Deadline | None = None) -> str:
     """
     Call the LLM with streaming, pushing tokens to queue for real-time display.
     Returns the complete response text after streaming finishes.
@@ -101,35 +272,15 @@ def invoke_llm_stream(prompt: str, stream_queue) -> str:
     Args:
         prompt: The prompt to send
         stream_queue: Queue to push token chunks to for real-time frontend display
+        deadline: Optional request deadline bounding the call
     
     Returns:
         Complete response text
     """
-    raw_response = ""
-    try:
-        response = client.chat.completions.create(
-            model=settings.openrouter_model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-            stream=True
-        )
-        
-        for chunk in response:
-            content = chunk.choices[0].delta.content
-            if content:
-                # Push to queue for real-time frontend display
-                stream_queue.put(content)
-                # Accumulate for backend
-                raw_response += content
+    return _stream_llm(prompt, stream_queue, deadline)
 
-    except Exception as e:
-        logger.error(f"Streaming LLM error: {e}")
-        raise LLMError(f"Streaming failed: {e}", original_error=e)
-    
-    return raw_response
 
-
-def invoke_llm_json(prompt: str, schema: Type[T], stream_queue=None) -> T:
+def invoke_llm_json(prompt: str, schema: Type[T], stream_queue=None, deadline: Deadline | None = None) -> T:
     """
     Call the LLM and parse response as JSON into a Pydantic model.
     Supports side-channel streaming if stream_queue is provided.
@@ -138,41 +289,17 @@ def invoke_llm_json(prompt: str, schema: Type[T], stream_queue=None) -> T:
         prompt: The prompt to send (should instruct JSON output)
         schema: Pydantic model class to validate against
         stream_queue: Optional queue to push token chunks to
+        deadline: Optional request deadline bounding the call (and its retries)
     
     Returns:
         Validated Pydantic model instance
     """
     if stream_queue:
         # Streaming Mode
-        raw_response = ""
-        try:
-            # We use the internal client directly for streaming to avoid refactoring _call_llm entirely
-            # but we should technically respect the retry logic. 
-            # For simplicity in this step, we'll wrap a basic retry or assume _call_llm refactor is too risky for now.
-            # Let's simple call the client with stream=True.
-            
-            response = client.chat.completions.create(
-                model=settings.openrouter_model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                stream=True
-            )
-            
-            for chunk in response:
-                content = chunk.choices[0].delta.content
-                if content:
-                    # Push to queue for frontend
-                    stream_queue.put(content)
-                    # Accumulate for backend
-                    raw_response += content
-
-        except Exception as e:
-            logger.error(f"Streaming LLM error: {e}")
-            raise LLMError(f"Streaming failed: {e}", original_error=e)
-            
+        raw_response = _stream_llm(prompt, stream_queue, deadline)
     else:
         # Standard Mode
-        raw_response = _call_llm(prompt)
+        raw_response = _call_llm(prompt, deadline)
 
     # Clean response - strip markdown code blocks if present
     content = raw_response.strip()
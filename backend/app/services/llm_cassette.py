@@ -0,0 +1,170 @@
+"""
+Record/replay store for LLM calls ("cassette").
+
+Sits under llm.py: with LLM_CASSETTE_MODE set, every completed LLM call
+(prompt and response, including the chunks of a streamed response) is kept
+in a SQLite file, keyed by (sha256 of the prompt, model, parameters):
+
+- off: not used (default)
+- record: every call goes upstream, and its response is stored
+- replay: stored responses are served without calling upstream (streams
+  replay their original chunks); misses go upstream and are recorded
+
+Replay makes reruns of historical tickets (scripts/replay_tickets.py) fast
+and deterministic: only prompts changed since the recording cost an LLM
+call. Chunks and prompts are stored zlib-compressed. The file uses WAL mode,
+so several processes can share it.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import List, Optional
+
+from app.config.settings import settings
+from app.services.metrics import LLM_CASSETTE
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay")
+
+
+def prompt_hash(prompt: str) -> bytes:
+    return hashlib.sha256(prompt.encode("utf-8")).digest()
+
+
+def _params_key(params: dict) -> str:
+    return json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+class Cassette:
+    """
+    Recorded LLM responses in SQLite.
+
+    The connection is per process: a forked worker opens its own instead of
+    sharing the parent's.
+    """
+
+    def __init__(self, path: Path, mode: str):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r} (expected one of {', '.join(MODES)})")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._connection = None
+
+    def _connect(self) -> None:
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_calls (
+                prompt_hash BLOB NOT NULL,
+                model TEXT NOT NULL,
+                params TEXT NOT NULL,
+                prompt BLOB NOT NULL,
+                chunks BLOB NOT NULL,
+                recorded_at REAL NOT NULL,
+                PRIMARY KEY (prompt_hash, model, params)
+            ) WITHOUT ROWID
+            """
+        )
+        conn.commit()
+        self._connection, self._pid = conn, os.getpid()
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            self._connect()
+        return self._connection
+
+    def lookup(self, prompt: str, model: str, params: dict) -> Optional[List[str]]:
+        """Recorded response chunks for this call (replay mode only), or None."""
+        if self.mode != "replay":
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chunks FROM llm_calls WHERE prompt_hash = ? AND model = ? AND params = ?",
+                (prompt_hash(prompt), model, _params_key(params))
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        LLM_CASSETTE.labels(result="miss" if row is None else "hit").inc()
+        return json.loads(zlib.decompress(row[0])) if row is not None else None
+
+    def record(self, prompt: str, model: str, params: dict, chunks: List[str]) -> None:
+        """Store a completed call's response. Failures are logged, not raised."""
+        if self.mode == "off":
+            return
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_calls "
+                    "(prompt_hash, model, params, prompt, chunks, recorded_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        prompt_hash(prompt),
+                        model,
+                        _params_key(params),
+                        zlib.compress(prompt.encode("utf-8")),
+                        zlib.compress(json.dumps(chunks, separators=(",", ":")).encode("utf-8")),
+                        time.time(),
+                    )
+                )
+                self._conn.commit()
+                self.recorded += 1
+            LLM_CASSETTE.labels(result="recorded").inc()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to record LLM call in cassette: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_calls").fetchone()[0]
+            return {
+                "mode": self.mode,
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "recorded": self.recorded,
+            }
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+_configured = False
+
+
+def _set(mode: str, path: Optional[str]) -> Optional[Cassette]:
+    global _cassette, _configured
+    _cassette = None if mode == "off" else Cassette(Path(path or settings.llm_cassette_path), mode)
+    _configured = True
+    if _cassette is not None:
+        logger.info(f"LLM cassette in {mode} mode: {_cassette.path}")
+    return _cassette
+
+
+def configure(mode: str, path: Optional[str] = None) -> Optional[Cassette]:
+    """Switch the process's cassette (e.g. from a replay script). Returns it, or None for off."""
+    with _cassette_lock:
+        return _set(mode, path)
+
+
+def get_cassette() -> Optional[Cassette]:
+    """The active cassette (from LLM_CASSETTE_MODE unless configured), or None."""
+    if not _configured:
+        with _cassette_lock:
+            if not _configured:
+                _set(settings.llm_cassette_mode, settings.llm_cassette_path)
+    return _cassette
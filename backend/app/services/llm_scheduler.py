@@ -0,0 +1,176 @@
+"""
+Priority-aware admission of LLM calls.
+
+Every upstream LLM call (each attempt of a completion, or a whole stream)
+takes one of LLM_MAX_CONCURRENCY slots. When calls are waiting, freed slots
+go to them by weighted fair queuing across three classes:
+
+- interactive: a user watching a stream (/tickets/stream)
+- standard: synchronous API requests (POST /tickets/)
+- batch: backfills, replays and other background work
+
+Each waiting call gets a virtual finish tag, max(virtual time, its class's
+last tag) + 1 / weight, and the smallest tag is served first, so classes
+share capacity in proportion to LLM_WEIGHT_* while none of them starves.
+Batch is the exception in one direction: it is only dispatched while no
+interactive call is waiting, and never holds more than
+LLM_BATCH_MAX_CONCURRENCY slots, so interactive work overtakes queued batch
+work and always finds a slot free soon.
+
+The class is taken from the calling context (see priority()); routes set it
+from the X-Priority header or their own default. Slots are per process.
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Optional
+
+from app.config.settings import settings
+from app.services.exceptions import LLMTimeoutError
+from app.services.metrics import LLM_QUEUE_WAIT, QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+STANDARD = "standard"
+BATCH = "batch"
+PRIORITY_CLASSES = (INTERACTIVE, STANDARD, BATCH)
+
+PRIORITY_HEADER = "x-priority"
+
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("llm_priority", default=STANDARD)
+
+
+def resolve_priority(value: Optional[str], default: str) -> str:
+    """Priority class from a request header value, or the route's default."""
+    value = (value or "").strip().lower()
+    return value if value in PRIORITY_CLASSES else default
+
+
+@contextmanager
+def priority(priority_class: str):
+    """Run LLM calls made in this block (and threads copying its context) at a class."""
+    token = _priority.set(priority_class)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+class _Waiter:
+    __slots__ = ("priority_class", "tag", "event")
+
+    def __init__(self, priority_class: str, tag: float):
+        self.priority_class = priority_class
+        self.tag = tag
+        self.event = threading.Event()
+
+
+class LLMScheduler:
+    """
+    Weighted fair queue in front of a fixed number of LLM slots.
+
+    Usage:
+        with scheduler.slot():
+            client.chat.completions.create(...)
+    """
+
+    def __init__(self, max_concurrency: int, weights: Dict[str, float], batch_max_concurrency: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.weights = {cls: max(weights.get(cls, 1.0), 1e-6) for cls in PRIORITY_CLASSES}
+        self.batch_max_concurrency = max(1, min(batch_max_concurrency, self.max_concurrency))
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[_Waiter]] = {cls: deque() for cls in PRIORITY_CLASSES}
+        self._running: Dict[str, int] = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._last_tag: Dict[str, float] = {cls: 0.0 for cls in PRIORITY_CLASSES}
+        self._virtual_time = 0.0
+        self._depth = {cls: QUEUE_DEPTH.labels(queue=f"llm_{cls}") for cls in PRIORITY_CLASSES}
+        self._wait = {cls: LLM_QUEUE_WAIT.labels(priority=cls) for cls in PRIORITY_CLASSES}
+
+    def _eligible(self, priority_class: str) -> bool:
+        if not self._queues[priority_class]:
+            return False
+        if priority_class == BATCH:
+            return not self._queues[INTERACTIVE] and self._running[BATCH] < self.batch_max_concurrency
+        return True
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the waiters with the smallest tags (lock held)."""
+        while sum(self._running.values()) < self.max_concurrency:
+            candidates = [cls for cls in PRIORITY_CLASSES if self._eligible(cls)]
+            if not candidates:
+                return
+            cls = min(candidates, key=lambda c: self._queues[c][0].tag)
+            waiter = self._queues[cls].popleft()
+            self._depth[cls].dec()
+            self._virtual_time = max(self._virtual_time, waiter.tag)
+            self._running[cls] += 1
+            waiter.event.set()
+
+    def acquire(self, priority_class: str, timeout: Optional[float] = None) -> float:
+        """
+        Block until a slot is granted. Returns the time spent queued.
+
+        Raises:
+            LLMTimeoutError: no slot within `timeout` seconds
+        """
+        start = time.perf_counter()
+        with self._lock:
+            tag = max(self._virtual_time, self._last_tag[priority_class]) + 1 / self.weights[priority_class]
+            self._last_tag[priority_class] = tag
+            waiter = _Waiter(priority_class, tag)
+            self._queues[priority_class].append(waiter)
+            self._depth[priority_class].inc()
+            self._dispatch()
+        if not waiter.event.wait(timeout):
+            with self._lock:
+                # Granted between the timeout and taking the lock: keep the slot
+                if not waiter.event.is_set():
+                    self._queues[priority_class].remove(waiter)
+                    self._depth[priority_class].dec()
+                    self._wait[priority_class].observe(time.perf_counter() - start)
+                    raise LLMTimeoutError(f"No LLM slot within {timeout:.1f}s ({priority_class})")
+        waited = time.perf_counter() - start
+        self._wait[priority_class].observe(waited)
+        if waited > 1.0:
+            logger.info(f"LLM call ({priority_class}) queued for {waited:.1f}s")
+        return waited
+
+    def release(self, priority_class: str) -> None:
+        with self._lock:
+            self._running[priority_class] -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority_class: Optional[str] = None, timeout: Optional[float] = None):
+        priority_class = priority_class or current_priority()
+        self.acquire(priority_class, timeout)
+        try:
+            yield
+        finally:
+            self.release(priority_class)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": dict(self._running),
+                "queued": {cls: len(q) for cls, q in self._queues.items()},
+            }
+
+
+scheduler = LLMScheduler(
+    max_concurrency=settings.llm_max_concurrency,
+    weights={
+        INTERACTIVE: settings.llm_weight_interactive,
+        STANDARD: settings.llm_weight_standard,
+        BATCH: settings.llm_weight_batch,
+    },
+    batch_max_concurrency=settings.llm_batch_max_concurrency,
+)
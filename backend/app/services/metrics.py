@@ -0,0 +1,224 @@
+"""
+Prometheus metrics.
+
+All metrics are defined here and recorded where the work happens (HTTP
+middleware, graph nodes, LLM client, embeddings, search, DB pool). The
+/metrics route renders them.
+
+Multiple workers: set PROMETHEUS_MULTIPROC_DIR to an empty directory shared
+by the workers (wiped on each server start). Each process then writes its
+samples to its own memory-mapped files, without cross-process locking, and
+a scrape of any worker aggregates all of them. Without it, /metrics reports
+the answering process only.
+"""
+import inspect
+import logging
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+
+logger = logging.getLogger(__name__)
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# Request-scale latencies (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Sub-request work: embeddings, search, pool waits
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency, until the response body is complete",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+GRAPH_NODE_DURATION = Histogram(
+    "graph_node_duration_seconds",
+    "LangGraph node execution time",
+    ["node"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds",
+    "LLM call latency per attempt",
+    ["mode", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from sending a streaming LLM request to its first content token",
+    buckets=LATENCY_BUCKETS,
+)
+LLM_QUEUE_WAIT = Histogram(
+    "llm_queue_wait_seconds",
+    "Time LLM calls waited for a scheduler slot, per priority class",
+    ["priority"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_CASSETTE = Counter(
+    "llm_cassette_total",
+    "LLM record/replay cassette lookups and recordings",
+    ["result"],
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "LLM tokens (provider usage when reported, local estimate otherwise)",
+    ["direction"],
+)
+LLM_RETRIES = Counter(
+    "llm_retries_total",
+    "LLM attempts that failed and were retried",
+    ["error_type"],
+)
+LLM_ERRORS = Counter(
+    "llm_errors_total",
+    "LLM calls that failed after all attempts",
+    ["error_type"],
+)
+EMBEDDING_DURATION = Histogram(
+    "embedding_duration_seconds",
+    "Embedding model calls (cache misses only)",
+    ["op"],
+    buckets=FAST_BUCKETS,
+)
+KNOWLEDGE_SEARCH_DURATION = Histogram(
+    "knowledge_search_duration_seconds",
+    "Knowledge base search latency, including query embedding",
+    buckets=FAST_BUCKETS,
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a database connection from the pool",
+    buckets=FAST_BUCKETS,
+)
+STREAM_THREADS_IN_FLIGHT = Gauge(
+    "stream_threads_in_flight",
+    "Background graph runs serving /tickets/stream",
+    multiprocess_mode="livesum",
+)
+FOLLOWUP_INTENT = Counter(
+    "followup_intent_total",
+    "Follow-up messages by intent handling: reused (no LLM call) or why they were reclassified",
+    ["outcome"],
+)
+GRAPH_RUNS_IN_FLIGHT = Gauge(
+    "graph_runs_in_flight",
+    "Admitted ticket requests whose graph run has not finished, per route",
+    ["route"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUE_LATENCY = Histogram(
+    "admission_queue_latency_seconds",
+    "Time from admission to the start of the graph run, per route",
+    ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total",
+    "Ticket requests shed by admission control",
+    ["route", "reason"],
+)
+WORKER_MEMORY = Gauge(
+    "worker_memory_bytes",
+    "Memory of prefork server processes (app.server); pss and uss show what "
+    "copy-on-write sharing saves",
+    ["worker", "kind"],
+    multiprocess_mode="mostrecent",
+)
+QUEUE_DEPTH = Gauge(
+    "queue_depth",
+    "Items waiting in in-process work queues",
+    ["queue"],
+    multiprocess_mode="livesum",
+)
+
+
+def render() -> tuple[bytes, str]:
+    """Exposition-format payload and its content type."""
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Drop this worker's live gauges from the aggregate (call on shutdown)."""
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(os.getpid())
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """Observe the duration of a block, including when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        (histogram.labels(**labels) if labels else histogram).observe(time.perf_counter() - start)
+
+
+def instrument_node(name: str, fn):
+    """
+    Wrap a graph node so its duration is recorded.
+
+    Keeps the node's signature: LangGraph only passes `config` to nodes that
+    declare it. Also attaches the executing thread to an active request
+    profile (see profiling).
+    """
+    from app.services import profiling
+
+    histogram = GRAPH_NODE_DURATION.labels(node=name)
+
+    if "config" in inspect.signature(fn).parameters:
+        from langchain_core.runnables import RunnableConfig
+
+        @wraps(fn)
+        def with_config(state: dict, config: RunnableConfig = None) -> dict:
+            profiling.attach()
+            start = time.perf_counter()
+            try:
+                return fn(state, config)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return with_config
+
+    @wraps(fn)
+    def without_config(state: dict) -> dict:
+        profiling.attach()
+        start = time.perf_counter()
+        try:
+            return fn(state)
+        finally:
+            histogram.observe(time.perf_counter() - start)
+    return without_config
+
+
+def instrument_pool(pool) -> None:
+    """Record how long connection checkouts wait on a SQLAlchemy pool."""
+    do_get = pool._do_get
+
+    def timed_do_get():
+        start = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - start)
+
+    pool._do_get = timed_do_get
@@ -0,0 +1,365 @@
+"""
+On-demand request profiling.
+
+A profiled request gets a sampler thread that walks the stacks of the
+threads working on it every PROFILING_INTERVAL_MS:
+
+- the event loop thread, and
+- any thread that calls attach() while the request's profile is active
+  (graph nodes do this, so LangGraph executor threads and the /tickets/stream
+  background thread are covered).
+
+Each sample is wall-clock; samples where the thread's CPU clock advanced
+since the previous one also go into the CPU profile. The result is stored in
+a bounded on-disk ring as speedscope JSON plus a summary that breaks wall
+and CPU time down by component (llm, embeddings, search, db, graph, ...).
+
+Requests are profiled when they carry a valid signed X-Profile header or
+are picked by PROFILING_SAMPLE_RATE. Stored profiles are only served to
+signed requests, so sampling requires PROFILING_SECRET: the app refuses to
+start with a sample rate and no secret. With neither, the middleware is not
+installed at all.
+
+Stopping the sampler and writing the profile (speedscope JSON can run to
+several MB) happen on a background thread, off the event loop.
+"""
+import contextvars
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+SIGNATURE_MAX_AGE = 300  # seconds
+
+# Innermost matching module prefix decides a sample's component
+COMPONENTS = (
+    ("llm", ("openai", "httpx", "httpcore", "app.services.llm")),
+    ("embeddings", ("sentence_transformers", "torch", "transformers",
+                    "langchain_community.embeddings", "app.services.embedding")),
+    ("search", ("faiss", "app.services.knowledge_base", "app.services.lexical_index",
+                "app.services.ann_index", "app.services.vectorstore")),
+    ("db", ("sqlalchemy", "psycopg2", "sqlite3")),
+    ("graph", ("langgraph", "langchain_core")),
+    ("idle", ("selectors",)),  # event loop waiting for I/O
+    ("framework", ("starlette", "fastapi", "anyio", "uvicorn", "asyncio")),
+    ("app", ("app.",)),
+)
+
+# Source root of this app, for naming its modules in profiles
+_APP_ROOT = str(Path(__file__).resolve().parents[2]) + os.sep
+
+_active: contextvars.ContextVar[Optional["ProfileSession"]] = contextvars.ContextVar(
+    "active_profile", default=None
+)
+
+# Joins samplers and writes finished profiles, one at a time
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-writer")
+
+
+# =============================================================================
+# Triggers
+# =============================================================================
+
+def enabled() -> bool:
+    """
+    Whether to install the profiling middleware.
+
+    Raises:
+        ValueError: PROFILING_SAMPLE_RATE is set without PROFILING_SECRET;
+            the sampled profiles could never be read back.
+    """
+    if settings.profiling_sample_rate > 0 and not settings.profiling_secret:
+        raise ValueError(
+            "PROFILING_SAMPLE_RATE requires PROFILING_SECRET (stored profiles are only served to signed requests)"
+        )
+    return bool(settings.profiling_secret)
+
+
+def sign(timestamp: Optional[int] = None) -> str:
+    """Header value that enables profiling for one request: "<ts>.<hmac>"."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(
+        settings.profiling_secret.encode("utf-8"), str(timestamp).encode("utf-8"), hashlib.sha256
+    ).hexdigest()
+    return f"{timestamp}.{digest}"
+
+
+def verify(value: Optional[str]) -> bool:
+    """True for a fresh, correctly signed header value."""
+    if not value or not settings.profiling_secret:
+        return False
+    timestamp, _, _ = value.partition(".")
+    if not timestamp.isdigit() or abs(time.time() - int(timestamp)) > SIGNATURE_MAX_AGE:
+        return False
+    return hmac.compare_digest(value, sign(int(timestamp)))
+
+
+def should_profile(header_value: Optional[str]) -> Optional[str]:
+    """Trigger for this request ("header" or "sampled"), or None."""
+    if header_value and verify(header_value):
+        return "header"
+    if settings.profiling_sample_rate > 0 and random.random() < settings.profiling_sample_rate:
+        return "sampled"
+    return None
+
+
+# =============================================================================
+# Sampling
+# =============================================================================
+
+def _thread_cpu_time(ident: int) -> Optional[float]:
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class ProfileSession:
+    """Samples the stacks of the threads serving one request."""
+
+    def __init__(self, label: str, trigger: str, interval_ms: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.trigger = trigger
+        self.interval = interval_ms / 1000
+        self.threads: Dict[int, str] = {}
+        self.frames: List[tuple] = []
+        self._frame_index: Dict[tuple, int] = {}
+        # thread ident -> list of (stack frame indexes, on_cpu)
+        self.samples: Dict[int, List[tuple]] = {}
+        self._cpu: Dict[int, Optional[float]] = {}
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self.started_at = 0.0
+        self.duration = 0.0
+
+    def attach(self, ident: Optional[int] = None, name: Optional[str] = None) -> None:
+        ident = threading.get_ident() if ident is None else ident
+        if ident not in self.threads:
+            self.threads[ident] = name or threading.current_thread().name
+
+    def _frame_id(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append(key)
+        return index
+
+    def _sample(self) -> None:
+        current = sys._current_frames()
+        for ident in list(self.threads):
+            frame = current.get(ident)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_id(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+
+            cpu = _thread_cpu_time(ident)
+            previous = self._cpu.get(ident)
+            on_cpu = cpu is not None and previous is not None and cpu > previous
+            self._cpu[ident] = cpu
+            self.samples.setdefault(ident, []).append((tuple(stack), on_cpu))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name=f"profiler-{self.id}", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        """Stop sampling; returns without waiting for the sampler (see join)."""
+        self.duration = time.perf_counter() - self.started_at
+        self._stop.set()
+
+    def join(self) -> None:
+        if self._sampler is not None:
+            self._sampler.join()
+
+    # -------------------------------------------------------------------------
+    # Output
+    # -------------------------------------------------------------------------
+
+    def _component(self, stack: tuple) -> str:
+        for frame_id in reversed(stack):
+            _, filename, _ = self.frames[frame_id]
+            module = _module_of(filename)
+            for component, prefixes in COMPONENTS:
+                if module.startswith(prefixes):
+                    return component
+        return "other"
+
+    def summary(self, status: Optional[int] = None) -> dict:
+        interval_ms = self.interval * 1000
+        wall: Dict[str, float] = {}
+        cpu: Dict[str, float] = {}
+        for samples in self.samples.values():
+            for stack, on_cpu in samples:
+                component = self._component(stack)
+                wall[component] = wall.get(component, 0.0) + interval_ms
+                if on_cpu:
+                    cpu[component] = cpu.get(component, 0.0) + interval_ms
+        return {
+            "id": self.id,
+            "request": self.label,
+            "status": status,
+            "trigger": self.trigger,
+            "created_at": time.time(),
+            "duration_ms": round(self.duration * 1000, 1),
+            "interval_ms": interval_ms,
+            "threads": len(self.samples),
+            "samples": sum(len(s) for s in self.samples.values()),
+            "wall_ms_by_component": {k: round(v, 1) for k, v in sorted(wall.items(), key=lambda i: -i[1])},
+            "cpu_ms_by_component": {k: round(v, 1) for k, v in sorted(cpu.items(), key=lambda i: -i[1])},
+        }
+
+    def speedscope(self) -> dict:
+        """speedscope file format: one wall and one CPU sampled profile per thread."""
+        interval_ms = self.interval * 1000
+        profiles = []
+        for ident, samples in self.samples.items():
+            for kind, rows in (
+                ("wall", [stack for stack, _ in samples]),
+                ("cpu", [stack for stack, on_cpu in samples if on_cpu]),
+            ):
+                if not rows:
+                    continue
+                profiles.append({
+                    "type": "sampled",
+                    "name": f"{self.threads.get(ident, ident)} ({kind})",
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": len(rows) * interval_ms,
+                    "samples": [list(stack) for stack in rows],
+                    "weights": [interval_ms] * len(rows),
+                })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.label} ({self.id})",
+            "exporter": "langgraph-support-agent",
+            "activeProfileIndex": 0,
+            "shared": {
+                "frames": [
+                    {"name": name, "file": filename, "line": line}
+                    for name, filename, line in self.frames
+                ]
+            },
+            "profiles": profiles,
+        }
+
+
+def _module_of(filename: str) -> str:
+    """Best-effort dotted module name for a source path."""
+    if filename.startswith(_APP_ROOT):
+        return filename[len(_APP_ROOT):].removesuffix(".py").replace(os.sep, ".")
+    path = filename.replace(os.sep, "/")
+    for marker in ("/site-packages/", "/dist-packages/", "/lib/python3"):
+        if marker in path:
+            path = path.split(marker, 1)[1]
+            if marker == "/lib/python3":
+                path = path.split("/", 1)[-1]
+            break
+    return path.removesuffix(".py").replace("/", ".")
+
+
+def begin(label: str, trigger: str) -> tuple[ProfileSession, contextvars.Token]:
+    session = ProfileSession(label, trigger, settings.profiling_interval_ms)
+    session.attach(name="event-loop")
+    token = _active.set(session)
+    session.start()
+    return session, token
+
+
+def _store(session: ProfileSession, status: Optional[int]) -> None:
+    session.join()
+    try:
+        save(session, status)
+    except Exception as e:
+        logger.warning(f"Failed to store profile {session.id}: {e}")
+
+
+def end(session: ProfileSession, token: contextvars.Token, status: Optional[int]) -> None:
+    """Stop profiling the request. The profile is stored in the background."""
+    _active.reset(token)
+    session.stop()
+    _writer.submit(_store, session, status)
+
+
+def attach() -> None:
+    """Add the calling thread to the active request profile, if any."""
+    session = _active.get()
+    if session is not None:
+        session.attach()
+
+
+# =============================================================================
+# Storage (bounded ring of files)
+# =============================================================================
+
+def _profile_dir() -> Path:
+    return Path(settings.profiling_dir)
+
+
+def save(session: ProfileSession, status: Optional[int]) -> Path:
+    directory = _profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    summary = session.summary(status)
+    path = directory / f"{int(time.time() * 1000):015d}-{session.id}.json"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"summary": summary, "speedscope": session.speedscope()}))
+    os.replace(tmp, path)
+    logger.info(
+        f"Profiled {session.label} in {summary['duration_ms']}ms "
+        f"({session.trigger}): {summary['wall_ms_by_component']}"
+    )
+
+    profiles = sorted(directory.glob("*.json"))
+    for old in profiles[:max(0, len(profiles) - settings.profiling_max_profiles)]:
+        old.unlink(missing_ok=True)
+    return path
+
+
+def _find(profile_id: str) -> Optional[Path]:
+    matches = list(_profile_dir().glob(f"*-{profile_id}.json"))
+    return matches[0] if matches else None
+
+
+def list_profiles() -> List[dict]:
+    """Summaries of stored profiles, newest first."""
+    directory = _profile_dir()
+    if not directory.exists():
+        return []
+    summaries = []
+    for path in sorted(directory.glob("*.json"), reverse=True):
+        try:
+            summaries.append(json.loads(path.read_text())["summary"])
+        except (OSError, ValueError, KeyError):
+            continue
+    return summaries
+
+
+def load_profile(profile_id: str) -> Optional[dict]:
+    path = _find(profile_id)
+    if path is None:
+        return None
+    return json.loads(path.read_text())
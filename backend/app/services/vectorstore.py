@@ -1,63 +1,721 @@
 """
 Vector store service for knowledge base.
 Uses FAISS for local vector storage with HuggingFace embeddings.
+
+The index is persisted as immutable, versioned snapshots (see index_store)
+shared by every uvicorn worker:
+
+- Readers map the latest snapshot read-only and hot-swap to a newer one when
+  CURRENT changes (checked at most every VECTORSTORE_REFRESH_INTERVAL
+  seconds), so all workers serve the same FAISS vectors from one copy in
+  page cache. Only the vectors are shared this way: the docstore and the
+  side indexes below are unpickled into every process that loads the
+  snapshot. The preforking server (app.server) shares the copies loaded
+  before it forks, but a worker that swaps to a newer snapshot holds its
+  own.
+- Writes go through update_vectorstore(). It takes the cross-process writer
+  lock, applies the change to a private in-memory copy of the latest
+  published version, publishes it as the next snapshot and swaps this
+  process over. Only one writer publishes at a time, and searches never race
+  with index mutation.
+- A write reloads and republishes the whole index, docstore and
+  attachments, so it costs O(corpus) however few documents it changes.
+  Writes are therefore batched: update_vectorstore() calls that arrive
+  while a snapshot is being published are applied together as the next
+  one, the learner collects feedback for LEARNER_BATCH_WAIT seconds, and
+  bulk imports publish once per KB_IMPORT_WRITE_BATCH chunks.
+
+Side indexes keyed by docstore id are kept in sync with the docstore by the
+same writers and stored in each snapshot as attachments: a BM25 inverted
+index for hybrid retrieval (lexical_index) and SimHash fingerprints for
+near-duplicate suppression (dedup). Writers also store the index positions
+of each intent's documents, for intent-partitioned search, so readers never
+derive them from the docstore.
+
+The FAISS index type (flat, IVF-Flat, HNSW, IVF-PQ; see ann_index) is chosen
+from ANN_INDEX_TYPE, or by corpus size when "auto". Writers rebuild the
+index when the size policy picks a different type and retrain IVF indexes
+when new vectors drift away from the trained centroids.
+
+Deletes never retrain: flat and IVF indexes remove vectors in place, and
+HNSW (which cannot remove) keeps tombstoned positions that searches exclude
+until they pass HNSW_TOMBSTONE_REBUILD_FRACTION of the index, when it is
+rebuilt without them.
 """
+import copy
+import time
 import logging
-from typing import Optional
+import threading
+from pathlib import Path
+from typing import Callable, Optional
 
 from app.config.settings import settings
+from app.services import ann_index, index_store
+from app.services.dedup import NearDuplicateIndex, simhash
+from app.services.lexical_index import BM25Index
+from app.services.embedding_batcher import MicroBatchEmbeddings
+from app.services.embedding_cache import CachedEmbeddings
 
 logger = logging.getLogger(__name__)
 
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
 # Lazy-loaded instances
 _embedding = None
 _vectorstore = None
+_version: Optional[int] = None
+_meta: dict = {}
+_attachments: dict = {}
+_partitions: Optional[tuple] = None  # (store, {intent: positions}, tombstones)
+_last_refresh_check = 0.0
+
+# Vectors re-embedded per call when rebuilding lossy (PQ) indexes
+REBUILD_CHUNK = 4096
+
+# Drift check: sample size, and corpus growth between checks
+DRIFT_SAMPLE = 2000
+DRIFT_CHECK_GROWTH = 0.1
+
+# Mapping value of deleted HNSW positions, and the share of them that
+# triggers a rebuild
+TOMBSTONE_ID = ""
+HNSW_TOMBSTONE_REBUILD_FRACTION = 0.2
+
+LEXICAL_ATTACHMENT = "lexical"
+DEDUP_ATTACHMENT = "dedup"
+PARTITIONS_ATTACHMENT = "partitions"
 
+# Serializes writers and reader swaps within this process
+_write_lock = threading.Lock()
+_init_lock = threading.Lock()
+_embedding_lock = threading.Lock()
 
-def _get_embedding():
+
+def load_embedding_model():
+    """
+    Load the bare embedding model (no cache or batching).
+
+    Returns:
+        (model, model_name)
+    """
+    try:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        model = HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL_NAME
+        )
+        logger.info("Embedding model initialized")
+        return model, EMBEDDING_MODEL_NAME
+    except ImportError:
+        # Fallback: use fake embeddings for development
+        logger.warning("HuggingFace not available, using fake embeddings")
+        from langchain_community.embeddings import FakeEmbeddings
+        return FakeEmbeddings(size=384), "fake-384"
+
+
+def get_embedding():
     """
     Get or create the embedding model.
-    Uses HuggingFace sentence-transformers for local embeddings.
+    Uses HuggingFace sentence-transformers for local embeddings, behind the
+    shared content-addressed cache (retrieval, learning and classifiers all
+    embed through this instance). Single-query cache misses from concurrent
+    requests are micro-batched into one forward pass.
     """
     global _embedding
-    if _embedding is None:
-        try:
-            from langchain_community.embeddings import HuggingFaceEmbeddings
-            _embedding = HuggingFaceEmbeddings(
-                model_name="all-MiniLM-L6-v2"
+    if _embedding is not None:
+        return _embedding
+
+    with _embedding_lock:
+        if _embedding is not None:
+            return _embedding
+        model, model_name = load_embedding_model()
+
+        if settings.embedding_batch_size > 1:
+            model = MicroBatchEmbeddings(
+                model,
+                max_batch_size=settings.embedding_batch_size,
+                max_wait_ms=settings.embedding_batch_wait_ms
             )
-            logger.info("Embedding model initialized")
-        except ImportError:
-            # Fallback: use fake embeddings for development
-            logger.warning("HuggingFace not available, using fake embeddings")
-            from langchain_community.embeddings import FakeEmbeddings
-            _embedding = FakeEmbeddings(size=384)
+
+        _embedding = CachedEmbeddings(
+            model,
+            model_name=model_name,
+            max_entries=settings.embedding_cache_size,
+            disk_path=settings.embedding_cache_path or None
+        )
     return _embedding
 
 
+def get_embedding_cache_stats() -> Optional[dict]:
+    """Embedding cache hit/miss counters, or None before first use."""
+    return _embedding.stats() if _embedding is not None else None
+
+
+def _index_root() -> Path:
+    return Path(settings.vectorstore_dir)
+
+
+def _configure(store) -> None:
+    ann_index.configure_search(
+        store.index,
+        nprobe=settings.ann_nprobe,
+        hnsw_ef_search=settings.ann_hnsw_ef_search
+    )
+
+
+def _load(version: int, mmap: bool, load_attachments: bool = True):
+    """
+    Wrap a stored snapshot in a LangChain FAISS store.
+
+    Returns:
+        (store, meta, attachments); attachments is empty unless load_attachments.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    index, docstore, index_to_docstore_id, meta = index_store.read_snapshot(
+        _index_root(), version, mmap=mmap
+    )
+    store = FAISS(
+        embedding_function=get_embedding(),
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id
+    )
+    _configure(store)
+
+    if not load_attachments:
+        return store, meta, {}
+
+    attachments = {
+        name: index_store.read_attachment(_index_root(), version, name)
+        for name in (LEXICAL_ATTACHMENT, DEDUP_ATTACHMENT, PARTITIONS_ATTACHMENT)
+    }
+    # Snapshot predates an attachment: derive it from the docstore once
+    if attachments[LEXICAL_ATTACHMENT] is None or attachments[DEDUP_ATTACHMENT] is None:
+        attachments.update(_new_attachments(attachments))
+        _sync_attachments(store, attachments)
+    if attachments[PARTITIONS_ATTACHMENT] is None:
+        attachments[PARTITIONS_ATTACHMENT] = _intent_partitions(store)
+    return store, meta, attachments
+
+
+def _copy(store):
+    """Private in-memory copy of a store."""
+    import faiss
+    from langchain_community.vectorstores import FAISS
+
+    return FAISS(
+        embedding_function=store.embedding_function,
+        index=faiss.clone_index(store.index),
+        docstore=copy.deepcopy(store.docstore),
+        index_to_docstore_id=dict(store.index_to_docstore_id)
+    )
+
+
+def _build_initial():
+    """Build the seed index used before anything has been learned."""
+    from langchain_community.vectorstores import FAISS
+
+    # Initialize with a placeholder to avoid empty index issues
+    return FAISS.from_texts(
+        texts=["Welcome to support. How can I help you today?"],
+        embedding=get_embedding(),
+        metadatas=[{"source": "system"}]
+    )
+
+
+def _publish(store, meta: dict, attachments: dict) -> Optional[int]:
+    """Persist a store as the next snapshot. Returns its version, or None on failure."""
+    try:
+        root = _index_root()
+        version = index_store.write_snapshot(
+            root, store.index, store.docstore, store.index_to_docstore_id, meta,
+            attachments=attachments
+        )
+        index_store.prune_snapshots(root, settings.vectorstore_keep_snapshots)
+        return version
+    except Exception as e:
+        logger.error(f"Failed to persist vector store snapshot: {e}")
+        return None
+
+
+# =============================================================================
+# Index maintenance (writers only)
+# =============================================================================
+
+def _new_attachments(existing: Optional[dict] = None) -> dict:
+    """Fill in empty side indexes for any attachment not already present."""
+    existing = existing or {}
+    return {
+        LEXICAL_ATTACHMENT: existing.get(LEXICAL_ATTACHMENT) or BM25Index(),
+        DEDUP_ATTACHMENT: existing.get(DEDUP_ATTACHMENT) or NearDuplicateIndex(
+            max_distance=settings.dedup_max_hamming
+        ),
+    }
+
+
+def _documents(store) -> dict:
+    """Docstore id -> stored document object, taken before a write to spot replacements."""
+    return {doc_id: store.docstore.search(doc_id) for doc_id in store.index_to_docstore_id.values()}
+
+
+def _sync_attachments(store, attachments: dict, before: Optional[dict] = None) -> None:
+    """
+    Bring the side indexes in line with the docstore.
+
+    Only documents added, removed or replaced since the last sync are
+    touched. A document replaced under the same id is a new docstore object,
+    so replacements are found by comparing against `before` (_documents()
+    of the store ahead of the write); without it only additions and
+    removals are seen.
+    """
+    lexical = attachments[LEXICAL_ATTACHMENT]
+    dedup = attachments[DEDUP_ATTACHMENT]
+
+    live = set(store.index_to_docstore_id.values())
+    for doc_id in [doc_id for doc_id in lexical.doc_lengths if doc_id not in live]:
+        lexical.remove(doc_id)
+    for doc_id in [doc_id for doc_id in dedup.fingerprints if doc_id not in live]:
+        dedup.remove(doc_id)
+
+    for doc_id in live:
+        doc = store.docstore.search(doc_id)
+        if isinstance(doc, str):
+            continue
+        if before is not None and doc_id in before and before[doc_id] is not doc:
+            lexical.remove(doc_id)
+            dedup.remove(doc_id)
+        elif doc_id in lexical and doc_id in dedup:
+            continue
+        if doc_id not in lexical:
+            lexical.add(doc_id, doc.page_content, intent=doc.metadata.get("intent"))
+        if doc_id not in dedup:
+            dedup.add(doc_id, simhash(doc.page_content))
+
+
+def _intent_partitions(store) -> dict:
+    """Index positions of each intent's documents (from docstore metadata)."""
+    import numpy as np
+
+    grouped: dict = {}
+    for position, doc_id in store.index_to_docstore_id.items():
+        doc = store.docstore.search(doc_id)
+        intent = doc.metadata.get("intent") if not isinstance(doc, str) else None
+        if intent:
+            grouped.setdefault(intent, []).append(position)
+    return {
+        intent: np.asarray(sorted(positions), dtype=np.int64)
+        for intent, positions in grouped.items()
+    }
+
+
+def _finish_write(store, attachments: dict, before: Optional[dict] = None) -> None:
+    """Bring the attachments in line with a store once its positions are final."""
+    _sync_attachments(store, attachments, before)
+    attachments[PARTITIONS_ATTACHMENT] = _intent_partitions(store)
+
+
+def _tombstones(store):
+    """Positions of deleted HNSW vectors."""
+    import numpy as np
+
+    return np.asarray(
+        sorted(p for p, doc_id in store.index_to_docstore_id.items() if doc_id == TOMBSTONE_ID),
+        dtype=np.int64
+    )
+
+
+def _stored_vectors(store, positions):
+    """float32 vectors for index positions; re-embeds (cache hits) for lossy indexes."""
+    import numpy as np
+
+    if ann_index.index_type_of(store.index) != "ivf_pq":
+        return np.asarray(ann_index.reconstruct(store.index, positions), dtype=np.float32)
+
+    embedding = get_embedding()
+    out = np.empty((len(positions), store.index.d), dtype=np.float32)
+    for start in range(0, len(positions), REBUILD_CHUNK):
+        chunk = positions[start:start + REBUILD_CHUNK]
+        texts = [
+            store.docstore.search(store.index_to_docstore_id[p]).page_content for p in chunk
+        ]
+        out[start:start + len(chunk)] = embedding.embed_documents(texts)
+    return out
+
+
+def _rebuild(store, index_type: str, keep_positions=None) -> dict:
+    """
+    Rebuild (and retrain) the store's index, optionally keeping only some positions.
+
+    Tombstoned positions are dropped unless keep_positions is given.
+
+    Returns:
+        Fresh index meta.
+    """
+    import numpy as np
+
+    if keep_positions is None:
+        keep_positions = [
+            position for position, doc_id in sorted(store.index_to_docstore_id.items())
+            if doc_id != TOMBSTONE_ID
+        ]
+    vectors = _stored_vectors(store, keep_positions)
+
+    store.index_to_docstore_id = {
+        new: store.index_to_docstore_id[old] for new, old in enumerate(keep_positions)
+    }
+    store.index = ann_index.build_index(
+        vectors,
+        index_type,
+        hnsw_m=settings.ann_hnsw_m,
+        pq_m=settings.ann_pq_m
+    )
+    _configure(store)
+
+    sample = vectors[np.random.default_rng(0).permutation(len(vectors))[:DRIFT_SAMPLE]]
+    built = ann_index.index_type_of(store.index)
+    logger.info(f"Rebuilt knowledge index as {built} over {len(vectors)} vectors")
+    return {
+        "index_type": built,
+        "trained_size": len(vectors),
+        "checked_size": len(vectors),
+        "baseline_distance": ann_index.centroid_distance(store.index, sample),
+    }
+
+
+def _target_index_type(n_vectors: int) -> str:
+    requested = ann_index.choose_index_type(
+        n_vectors,
+        configured=settings.ann_index_type,
+        flat_max=settings.ann_flat_max_vectors,
+        ivf_flat_max=settings.ann_ivf_flat_max_vectors
+    )
+    return ann_index.buildable_index_type(n_vectors, requested)
+
+
+def _maintain(store, meta: dict) -> dict:
+    """Switch index type, retrain or drop tombstones after a write, if the policy calls for it."""
+    ntotal = store.index.ntotal
+    current = ann_index.index_type_of(store.index)
+    tombstones = len(_tombstones(store)) if current == "hnsw" else 0
+    target = _target_index_type(ntotal - tombstones)
+
+    if target != current:
+        return _rebuild(store, target)
+
+    if current == "hnsw":
+        if tombstones > ntotal * HNSW_TOMBSTONE_REBUILD_FRACTION:
+            logger.info(f"Knowledge index has {tombstones} deleted vectors, rebuilding")
+            return _rebuild(store, current)
+        return {**meta, "index_type": current, "tombstones": tombstones}
+
+    baseline = meta.get("baseline_distance")
+    checked = meta.get("checked_size") or ntotal
+    if baseline and ntotal >= checked * (1 + DRIFT_CHECK_GROWTH):
+        recent = list(range(max(checked, ntotal - DRIFT_SAMPLE), ntotal))
+        distance = ann_index.centroid_distance(store.index, _stored_vectors(store, recent))
+        meta = {**meta, "checked_size": ntotal}
+        if distance is not None and distance > baseline * settings.ann_drift_threshold:
+            logger.info(
+                f"Knowledge index drift {distance / baseline:.2f}x over baseline, retraining"
+            )
+            return _rebuild(store, current)
+
+    return {**meta, "index_type": current}
+
+
+def delete_documents(store, ids) -> None:
+    """
+    Remove documents from a writable store without retraining its index.
+
+    Flat indexes renumber positions the way LangChain's id mapping expects.
+    IVF indexes move their last vectors into the freed positions. HNSW
+    positions are tombstoned (mapped to TOMBSTONE_ID and excluded from
+    searches); _maintain rebuilds once there are too many.
+    """
+    index_type = ann_index.index_type_of(store.index)
+    if index_type == "flat":
+        store.delete(ids)
+        return
+
+    removed = set(ids)
+    positions = [p for p, doc_id in store.index_to_docstore_id.items() if doc_id in removed]
+    if index_type == "hnsw":
+        for position in positions:
+            store.index_to_docstore_id[position] = TOMBSTONE_ID
+    else:
+        moved = ann_index.remove_positions(store.index, positions)
+        store.index_to_docstore_id = {
+            moved.get(position, position): doc_id
+            for position, doc_id in store.index_to_docstore_id.items()
+            if doc_id not in removed
+        }
+
+    found = [doc_id for doc_id in removed if not isinstance(store.docstore.search(doc_id), str)]
+    if found:
+        store.docstore.delete(found)
+
+
+# =============================================================================
+# Readers
+# =============================================================================
+
+def _serve(store, version: Optional[int], meta: dict, attachments: dict) -> None:
+    """Make a store (with its snapshot version, meta and attachments) the one served."""
+    global _vectorstore, _version, _meta, _attachments, _partitions
+    _vectorstore, _version, _meta, _attachments = store, version, meta, attachments
+    _partitions = (store, attachments.get(PARTITIONS_ATTACHMENT) or {}, _tombstones(store))
+
+
+def _refresh_if_stale() -> None:
+    """Hot-swap to a newer published snapshot (throttled)."""
+    global _last_refresh_check
+
+    now = time.monotonic()
+    if now - _last_refresh_check < settings.vectorstore_refresh_interval:
+        return
+    _last_refresh_check = now
+
+    latest = index_store.current_version(_index_root())
+    if latest is None or latest == _version:
+        return
+
+    with _init_lock:
+        if _version is not None and latest <= _version:
+            return
+        try:
+            store, meta, attachments = _load(latest, mmap=True)
+        except Exception as e:
+            # Snapshot may have been pruned between reading CURRENT and loading
+            logger.warning(f"Failed to load snapshot {latest}: {e}")
+            return
+        _serve(store, latest, meta, attachments)
+        logger.info(f"Vector store swapped to snapshot {latest}")
+
+
 def get_vectorstore():
     """
     Get or create the FAISS vector store.
     
+    Maps the latest persisted snapshot if there is one; otherwise builds the
+    seed index and publishes it. Swaps to newer snapshots published by other
+    processes.
+
     Returns:
         FAISS vector store instance, or None if initialization fails.
     """
-    global _vectorstore
+    if _vectorstore is not None:
+        if _version is not None:
+            _refresh_if_stale()
+        return _vectorstore
 
-    if _vectorstore is None:
+    with _init_lock:
+        if _vectorstore is not None:
+            return _vectorstore
         try:
-            from langchain_community.vectorstores import FAISS
-            embedding = _get_embedding()
-            # Initialize with a placeholder to avoid empty index issues
-            _vectorstore = FAISS.from_texts(
-                texts=["Welcome to support. How can I help you today?"],
-                embedding=embedding,
-                metadatas=[{"source": "system"}]
-            )
-            logger.info("Vector store initialized")
+            root = _index_root()
+            version = index_store.current_version(root)
+            if version is None:
+                with index_store.writer_lock(root):
+                    # Another worker may have seeded it while we waited
+                    version = index_store.current_version(root)
+                    if version is None:
+                        store = _build_initial()
+                        attachments = _new_attachments()
+                        _finish_write(store, attachments)
+                        version = _publish(store, {"index_type": "flat"}, attachments)
+                        if version is None:
+                            _serve(store, None, _meta, attachments)
+                            logger.info("Vector store initialized (not persisted)")
+                            return _vectorstore
+                        logger.info("Vector store initialized")
+            store, meta, attachments = _load(version, mmap=True)
+            _serve(store, version, meta, attachments)
+            logger.info(f"Vector store loaded from snapshot {version}")
         except Exception as e:
             logger.error(f"Failed to initialize vector store: {e}")
             # Return None - callers should handle gracefully
             return None
 
     return _vectorstore
+
+
+def get_vectorstore_version() -> Optional[int]:
+    """Snapshot version this process is serving, or None if not persisted."""
+    return _version
+
+
+def get_intent_partitions(store) -> dict:
+    """
+    Index positions of each intent's documents in a served store.
+
+    Built by the writer that published the snapshot and loaded with it.
+    """
+    cached = _partitions
+    if cached is not None and cached[0] is store:
+        return cached[1]
+    # The store was swapped out since the caller got it
+    return _intent_partitions(store)
+
+
+def get_tombstones(store):
+    """Positions of deleted vectors still in a served store's (HNSW) index."""
+    cached = _partitions
+    if cached is not None and cached[0] is store:
+        return cached[2]
+    return _tombstones(store)
+
+
+def get_lexical_index() -> Optional[BM25Index]:
+    """BM25 index matching the served store (read-only)."""
+    get_vectorstore()
+    return _attachments.get(LEXICAL_ATTACHMENT)
+
+
+def get_index_info() -> dict:
+    """Type, size and training stats of the served index."""
+    store = get_vectorstore()
+    return {
+        **_meta,
+        "version": _version,
+        "ntotal": store.index.ntotal if store is not None else 0,
+    }
+
+
+# =============================================================================
+# Writers
+# =============================================================================
+
+class _Write:
+    """An update_vectorstore() call waiting to be applied."""
+
+    def __init__(self, mutate: Callable[[object, dict], None]):
+        self.mutate = mutate
+        self.done = False
+        self.error: Optional[Exception] = None
+
+
+# Writes queued in this process; whoever holds _write_lock applies them all
+_queue: list = []
+_queue_lock = threading.Lock()
+
+
+def update_vectorstore(mutate: Callable[[object, dict], None]):
+    """
+    Apply a write to the knowledge index.
+
+    `mutate(store, attachments)` receives a private, writable copy of the
+    latest published store (which may be newer than the one this process is
+    serving) and its side indexes by attachment name. Once it
+    returns, index maintenance runs, the copy is published as a new snapshot
+    and it becomes the store returned by get_vectorstore().
+
+    Calls made while another write is publishing are queued and applied
+    together, in order, as one snapshot; mutate may run on the thread of
+    whichever caller publishes. A mutate that raises is left out of the
+    snapshot and its exception is raised to its caller only.
+
+    Returns:
+        The new store.
+    """
+    if get_vectorstore() is None:
+        raise RuntimeError("Vector store is not available")
+
+    write = _Write(mutate)
+    with _queue_lock:
+        _queue.append(write)
+
+    with _write_lock:
+        if not write.done:
+            with _queue_lock:
+                batch = list(_queue)
+                _queue.clear()
+            _apply(batch)
+
+    if write.error is not None:
+        raise write.error
+    return _vectorstore
+
+
+def _apply(writes: list) -> None:
+    """Publish queued writes as one snapshot (caller holds _write_lock)."""
+    while writes:
+        try:
+            failed = _publish_writes(writes)
+        except Exception as e:
+            failed = None
+            for write in writes:
+                write.error = e
+        if failed is None:
+            for write in writes:
+                write.done = True
+            return
+        # The copy holds the failed write's partial changes: start over without it
+        failed.done = True
+        writes = [write for write in writes if write is not failed]
+
+
+def _mutate_all(writable, attachments: dict, writes: list) -> Optional[_Write]:
+    """Run each write's mutate; returns the first one that raised, if any."""
+    for write in writes:
+        try:
+            write.mutate(writable, attachments)
+        except Exception as e:
+            write.error = e
+            return write
+    return None
+
+
+def _publish_writes(writes: list) -> Optional[_Write]:
+    """
+    Apply writes to a copy of the latest snapshot, publish it and serve it.
+
+    Returns:
+        The write whose mutate raised (nothing is published), or None.
+    """
+    if _version is None:
+        # Persistence unavailable: copy-on-write in memory only
+        writable, attachments = _copy(_vectorstore), copy.deepcopy(_attachments)
+        before = _documents(writable)
+        failed = _mutate_all(writable, attachments, writes)
+        if failed is not None:
+            return failed
+        meta = _maintain(writable, _meta)
+        _finish_write(writable, attachments, before)
+        _serve(writable, None, meta, attachments)
+        return None
+
+    root = _index_root()
+    with index_store.writer_lock(root):
+        base = index_store.current_version(root)
+        if base is not None:
+            writable, meta, attachments = _load(base, mmap=False)
+        else:
+            writable, meta = _copy(_vectorstore), dict(_meta)
+            attachments = copy.deepcopy(_attachments)
+
+        before = _documents(writable)
+        failed = _mutate_all(writable, attachments, writes)
+        if failed is not None:
+            return failed
+        meta = _maintain(writable, meta)
+        _finish_write(writable, attachments, before)
+
+        version = _publish(writable, meta, attachments)
+        if version is None:
+            raise RuntimeError("Failed to publish vector store snapshot")
+
+        # Re-map the published index so it is shared via page cache. The
+        # docstore and side indexes are not written again after this, so
+        # they are served as they are instead of being unpickled again.
+        from langchain_community.vectorstores import FAISS
+
+        store = FAISS(
+            embedding_function=writable.embedding_function,
+            index=index_store.read_index(root, version, mmap=True),
+            docstore=writable.docstore,
+            index_to_docstore_id=writable.index_to_docstore_id
+        )
+        _configure(store)
+        with _init_lock:
+            _serve(store, version, meta, attachments)
+    return None
@@ -0,0 +1,148 @@
+"""
+Startup warm-up and readiness.
+
+Everything expensive is loaded lazily (graph, embedding model, index), so
+importing the app is quick, but left alone the first tickets after a deploy
+would pay for all of it. start_warmup() loads it on a background thread
+while the server is already accepting connections:
+
+- embeddings: load the model and run one forward pass
+- index: map the latest snapshot and touch it with one search
+- graph: import langgraph/openai and compile the workflow
+
+Liveness (/health) is up as soon as the server is; readiness
+(/health/ready) only once warm-up has finished, so load balancers and
+orchestrators route traffic to warm processes only. A failed embeddings or
+index step leaves the process "degraded" but ready (tickets still resolve,
+with less context); a failed graph build keeps it unready.
+"""
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+WARMUP_QUERY = "warm-up"
+
+
+def _warm_embeddings() -> None:
+    from app.services.vectorstore import get_embedding
+
+    get_embedding().embed_query(WARMUP_QUERY)
+
+
+def _warm_index() -> None:
+    from app.services import ann_index
+    from app.services.vectorstore import get_embedding, get_vectorstore
+
+    store = get_vectorstore()
+    if store is None:
+        raise RuntimeError("vector store unavailable")
+    if store.index.ntotal:
+        # Raw FAISS search: pages the index in without resolving (possibly deleted) hits
+        ann_index.search(store.index, [get_embedding().embed_query(WARMUP_QUERY)], 1)
+
+
+def _warm_graph() -> None:
+    from app.graph.graph import get_graph
+
+    get_graph()
+
+
+# (name, step, required for readiness)
+STEPS: List[Tuple[str, Callable[[], None], bool]] = [
+    ("embeddings", _warm_embeddings, False),
+    ("index", _warm_index, False),
+    ("graph", _warm_graph, True),
+]
+
+
+class WarmupState:
+    def __init__(self):
+        self.status = "pending"  # pending | running | ready | degraded | failed
+        self.steps: Dict[str, dict] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def snapshot(self) -> dict:
+        duration = None
+        if self.started_at is not None:
+            duration = round((self.finished_at or time.monotonic()) - self.started_at, 3)
+        return {
+            "status": self.status,
+            "duration_s": duration,
+            "steps": {name: dict(step) for name, step in self.steps.items()},
+        }
+
+
+_state = WarmupState()
+_thread: Optional[threading.Thread] = None
+
+
+def preload() -> None:
+    """
+    Load the read-only state once in a prefork master (app.server), before
+    workers are forked and share it copy-on-write: the embedding model, the
+    latest index snapshot (if one exists) and the compiled graph.
+
+    Unlike run_warmup this runs no model forward pass and starts no threads,
+    neither of which survives fork safely; each worker's own warm-up does
+    that part and finds everything else already loaded.
+    """
+    from app.graph.graph import get_graph
+    from app.services import index_store
+    from app.services.vectorstore import get_embedding, get_vectorstore
+
+    start = time.perf_counter()
+    get_embedding()
+    if index_store.current_version(Path(settings.vectorstore_dir)) is not None:
+        get_vectorstore()
+    get_graph()
+    logger.info(f"Preloaded model, index and graph in {time.perf_counter() - start:.1f}s")
+
+
+def run_warmup() -> bool:
+    """Run every warm-up step in this thread. True if the process is ready."""
+    _state.status = "running"
+    _state.started_at = time.monotonic()
+    status = "ready"
+    for name, step, required in STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+            _state.steps[name] = {"status": "ok", "duration_s": round(time.perf_counter() - start, 3)}
+        except Exception as e:
+            if required:
+                status = "failed"
+            elif status == "ready":
+                status = "degraded"
+            _state.steps[name] = {"status": "failed", "error": str(e)}
+            logger.error(f"Warm-up step {name} failed: {e}")
+    _state.finished_at = time.monotonic()
+    _state.status = status
+    logger.info(f"Warm-up {status} in {_state.finished_at - _state.started_at:.1f}s: {_state.steps}")
+    return is_ready()
+
+
+def start_warmup() -> None:
+    """Start warm-up on a background thread (or mark ready if disabled)."""
+    global _thread
+    if not settings.warmup_enabled:
+        _state.status = "ready"
+        return
+    if _thread is not None:
+        return
+    _thread = threading.Thread(target=run_warmup, name="warmup", daemon=True)
+    _thread.start()
+
+
+def is_ready() -> bool:
+    return _state.status in ("ready", "degraded")
+
+
+def readiness() -> dict:
+    return _state.snapshot()
@@ -0,0 +1,87 @@
+"""
+Mergeable quantile sketch for latency distributions.
+
+A log-bucketed histogram (DDSketch-style) with bounded relative error.
+Bucket counts add together, so sketches from any set of time buckets can be
+merged and queried for percentiles without touching raw samples.
+"""
+import math
+from typing import Dict, Iterable, Tuple
+
+# Relative accuracy of quantile estimates (1%)
+RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+# Values at or below this (ms) fall into the zero bucket
+MIN_TRACKED_VALUE = 1e-3
+ZERO_BUCKET = -(2 ** 31)
+
+
+def bucket_index(value: float) -> int:
+    """Map a positive value to its sketch bucket."""
+    if value <= MIN_TRACKED_VALUE:
+        return ZERO_BUCKET
+    return int(math.ceil(math.log(value) / _LOG_GAMMA))
+
+
+def bucket_value(index: int) -> float:
+    """Representative value of a bucket (within RELATIVE_ACCURACY of any member)."""
+    if index == ZERO_BUCKET:
+        return 0.0
+    return 2 * (_GAMMA ** index) / (_GAMMA + 1)
+
+
+class LatencySketch:
+    """
+    Quantile sketch over positive values.
+
+    Usage:
+        sketch = LatencySketch.from_buckets(rows)
+        sketch.quantile(0.99)
+    """
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+
+    @classmethod
+    def from_buckets(cls, items: Iterable[Tuple[int, int]]) -> "LatencySketch":
+        """Build a sketch from (bucket_index, count) pairs."""
+        sketch = cls()
+        for index, count in items:
+            sketch.add_bucket(int(index), int(count))
+        return sketch
+
+    def add(self, value: float) -> None:
+        """Record a single value."""
+        self.add_bucket(bucket_index(value), 1)
+
+    def add_bucket(self, index: int, count: int) -> None:
+        """Add a pre-aggregated bucket count."""
+        if count <= 0:
+            return
+        self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+
+    def merge(self, other: "LatencySketch") -> None:
+        """Merge another sketch into this one."""
+        for index, count in other.buckets.items():
+            self.add_bucket(index, count)
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Estimate the q-quantile (0.0 - 1.0).
+
+        Returns:
+            Estimated value, or None if the sketch is empty.
+        """
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return bucket_value(index)
+        return bucket_value(max(self.buckets))
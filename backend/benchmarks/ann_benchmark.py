@@ -0,0 +1,88 @@
+"""
+ANN index benchmark: recall@k, QPS and bytes per vector on synthetic corpora.
+
+Builds every index type exactly as the knowledge base would (app.services.ann_index)
+over a clustered synthetic corpus shaped like sentence embeddings (unit-norm,
+384 dims), and compares each against exact flat search.
+
+Usage (from backend/):
+    python -m benchmarks.ann_benchmark --sizes 10000,100000 --queries 1000 --k 10
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services import ann_index
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Unit-norm vectors drawn around random cluster centres."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    assignment = rng.integers(0, clusters, size=n)
+    vectors = centres[assignment] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(f[:k]) & set(t)) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def run(sizes, dim, n_queries, k, types, nprobe, ef_search, pq_m, seed):
+    print(f"{'n':>9} {'type':>9} {'built':>9} {'build_s':>8} {'recall@' + str(k):>9} "
+          f"{'qps':>9} {'bytes/vec':>10}")
+    for n in sizes:
+        corpus = synthetic_corpus(n + n_queries, dim, clusters=max(n // 500, 8), seed=seed)
+        base, queries = corpus[:n], corpus[n:]
+
+        exact = ann_index.build_index(base, "flat")
+        _, truth = exact.search(queries, k)
+
+        for index_type in types:
+            start = time.perf_counter()
+            index = ann_index.build_index(base, index_type, pq_m=pq_m)
+            build_s = time.perf_counter() - start
+            ann_index.configure_search(index, nprobe=nprobe, hnsw_ef_search=ef_search)
+
+            # Single-query loop, matching how the API searches
+            start = time.perf_counter()
+            found = np.vstack([index.search(q[None, :], k)[1] for q in queries])
+            elapsed = time.perf_counter() - start
+
+            print(f"{n:>9} {index_type:>9} {ann_index.index_type_of(index):>9} {build_s:>8.2f} "
+                  f"{recall_at_k(found, truth):>9.3f} {n_queries / elapsed:>9.0f} "
+                  f"{ann_index.bytes_per_vector(index):>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", default=",".join(ann_index.INDEX_TYPES))
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    run(
+        sizes=[int(s) for s in args.sizes.split(",")],
+        dim=args.dim,
+        n_queries=args.queries,
+        k=args.k,
+        types=args.types.split(","),
+        nprobe=args.nprobe,
+        ef_search=args.ef_search,
+        pq_m=args.pq_m,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
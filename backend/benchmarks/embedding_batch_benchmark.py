@@ -0,0 +1,77 @@
+"""
+Query embedding throughput: one call per query vs micro-batched.
+
+Simulates concurrent tickets, each embedding a stream of distinct queries
+on its own thread, against the bare embedding model (MiniLM if installed,
+FakeEmbeddings otherwise) with no cache in front, so every call reaches
+the model.
+
+Usage (from backend/):
+    python -m benchmarks.embedding_batch_benchmark --threads 32 --queries 2000
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Settings are required at import time; benchmarks don't talk to the LLM or DB
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+os.environ.setdefault("OPENROUTER_MODEL", "benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.services.embedding_batcher import MicroBatchEmbeddings  # noqa: E402
+from app.services.vectorstore import load_embedding_model  # noqa: E402
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def measure(embedding, queries, threads: int):
+    latencies = []
+
+    def one(query):
+        start = time.perf_counter()
+        embedding.embed_query(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, queries))
+    elapsed = time.perf_counter() - start
+    return len(queries) / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99)
+
+
+def run(n_queries: int, threads: int, batch_sizes, wait_ms: float):
+    model, model_name = load_embedding_model()
+    queries = [f"ticket {i}: I cannot log in after resetting my password on device {i % 97}"
+               for i in range(n_queries)]
+    # Warm up the model outside the timed runs
+    model.embed_documents(queries[:8])
+
+    print(f"model={model_name} threads={threads} queries={n_queries} wait_ms={wait_ms}")
+    print(f"{'batch':>6} {'qps':>9} {'p50_ms':>8} {'p99_ms':>8} {'mean_batch':>10}")
+
+    qps, p50, p99 = measure(model, queries, threads)
+    print(f"{'none':>6} {qps:>9.1f} {p50:>8.2f} {p99:>8.2f} {1.0:>10.1f}")
+
+    for size in batch_sizes:
+        batcher = MicroBatchEmbeddings(model, max_batch_size=size, max_wait_ms=wait_ms)
+        qps, p50, p99 = measure(batcher, queries, threads)
+        mean_batch = batcher.stats()["mean_batch_size"]
+        print(f"{size:>6} {qps:>9.1f} {p50:>8.2f} {p99:>8.2f} {mean_batch:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 16, 32, 64])
+    parser.add_argument("--wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    run(args.queries, args.threads, args.batch_sizes, args.wait_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Hybrid retrieval benchmark: hit rate and latency, vector-only vs BM25 + vector.
+
+Generates a synthetic help-desk corpus where documents share most of their
+wording and differ mainly by exact identifiers (error codes, invoice numbers,
+plan names), then queries for those identifiers in paraphrased text. Both
+modes go through knowledge_base.hybrid_search with the configured embedding
+model (MiniLM if installed, FakeEmbeddings otherwise).
+
+Usage (from backend/):
+    python -m benchmarks.hybrid_benchmark --docs 5000 --queries 500 --k 3
+"""
+import argparse
+import os
+import random
+import time
+
+# Settings are required at import time; benchmarks don't talk to the LLM or DB
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+os.environ.setdefault("OPENROUTER_MODEL", "benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.services.knowledge_base import hybrid_search  # noqa: E402
+from app.services.lexical_index import BM25Index  # noqa: E402
+from app.services.vectorstore import get_embedding  # noqa: E402
+
+ACTIONS = ["checking out", "logging in", "updating my card", "exporting reports",
+           "inviting a teammate", "changing my plan", "downloading an invoice"]
+PLANS = ["Starter", "Growth", "Scale", "Enterprise", "Team Plus", "Pro Annual"]
+FIXES = ["clear the browser cache and retry", "re-authenticate the integration",
+         "contact the bank to approve the charge", "regenerate the API key",
+         "wait for the sync job and refresh", "update the billing address"]
+
+
+def identifier(rng: random.Random, i: int) -> str:
+    kind = i % 3
+    if kind == 0:
+        return f"ERR-{rng.randint(100, 999)}{i}"
+    if kind == 1:
+        return f"INV-{2020 + i % 5}-{i:06d}"
+    return f"{rng.choice(PLANS)}-{i:05d}"
+
+
+def build_corpus(n_docs: int, seed: int):
+    rng = random.Random(seed)
+    docs, ids = [], []
+    for i in range(n_docs):
+        ident = identifier(rng, i)
+        ids.append(ident)
+        docs.append(
+            f"Issue: Customer sees {ident} when {rng.choice(ACTIONS)}.\n\n"
+            f"Resolution: {rng.choice(FIXES)}, then {rng.choice(FIXES)}.\n\n"
+            f"Agent Notes: affected account on plan {rng.choice(PLANS)}."
+        )
+    return docs, ids
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def run(n_docs: int, n_queries: int, k: int, seed: int):
+    from langchain_community.vectorstores import FAISS
+
+    docs, idents = build_corpus(n_docs, seed)
+    doc_ids = [f"doc:{i}" for i in range(n_docs)]
+    embedding = get_embedding()
+
+    print(f"Embedding {n_docs} documents...")
+    store = FAISS.from_texts(docs, embedding, metadatas=[{} for _ in docs], ids=doc_ids)
+    lexical = BM25Index()
+    for doc_id, text in zip(doc_ids, docs):
+        lexical.add(doc_id, text)
+
+    rng = random.Random(seed + 1)
+    targets = rng.sample(range(n_docs), min(n_queries, n_docs))
+    queries = [f"I keep getting {idents[t]} while {rng.choice(ACTIONS)}, help?" for t in targets]
+    vectors = embedding.embed_documents(queries)
+
+    print(f"{'mode':>8} {'hit@' + str(k):>7} {'p50_ms':>8} {'p99_ms':>8}")
+    for mode, index in (("vector", None), ("hybrid", lexical)):
+        hits, latencies = 0, []
+        for target, query, vector in zip(targets, queries, vectors):
+            start = time.perf_counter()
+            found = hybrid_search(store, index, query, vector, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += doc_ids[target] in found
+        print(f"{mode:>8} {hits / len(targets):>7.3f} {percentile(latencies, 0.5):>8.2f} "
+              f"{percentile(latencies, 0.99):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.docs, args.queries, args.k, args.seed)
+
+
+if __name__ == "__main__":
+    main()
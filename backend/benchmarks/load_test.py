@@ -0,0 +1,205 @@
+"""
+Load generator for the ticket endpoints.
+
+Drives POST /tickets/ and/or POST /tickets/stream against a running server
+(normally with LLM_BASE_URL pointed at benchmarks/mock_llm_server.py) and
+reports throughput, latency percentiles, time to first streamed token and
+error rates.
+
+Closed loop by default (--concurrency clients sending back to back); pass
+--rate for an open-loop Poisson arrival rate instead, which keeps offering
+load while the server falls behind. --priority sends an X-Priority class
+(interactive, standard or batch) with every request, e.g. to run a batch
+backlog next to interactive streams from a second load generator.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --url http://localhost:8000 \\
+        --endpoint both --concurrency 32 --duration 60
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+import httpx
+
+TICKETS = [
+    "I was charged twice for my subscription this month",
+    "The app crashes every time I open the reports tab",
+    "How do I change the email address on my account?",
+    "I want a refund for the annual plan I bought yesterday",
+    "Password reset emails never arrive",
+    "Can I add a teammate without upgrading my plan?",
+    "Invoice INV-2024-000123 shows the wrong VAT number",
+    "Sync with Google Calendar stopped working after the update",
+]
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class Results:
+    def __init__(self):
+        self.latencies = {}
+        self.ttft = []
+        self.errors = Counter()
+        self.outcomes = Counter()
+        self.requests = Counter()
+
+    def record(self, endpoint, latency, error=None, outcome=None):
+        self.requests[endpoint] += 1
+        if error:
+            self.errors[(endpoint, error)] += 1
+        else:
+            self.latencies.setdefault(endpoint, []).append(latency)
+        if outcome:
+            self.outcomes[(endpoint, outcome)] += 1
+
+    def report(self, elapsed):
+        total = sum(self.requests.values())
+        print(f"\n{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+        print(f"{'endpoint':>10} {'n':>6} {'ok/s':>7} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'err%':>6}")
+        for endpoint, n in sorted(self.requests.items()):
+            ok = self.latencies.get(endpoint, [])
+            errors = sum(c for (e, _), c in self.errors.items() if e == endpoint)
+            cells = [percentile(ok, q) for q in (0.5, 0.95, 0.99)]
+            cells = " ".join(f"{c * 1000:>8.0f}" if c is not None else f"{'-':>8}" for c in cells)
+            print(f"{endpoint:>10} {n:>6} {len(ok) / elapsed:>7.1f} {cells} {100 * errors / n:>6.2f}")
+
+        if self.ttft:
+            p = [percentile(self.ttft, q) * 1000 for q in (0.5, 0.95, 0.99)]
+            print(f"\nstream time to first token: p50 {p[0]:.0f}ms  p95 {p[1]:.0f}ms  p99 {p[2]:.0f}ms")
+        if self.errors:
+            print("\nerrors:")
+            for (endpoint, kind), count in self.errors.most_common():
+                print(f"  {endpoint:>8} {kind}: {count}")
+        if self.outcomes:
+            print("\nticket outcomes:")
+            for (endpoint, outcome), count in sorted(self.outcomes.items()):
+                print(f"  {endpoint:>8} {outcome}: {count}")
+
+
+async def send_ticket(client, results):
+    start = time.perf_counter()
+    try:
+        response = await client.post("/tickets/", json={"text": random.choice(TICKETS)})
+    except httpx.HTTPError as e:
+        results.record("tickets", 0, error=type(e).__name__)
+        return
+    latency = time.perf_counter() - start
+    if response.status_code != 200:
+        results.record("tickets", latency, error=f"http_{response.status_code}")
+        return
+    status = response.json().get("status")
+    results.record("tickets", latency, error="failed" if status == "failed" else None, outcome=status)
+
+
+async def send_stream(client, results):
+    start = time.perf_counter()
+    first_token = None
+    outcome = error = None
+    try:
+        async with client.stream("POST", "/tickets/stream", json={"text": random.choice(TICKETS)}) as response:
+            if response.status_code != 200:
+                error = f"http_{response.status_code}"
+            else:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    event = json.loads(line[6:])
+                    if event.get("type") == "chunk" and first_token is None:
+                        first_token = time.perf_counter() - start
+                    elif event.get("type") == "final_result":
+                        outcome = (event.get("data") or {}).get("status")
+                    elif event.get("type") == "error":
+                        error = "stream_error"
+    except httpx.HTTPError as e:
+        error = type(e).__name__
+    latency = time.perf_counter() - start
+
+    if error is None and outcome is None:
+        error = "no_final_result"
+    if first_token is not None:
+        results.ttft.append(first_token)
+    results.record("stream", latency, error=error, outcome=outcome)
+
+
+def pick_sender(endpoint):
+    if endpoint == "tickets":
+        return send_ticket
+    if endpoint == "stream":
+        return send_stream
+    return random.choice([send_ticket, send_stream])
+
+
+async def run(args):
+    results = Results()
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    timeout = httpx.Timeout(args.timeout)
+    deadline = time.perf_counter() + args.duration
+
+    headers = {"X-Priority": args.priority} if args.priority else None
+
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=timeout, headers=headers) as client:
+        start = time.perf_counter()
+        sent = 0
+
+        def more():
+            return time.perf_counter() < deadline and (not args.requests or sent < args.requests)
+
+        if args.rate:
+            # Open loop: Poisson arrivals, bounded only by --concurrency in flight
+            in_flight = asyncio.Semaphore(args.concurrency)
+            tasks = set()
+
+            async def one():
+                async with in_flight:
+                    await pick_sender(args.endpoint)(client, results)
+
+            while more():
+                sent += 1
+                task = asyncio.create_task(one())
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                await asyncio.sleep(random.expovariate(args.rate))
+            if tasks:
+                await asyncio.gather(*tasks)
+        else:
+            async def worker():
+                nonlocal sent
+                while more():
+                    sent += 1
+                    await pick_sender(args.endpoint)(client, results)
+
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+        results.report(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", choices=["tickets", "stream", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--requests", type=int, default=0, help="stop after N requests (0: no limit)")
+    parser.add_argument("--rate", type=float, default=0.0, help="open-loop arrivals per second")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--priority", choices=["interactive", "standard", "batch"], default=None,
+                        help="X-Priority class (default: each route's own)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Local OpenAI-compatible mock LLM for load testing.
+
+Serves POST /v1/chat/completions (streaming and non-streaming) with
+configurable latency, token rate and failure injection, and answers the
+agent's prompts with canned output:
+
+- intent prompts -> {"intent": ..., "confidence": ...} JSON
+- JSON solution prompts -> {"solution": ..., "requires_followup": ...} JSON
+- anything else (prose solution prompts) -> numbered steps
+
+Latency distributions are written as "<kind>:<params>" in milliseconds:
+    fixed:300   uniform:100,500   normal:300,50   lognormal:300,0.5
+(lognormal takes median ms and sigma).
+
+Usage (from backend/):
+    python -m benchmarks.mock_llm_server --port 8100 --ttft lognormal:400,0.4 \\
+        --tokens-per-second 60 --error-rate 0.01 --rate-limit-rate 0.02
+    LLM_BASE_URL=http://localhost:8100/v1 uvicorn app.main:app --workers 4
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+INTENTS = {"billing": 0.3, "technical": 0.25, "account": 0.2, "refund": 0.15, "general": 0.1}
+
+SOLUTION_STEPS = [
+    "Open Settings and go to the Billing section.",
+    "Check the most recent invoice for duplicate line items.",
+    "Sign out on all devices and sign back in.",
+    "Clear the browser cache and reload the page.",
+    "If the problem persists, reply with the invoice number and a screenshot.",
+    "We have issued a refund, which should appear within 5 business days.",
+]
+
+
+class Distribution:
+    """Samples delays in seconds from a "<kind>:<params>" spec (milliseconds)."""
+
+    def __init__(self, spec: str):
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        samplers = {
+            "fixed": lambda a: a,
+            "uniform": lambda a, b: random.uniform(a, b),
+            "normal": lambda mu, sigma: random.gauss(mu, sigma),
+            "lognormal": lambda median, sigma: median * random.lognormvariate(0, sigma),
+        }
+        if kind not in samplers:
+            raise ValueError(f"Unknown distribution {spec!r}")
+        self._sample = samplers[kind]
+        self._sample(*self.params)  # validate arity
+
+    def sample(self) -> float:
+        return max(0.0, self._sample(*self.params)) / 1000
+
+
+class MockConfig:
+    def __init__(self, args):
+        self.ttft = Distribution(args.ttft)
+        self.tokens_per_second = args.tokens_per_second
+        self.error_rate = args.error_rate
+        self.rate_limit_rate = args.rate_limit_rate
+        self.retry_after = args.retry_after
+        self.solution_steps = args.solution_steps
+        self.low_confidence_rate = args.low_confidence_rate
+
+
+def canned_response(prompt: str, config: MockConfig) -> str:
+    """Output shaped like what the agent's prompts ask for."""
+    if "support ticket classifier" in prompt:
+        intent = random.choices(list(INTENTS), weights=list(INTENTS.values()))[0]
+        if random.random() < config.low_confidence_rate:
+            confidence = round(random.uniform(0.4, 0.8), 2)
+        else:
+            confidence = round(random.uniform(0.86, 0.99), 2)
+        return json.dumps({"intent": intent, "confidence": confidence})
+
+    steps = random.sample(SOLUTION_STEPS, min(config.solution_steps, len(SOLUTION_STEPS)))
+    solution = "\n".join(f"{n}. {step}" for n, step in enumerate(steps, 1))
+    if '"solution"' in prompt:
+        return json.dumps({"solution": solution, "requires_followup": False})
+    return solution
+
+
+def tokenize(text: str) -> list:
+    """Word-ish pieces standing in for model tokens."""
+    pieces, current = [], ""
+    for ch in text:
+        current += ch
+        if ch in " \n":
+            pieces.append(current)
+            current = ""
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _error(status: int, message: str, kind: str, headers: dict = None) -> JSONResponse:
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": message, "type": kind, "code": status}},
+        headers=headers
+    )
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    app = FastAPI(title="Mock LLM")
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []))
+        model = body.get("model", "mock")
+
+        roll = random.random()
+        if roll < config.rate_limit_rate:
+            return _error(429, "Rate limit exceeded (mock)", "rate_limit_exceeded",
+                          headers={"Retry-After": str(config.retry_after)})
+        if roll < config.rate_limit_rate + config.error_rate:
+            return _error(500, "Internal error (mock)", "server_error")
+
+        text = canned_response(prompt, config)
+        tokens = tokenize(text)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        per_token = 1 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+
+        await asyncio.sleep(config.ttft.sample())
+
+        if not body.get("stream"):
+            await asyncio.sleep(per_token * max(len(tokens) - 1, 0))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": len(prompt.split()),
+                    "completion_tokens": len(tokens),
+                    "total_tokens": len(prompt.split()) + len(tokens),
+                },
+            }
+
+        async def events():
+            def chunk(delta: dict, finish_reason=None) -> str:
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                return f"data: {json.dumps(payload)}\n\n"
+
+            yield chunk({"role": "assistant", "content": ""})
+            for n, token in enumerate(tokens):
+                if n:
+                    await asyncio.sleep(per_token)
+                yield chunk({"content": token})
+            yield chunk({}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--ttft", default="lognormal:400,0.4",
+                        help="time to first token distribution (ms)")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 500 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of 429 responses")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on 429")
+    parser.add_argument("--solution-steps", type=int, default=4)
+    parser.add_argument("--low-confidence-rate", type=float, default=0.1,
+                        help="share of intent answers below the escalation threshold")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    import uvicorn
+    uvicorn.run(create_app(MockConfig(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
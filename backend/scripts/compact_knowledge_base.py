@@ -0,0 +1,109 @@
+"""
+Offline compaction: merge near-duplicate documents already in the knowledge base.
+
+Insert-time deduplication only sees documents as they arrive, so indexes
+built before it was enabled (or with looser thresholds) can still hold
+near-identical resolutions. This walks the index oldest-first, keeps the
+first copy of each cluster as canonical, merges later copies into it
+(occurrence_count, merged_ids) and deletes them, then publishes one new
+snapshot.
+
+Usage (from backend/):
+    python -m scripts.compact_knowledge_base [--dry-run] [--min-similarity 0.95]
+"""
+import argparse
+import logging
+
+from app.config.settings import settings
+from app.services.dedup import NearDuplicateIndex, find_duplicate, merge_metadata, simhash
+from app.services.vectorstore import (
+    DEDUP_ATTACHMENT,
+    delete_documents,
+    get_embedding,
+    get_vectorstore,
+    update_vectorstore,
+)
+
+logger = logging.getLogger(__name__)
+
+# Documents embedded per model call
+EMBED_BATCH = 64
+
+
+def compact(store, attachments: dict, min_similarity: float, dry_run: bool = False) -> dict:
+    """
+    Merge near-duplicates in a writable store.
+
+    Returns:
+        {canonical_id: [merged ids]} for every cluster that was merged.
+    """
+    embedding = get_embedding()
+    seen = NearDuplicateIndex(max_distance=settings.dedup_max_hamming)
+    vectors = {}
+    merged = {}
+
+    documents = []
+    for _, doc_id in sorted(store.index_to_docstore_id.items()):
+        doc = store.docstore.search(doc_id)
+        if not isinstance(doc, str):
+            documents.append((doc_id, doc))
+
+    for start in range(0, len(documents), EMBED_BATCH):
+        batch = documents[start:start + EMBED_BATCH]
+        batch_vectors = embedding.embed_documents([doc.page_content for _, doc in batch])
+
+        for (doc_id, doc), vector in zip(batch, batch_vectors):
+            fingerprint = simhash(doc.page_content)
+            canonical_id = find_duplicate(seen, fingerprint, vector, vectors.get, min_similarity)
+            if canonical_id is None:
+                seen.add(doc_id, fingerprint)
+                vectors[doc_id] = vector
+                continue
+
+            merged.setdefault(canonical_id, []).append(doc_id)
+            if not dry_run:
+                merge_metadata(store.docstore.search(canonical_id).metadata, doc_id, doc.metadata)
+                attachments[DEDUP_ATTACHMENT].add_alias(doc_id, canonical_id, doc.page_content)
+
+    if merged and not dry_run:
+        delete_documents(store, [doc_id for ids in merged.values() for doc_id in ids])
+    return merged
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dry-run", action="store_true", help="report clusters without writing")
+    parser.add_argument("--min-similarity", type=float, default=settings.dedup_min_similarity)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
+    if get_vectorstore() is None:
+        raise SystemExit("Vector store is not available")
+
+    result = {}
+
+    def write(store, attachments):
+        result.update(compact(store, attachments, args.min_similarity, dry_run=args.dry_run))
+        if args.dry_run:
+            # Abort the write; nothing is published
+            raise _DryRun()
+
+    try:
+        update_vectorstore(write)
+    except _DryRun:
+        pass
+
+    removed = sum(len(ids) for ids in result.values())
+    for canonical_id, ids in result.items():
+        logger.info(f"{canonical_id} <- {', '.join(ids)}")
+    action = "would merge" if args.dry_run else "merged"
+    print(f"{action} {removed} duplicate document(s) into {len(result)} canonical document(s)")
+
+
+class _DryRun(Exception):
+    pass
+
+
+if __name__ == "__main__":
+    main()
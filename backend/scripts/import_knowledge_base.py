@@ -0,0 +1,59 @@
+"""
+Bulk import help-center articles and macros into the knowledge base.
+
+Reads Markdown (.md), HTML (.html) and JSONL (.jsonl, one article per line
+with text/content/body and optional id, title, url, intent, format) files;
+directories are walked recursively. Progress is checkpointed after every
+bulk write, so re-running the same command after an interruption resumes.
+
+Usage (from backend/):
+    python -m scripts.import_knowledge_base help-center/ macros.jsonl \\
+        --checkpoint data/import_checkpoint.json --workers 8
+"""
+import argparse
+import logging
+import time
+
+from app.config.settings import settings
+from app.services.kb_import import import_files
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("paths", nargs="+", help="files or directories to import")
+    parser.add_argument("--checkpoint", default="data/import_checkpoint.json",
+                        help="progress file for resuming ('' to disable)")
+    parser.add_argument("--workers", type=int, default=settings.kb_import_workers,
+                        help="embedding processes (0 embeds in this process)")
+    parser.add_argument("--embed-batch", type=int, default=settings.kb_import_embed_batch)
+    parser.add_argument("--write-batch", type=int, default=settings.kb_import_write_batch)
+    parser.add_argument("--chunk-size", type=int, default=settings.kb_import_chunk_size)
+    parser.add_argument("--overlap", type=int, default=settings.kb_import_chunk_overlap)
+    parser.add_argument("--dedup", action="store_true",
+                        help="merge near-duplicate chunks (slower)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
+    start = time.perf_counter()
+    stats = import_files(
+        args.paths,
+        checkpoint_path=args.checkpoint or None,
+        workers=args.workers,
+        embed_batch=args.embed_batch,
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        write_batch=args.write_batch,
+        deduplicate=args.dedup
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"{stats['files']} files, {stats['articles']} articles, {stats['chunks']} chunks: "
+        f"{stats['written']} written, {stats['skipped']} unchanged, {stats['deleted']} stale deleted "
+        f"in {elapsed:.1f}s "
+        f"({stats['chunks'] / elapsed if elapsed else 0:.0f} chunks/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
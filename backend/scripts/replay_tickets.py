@@ -0,0 +1,181 @@
+"""
+Replay historical tickets through the current graph and diff the outcomes.
+
+Validates prompt and graph changes against real traffic. Each selected
+ticket's text is run through the graph again, in parallel, at batch
+priority. The new intent and status are compared with the stored ticket,
+and with --baseline the route (which path answered it) is compared with an
+earlier replay's output.
+
+LLM calls go through the cassette (see llm_cassette), in replay mode by
+default. Prompts unchanged since the recording are answered from the
+cassette instantly; only changed prompts call the provider, and their
+responses are recorded for the next run. Nothing is written to the tickets
+table, and reused answers are not recorded for audit.
+
+Usage (from backend/):
+    python -m scripts.replay_tickets --limit 500 --workers 8 \\
+        --output replay.jsonl [--baseline previous.jsonl] [--show-diffs]
+"""
+import argparse
+import json
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config.settings import settings
+from app.db.session import SessionLocal
+from app.models.ticket import Ticket
+from app.services import llm_cassette
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATUSES = "resolved,waiting_human,dismissed"
+
+
+def route_of(result: dict) -> str:
+    """Which path through the graph answered the ticket."""
+    if result.get("explicit_escalation") or result.get("intent") == "escalate_request":
+        return "immediate_escalate"
+    if result.get("status") == "dismissed":
+        return "off_topic"
+    source = "reuse" if (result.get("answer_source") or {}).get("type") == "reused" else "solution"
+    return f"{source}/{'escalate' if result.get('needs_human') else 'finalize'}"
+
+
+def load_tickets(statuses: list, limit: int) -> list:
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Ticket.id, Ticket.text, Ticket.intent, Ticket.status)
+            .filter(Ticket.status.in_(statuses))
+            .order_by(Ticket.created_at.desc())
+            .limit(limit)
+            .all()
+        )
+        return [
+            {"ticket_id": row.id, "text": row.text, "intent": row.intent, "status": row.status}
+            for row in rows
+        ]
+    finally:
+        db.close()
+
+
+def replay_ticket(graph, ticket: dict) -> dict:
+    """Run one stored ticket through the graph; returns the comparison record."""
+    from app.services.llm_scheduler import BATCH, priority
+
+    record = {
+        "ticket_id": ticket["ticket_id"],
+        "stored_intent": ticket["intent"],
+        "stored_status": ticket["status"],
+    }
+    start = time.perf_counter()
+    try:
+        with priority(BATCH):
+            result = graph.invoke(
+                {
+                    "ticket_id": ticket["ticket_id"],
+                    "ticket_text": ticket["text"],
+                    "needs_human": False,
+                    "status": "processing"
+                },
+                config={"configurable": {"replay": True}}
+            )
+        record.update(
+            intent=result.get("intent"),
+            confidence=result.get("confidence"),
+            status=result.get("status"),
+            route=route_of(result),
+            error=result.get("error_message"),
+        )
+    except Exception as e:
+        record.update(intent=None, confidence=None, status="failed", route="error", error=str(e))
+    record["duration_s"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def load_baseline(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return {record["ticket_id"]: record for record in map(json.loads, f) if record}
+
+
+def report(records: list, baseline: dict, elapsed: float, show_diffs: bool) -> None:
+    n = len(records)
+    intent_changes = Counter()
+    status_changes = Counter()
+    route_changes = Counter()
+    for record in records:
+        diffs = []
+        if record["intent"] != record["stored_intent"]:
+            intent_changes[(record["stored_intent"], record["intent"])] += 1
+            diffs.append(f"intent {record['stored_intent']} -> {record['intent']}")
+        if record["status"] != record["stored_status"]:
+            status_changes[(record["stored_status"], record["status"])] += 1
+            diffs.append(f"status {record['stored_status']} -> {record['status']}")
+        previous = baseline.get(record["ticket_id"])
+        if previous is not None and previous.get("route") != record["route"]:
+            route_changes[(previous.get("route"), record["route"])] += 1
+            diffs.append(f"route {previous.get('route')} -> {record['route']}")
+        if show_diffs and diffs:
+            print(f"{record['ticket_id']}: {'; '.join(diffs)}")
+
+    print(f"\n{n} tickets replayed in {elapsed:.1f}s ({n / elapsed if elapsed else 0:.1f}/s)")
+    cassette = llm_cassette.get_cassette()
+    if cassette is not None:
+        stats = cassette.stats()
+        print(f"cassette ({stats['mode']}): {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['recorded']} recorded, {stats['entries']} entries")
+
+    compared = sum(1 for record in records if record["ticket_id"] in baseline)
+    for name, changes, total in (
+        ("intent", intent_changes, n),
+        ("status", status_changes, n),
+        ("route", route_changes, compared),
+    ):
+        if name == "route" and not baseline:
+            continue
+        changed = sum(changes.values())
+        print(f"{name} changed: {changed}/{total} ({100 * changed / total if total else 0:.1f}%)")
+        for (before, after), count in changes.most_common(5):
+            print(f"    {before} -> {after}: {count}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--limit", type=int, default=200, help="most recent tickets to replay")
+    parser.add_argument("--status", default=DEFAULT_STATUSES, help="comma-separated stored statuses to include")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--mode", choices=llm_cassette.MODES, default="replay", help="cassette mode for this run")
+    parser.add_argument("--cassette", default=settings.llm_cassette_path, help="cassette file")
+    parser.add_argument("--output", help="write one JSON record per ticket (usable as a later --baseline)")
+    parser.add_argument("--baseline", help="earlier --output to diff routes against")
+    parser.add_argument("--show-diffs", action="store_true", help="print every ticket whose outcome changed")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+
+    from app.graph.graph import get_graph
+
+    llm_cassette.configure(args.mode, args.cassette)
+    tickets = load_tickets([s.strip() for s in args.status.split(",") if s.strip()], args.limit)
+    if not tickets:
+        raise SystemExit("No tickets to replay")
+    baseline = load_baseline(args.baseline) if args.baseline else {}
+
+    graph = get_graph()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        records = list(pool.map(lambda ticket: replay_ticket(graph, ticket), tickets))
+    elapsed = time.perf_counter() - start
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+    report(records, baseline, elapsed, args.show_diffs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import hashlib
+import math
+import os
+import tempfile
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+# Settings require these; tests never reach the LLM provider, and the
+# database is a throwaway SQLite file (shared by threads, unlike sqlite://)
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='support-agent-tests-'), 'test.db')}"
+)
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+os.environ.setdefault("OPENROUTER_MODEL", "test")
+
+
+@pytest.fixture
+def database():
+    """Empty tables for the test, dropped afterwards."""
+    from app.db.base import Base
+    from app.db.init_db import init_db
+    from app.db.session import engine
+
+    init_db()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+class BagOfWordsEmbeddings(Embeddings):
+    """Deterministic stand-in for the sentence model: hashed word counts."""
+
+    DIM = 64
+
+    def _embed(self, text: str) -> list:
+        vector = [0.0] * self.DIM
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.DIM] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+@pytest.fixture
+def knowledge_index(tmp_path, monkeypatch):
+    """An empty, persisted knowledge index in a temporary directory."""
+    from app.config.settings import settings
+    from app.services import vectorstore
+
+    monkeypatch.setattr(settings, "vectorstore_dir", str(tmp_path / "vectorstore"))
+    monkeypatch.setattr(settings, "vectorstore_refresh_interval", 0.0)
+    monkeypatch.setattr(vectorstore, "_embedding", BagOfWordsEmbeddings())
+    for name, value in (
+        ("_vectorstore", None), ("_version", None), ("_meta", {}),
+        ("_attachments", {}), ("_partitions", None), ("_last_refresh_check", 0.0),
+    ):
+        monkeypatch.setattr(vectorstore, name, value)
+    assert vectorstore.get_vectorstore() is not None
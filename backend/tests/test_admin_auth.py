@@ -0,0 +1,42 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import admin, knowledge
+from app.config.settings import settings
+from app.services import profiling
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "profiling_secret", "secret")
+    monkeypatch.setattr(knowledge, "start_import_job", lambda articles, **options: pytest.fail("import started"))
+    app = FastAPI()
+    app.include_router(admin.router)
+    app.include_router(knowledge.router)
+    return TestClient(app)
+
+
+IMPORT = {"articles": [{"text": "How to reset a password"}]}
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Profile": "1.bad"}])
+def test_import_requires_a_signed_header(client, headers):
+    assert client.post("/knowledge/import", json=IMPORT, headers=headers).status_code == 403
+    assert client.get("/knowledge/import/some-job", headers=headers).status_code == 403
+    assert client.get("/admin/profiles", headers=headers).status_code == 403
+
+
+def test_import_is_off_without_a_secret(client, monkeypatch):
+    headers = {"X-Profile": profiling.sign()}
+    monkeypatch.setattr(settings, "profiling_secret", "")
+
+    assert client.post("/knowledge/import", json=IMPORT, headers=headers).status_code == 403
+
+
+def test_signed_request_reaches_the_route(client, monkeypatch):
+    monkeypatch.setattr(knowledge, "get_import_job", lambda job_id: None)
+
+    response = client.get("/knowledge/import/some-job", headers={"X-Profile": profiling.sign()})
+
+    assert response.status_code == 404
@@ -0,0 +1,53 @@
+import time
+
+from app.services.admission import AdmissionController
+
+
+def _controller(max_queue_ms: float = 50) -> AdmissionController:
+    return AdmissionController(
+        budgets={"tickets": 0},
+        client_max_inflight=0,
+        max_queue_ms=max_queue_ms,
+        defer_ms=0,
+    )
+
+
+def test_unstarted_run_sheds_once_queue_latency_exceeded():
+    controller = _controller()
+    lease, _ = controller.try_admit("tickets", "a")
+    assert lease is not None
+    time.sleep(0.1)
+
+    lease2, rejection = controller.try_admit("tickets", "b")
+
+    assert lease2 is None
+    assert rejection.status_code == 503
+    assert rejection.reason == "queue_latency"
+
+
+def test_request_without_graph_run_does_not_shed_others():
+    # An idempotent replay holds its lease (e.g. while waiting for the first
+    # request) but never starts a run
+    controller = _controller()
+    replay, _ = controller.try_admit("tickets", "a")
+    replay.no_run()
+    time.sleep(0.1)
+
+    lease, rejection = controller.try_admit("tickets", "b")
+
+    assert rejection is None
+    assert lease is not None
+    assert controller.stats()["tickets"]["waiting"] == 1
+
+
+def test_no_run_lease_does_not_skew_run_duration():
+    controller = _controller()
+    replay, _ = controller.try_admit("tickets", "a")
+    replay.no_run()
+    before = controller.stats()["tickets"]["run_duration_s"]
+
+    replay.release()
+
+    stats = controller.stats()["tickets"]
+    assert stats["in_flight"] == 0
+    assert stats["run_duration_s"] == before
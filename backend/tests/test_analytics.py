@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.db.session import SessionLocal
+from app.models.analytics import TicketRollupHour, TicketRollupMinute
+from app.models.ticket import Ticket
+from app.services import analytics
+
+pytestmark = pytest.mark.usefixtures("database")
+
+
+def _rollups(model=TicketRollupMinute) -> dict:
+    db = SessionLocal()
+    try:
+        rows = db.execute(select(model.metric, model.dimension, model.count, model.total)).all()
+        totals = {}
+        for metric, dimension, count, total in rows:
+            entry = totals.setdefault((metric, dimension), [0, 0.0])
+            entry[0] += count
+            entry[1] += total
+        return {key: tuple(value) for key, value in totals.items()}
+    finally:
+        db.close()
+
+
+def _create(ticket_id: str = "t1", **fields) -> None:
+    db = SessionLocal()
+    try:
+        db.add(Ticket(id=ticket_id, text="text", status="processing", **fields))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _update(ticket_id: str = "t1", **fields) -> None:
+    db = SessionLocal()
+    try:
+        ticket = db.get(Ticket, ticket_id)
+        for name, value in fields.items():
+            setattr(ticket, name, value)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _window() -> dict:
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        return analytics.get_analytics(db, now - timedelta(hours=3), now + timedelta(minutes=1))
+    finally:
+        db.close()
+
+
+def test_created_ticket_is_counted():
+    _create()
+
+    rollups = _rollups()
+    assert rollups[("created", "")][0] == 1
+    assert rollups[("status", "processing")][0] == 1
+
+
+def test_completed_run_counts_outcome_intent_confidence_and_latency():
+    _create(updated_at=datetime.utcnow() - timedelta(seconds=2))
+
+    _update(status="resolved", intent="billing", confidence=0.83)
+
+    rollups = _rollups()
+    assert rollups[("completed", "resolved")][0] == 1
+    assert rollups[("intent", "billing")][0] == 1
+    assert rollups[("confidence", "8")][0] == 1
+    assert rollups[("confidence_sum", "")] == (1, pytest.approx(0.83))
+    summary = _window()
+    assert summary["runs_completed"] == 1
+    assert summary["resolution_rate"] == 1.0
+    assert summary["mean_confidence"] == 0.83
+    assert 1900 <= summary["latency_ms"]["p50"] <= 2500
+
+
+def test_human_resolution_is_counted_separately():
+    _create()
+    _update(status="waiting_human")
+
+    _update(status="resolved")
+
+    rollups = _rollups()
+    assert rollups[("completed", "waiting_human")][0] == 1
+    assert ("completed", "resolved") not in rollups
+    assert rollups[("human_resolved", "")][0] == 1
+
+
+def test_unchanged_status_is_not_counted():
+    _create()
+
+    _update(status="processing", intent="billing")
+
+    assert _rollups()[("status", "processing")][0] == 1
+
+
+def test_hour_rollups_match_minute_rollups():
+    _create("t1")
+    _create("t2")
+    _update("t1", status="resolved")
+
+    assert _rollups(TicketRollupHour) == _rollups(TicketRollupMinute)
+
+
+def test_rollup_failure_does_not_lose_the_ticket_change(monkeypatch):
+    upsert = analytics._upsert_rows
+
+    def failing_upsert(session, model, rows):
+        # The minute rows go in, then the hour rows fail: both must roll back
+        if model is TicketRollupHour:
+            raise RuntimeError("rollup write failed")
+        upsert(session, model, rows)
+
+    monkeypatch.setattr(analytics, "_upsert_rows", failing_upsert)
+
+    _create()
+
+    db = SessionLocal()
+    try:
+        assert db.get(Ticket, "t1") is not None
+    finally:
+        db.close()
+    assert _rollups() == {}
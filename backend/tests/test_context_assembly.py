@@ -0,0 +1,36 @@
+from app.services.context_assembly import assemble_context
+
+
+def _feedback(issue: str, resolution: str, notes: str) -> dict:
+    return {
+        "content": f"Issue: {issue}\n\nResolution: {resolution}\n\nAgent Notes: {notes}",
+        "metadata": {"source": "human_feedback"},
+    }
+
+
+def test_resolution_sharing_ticket_terms_is_kept():
+    ticket = "How do I reset my password?"
+    docs = [_feedback(ticket, "Reset your password.", "good")]
+
+    text, stats = assemble_context(docs, ticket, budget_tokens=400, passage_max_tokens=200)
+
+    assert "Resolution: Reset your password." in text
+    assert "Issue:" not in text
+    assert stats["docs_used"] == 1
+
+
+def test_issue_different_from_ticket_is_kept():
+    docs = [_feedback("Printer shows error E-42 after toner change", "Reseat the drum unit.", "worked")]
+
+    text, _ = assemble_context(docs, "How do I reset my password?", budget_tokens=400, passage_max_tokens=200)
+
+    assert "Issue: Printer shows error E-42" in text
+
+
+def test_plain_documents_are_not_filtered_for_ticket_overlap():
+    ticket = "How do I reset my password?"
+    docs = [{"content": "To reset your password open Settings and choose Reset password.", "metadata": {}}]
+
+    text, _ = assemble_context(docs, ticket, budget_tokens=400, passage_max_tokens=200)
+
+    assert "choose Reset password" in text
@@ -0,0 +1,23 @@
+from app.config.settings import settings
+from app.services.deadline import for_request
+
+
+def test_header_zero_cannot_disable_deadline():
+    deadline = for_request("0", 30000)
+
+    assert deadline is not None
+    assert deadline.timeout == 0.001
+
+
+def test_header_is_capped_at_max(monkeypatch):
+    monkeypatch.setattr(settings, "deadline_max_ms", 120000)
+
+    assert for_request("999999999", 30000).timeout == 120.0
+
+
+def test_server_default_zero_disables(monkeypatch):
+    monkeypatch.setattr(settings, "deadline_max_ms", 120000)
+
+    assert for_request(None, 0) is None
+    assert for_request("abc", 0) is None
+    assert for_request("5000", 0).timeout == 5.0
@@ -0,0 +1,147 @@
+import pytest
+
+from app.services.dedup import (
+    MAX_MERGED_IDS,
+    NearDuplicateIndex,
+    find_duplicate,
+    hamming,
+    merge_metadata,
+    simhash,
+    unmerge_metadata,
+)
+
+REFUND = (
+    "Customers charged twice for the same order should check the billing page and request "
+    "a refund of the duplicate charge within thirty days of the payment date"
+)
+RESET = (
+    "Password reset emails can take a few minutes to arrive so check the spam folder before "
+    "requesting another one from the login page"
+)
+
+
+def _flip(fingerprint: int, *bits: int) -> int:
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def test_simhash_ignores_case_and_punctuation():
+    assert simhash(REFUND) == simhash(REFUND.upper() + "!!")
+
+
+def test_simhash_keeps_small_edits_closer_than_unrelated_text():
+    edited = REFUND.replace("thirty", "sixty")
+
+    assert hamming(simhash(REFUND), simhash(edited)) < hamming(simhash(REFUND), simhash(RESET))
+
+
+def test_index_finds_every_fingerprint_within_max_distance():
+    index = NearDuplicateIndex(max_distance=3)
+    base = simhash(REFUND)
+    index.add("near", _flip(base, 0, 21, 63))
+    index.add("exact", base)
+    index.add("far", _flip(base, 0, 16, 32, 48))
+
+    assert index.candidates(base) == [("exact", 0), ("near", 3)]
+
+
+def test_index_remove_and_replace():
+    index = NearDuplicateIndex(max_distance=3)
+    index.add("a", simhash(REFUND))
+    index.add("a", simhash(RESET))
+
+    assert index.candidates(simhash(REFUND)) == []
+    assert [doc_id for doc_id, _ in index.candidates(simhash(RESET))] == ["a"]
+
+    index.remove("a")
+    assert "a" not in index
+    assert index.buckets == {}
+
+
+def test_index_unpickles_without_alias_digests():
+    index = NearDuplicateIndex()
+    index.add_alias("dup", "canonical", REFUND)
+    state = dict(index.__dict__)
+    del state["alias_digests"]
+    old = NearDuplicateIndex.__new__(NearDuplicateIndex)
+    old.__setstate__(state)
+
+    assert old.aliases == {"dup": "canonical"}
+    assert old.alias_digests == {}
+
+
+def test_find_duplicate_confirms_candidates_by_embedding():
+    index = NearDuplicateIndex(max_distance=3)
+    index.add("similar", simhash(REFUND))
+    index.add("unembedded", simhash(REFUND))
+    vectors = {"similar": [1.0, 0.0]}
+
+    assert find_duplicate(index, simhash(REFUND), [0.99, 0.1], vectors.get, 0.95) == "similar"
+    assert find_duplicate(index, simhash(REFUND), [0.0, 1.0], vectors.get, 0.95) is None
+
+
+def test_merge_metadata_counts_and_tracks_ids():
+    canonical = {"ticket_id": "t1"}
+    merge_metadata(canonical, "d2", {"ticket_id": "t2"})
+    merge_metadata(canonical, "d3", {"occurrence_count": 3, "merged_ids": ["d4", "d2"], "ticket_id": "t3"})
+
+    assert canonical["occurrence_count"] == 5
+    assert canonical["merged_ids"] == ["d2", "d3", "d4"]
+    assert canonical["last_ticket_id"] == "t3"
+
+
+def test_merge_metadata_caps_merged_ids():
+    canonical = {}
+    for n in range(MAX_MERGED_IDS + 5):
+        merge_metadata(canonical, f"d{n}", {})
+
+    assert len(canonical["merged_ids"]) == MAX_MERGED_IDS
+    assert canonical["merged_ids"][-1] == f"d{MAX_MERGED_IDS + 4}"
+    assert canonical["occurrence_count"] == MAX_MERGED_IDS + 6
+
+
+@pytest.mark.parametrize("duplicate_id, expected_ids, expected_count", [
+    ("d2", ["d3"], 2),
+    ("unknown", ["d2", "d3"], 3),
+])
+def test_unmerge_metadata(duplicate_id, expected_ids, expected_count):
+    canonical = {}
+    merge_metadata(canonical, "d2", {})
+    merge_metadata(canonical, "d3", {})
+
+    unmerge_metadata(canonical, duplicate_id)
+
+    assert canonical["merged_ids"] == expected_ids
+    assert canonical["occurrence_count"] == expected_count
+
+
+@pytest.mark.usefixtures("knowledge_index")
+def test_compaction_embeds_in_batches_and_merges_duplicates(monkeypatch):
+    from app.services import knowledge_base, vectorstore
+    from scripts.compact_knowledge_base import EMBED_BATCH, compact
+
+    texts = [f"article {n} covers topic{n} in detail" for n in range(EMBED_BATCH + 6)]
+    ids = [f"d{n}" for n in range(len(texts))]
+    knowledge_base.add_knowledge_documents(
+        texts + [REFUND, REFUND], [{} for _ in range(len(texts) + 2)],
+        ids=ids + ["first", "second"], deduplicate=False
+    )
+
+    embedding = vectorstore.get_embedding()
+    batches = []
+    embed_documents = embedding.embed_documents
+    monkeypatch.setattr(
+        embedding, "embed_documents", lambda texts: batches.append(len(texts)) or embed_documents(texts)
+    )
+    result = {}
+    vectorstore.update_vectorstore(
+        lambda store, attachments: result.update(compact(store, attachments, min_similarity=0.95))
+    )
+
+    # seed document + corpus + two copies, in model calls of at most EMBED_BATCH
+    assert batches == [EMBED_BATCH, len(texts) + 3 - EMBED_BATCH]
+    assert result == {"first": ["second"]}
+    store = vectorstore.get_vectorstore()
+    assert "second" not in store.index_to_docstore_id.values()
+    assert store.docstore.search("first").metadata["occurrence_count"] == 2
@@ -0,0 +1,92 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.services.deadline import Deadline, bound
+from app.services.embedding_batcher import MicroBatchEmbeddings
+
+
+class RecordingEmbeddings(Embeddings):
+    """One-hot-ish vectors per text; records each batch and can hold it until released."""
+
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+
+    @staticmethod
+    def vector(text: str) -> list:
+        return [float(len(text)), float(sum(map(ord, text)))]
+
+    def embed_documents(self, texts):
+        self.release.wait(5)
+        self.batches.append(list(texts))
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.vector(text)
+
+
+@pytest.fixture
+def model():
+    return RecordingEmbeddings()
+
+
+def _embed_concurrently(embedding, texts):
+    with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+        return list(pool.map(embedding.embed_query, texts))
+
+
+def test_concurrent_queries_share_one_model_call(model):
+    embedding = MicroBatchEmbeddings(model, max_batch_size=4, max_wait_ms=2000)
+    texts = ["reset password", "refund", "invoice copy", "cancel plan"]
+
+    vectors = _embed_concurrently(embedding, texts)
+
+    assert len(model.batches) == 1
+    assert sorted(model.batches[0]) == sorted(texts)
+    # Each caller gets its own vector back, whatever order the batch ran in
+    assert vectors == [model.vector(text) for text in texts]
+    assert embedding.stats()["mean_batch_size"] == 4
+
+
+def test_batches_are_capped_at_max_batch_size(model):
+    embedding = MicroBatchEmbeddings(model, max_batch_size=4, max_wait_ms=500)
+    texts = [f"query {n}" for n in range(6)]
+
+    vectors = _embed_concurrently(embedding, texts)
+
+    assert sorted(len(batch) for batch in model.batches) == [2, 4]
+    assert vectors == [model.vector(text) for text in texts]
+
+
+def test_query_times_out_at_the_request_deadline(model):
+    embedding = MicroBatchEmbeddings(model, max_batch_size=4, max_wait_ms=0)
+    model.release.clear()
+    try:
+        with bound(Deadline(0.05)), pytest.raises(TimeoutError):
+            embedding.embed_query("slow")
+    finally:
+        model.release.set()
+
+
+def test_model_errors_reach_every_caller_in_the_batch(model):
+    def fail(texts):
+        raise RuntimeError("model crashed")
+
+    model.embed_documents = fail
+    embedding = MicroBatchEmbeddings(model, max_batch_size=2, max_wait_ms=2000)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(embedding.embed_query, text) for text in ("a", "b")]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="model crashed"):
+                future.result(5)
+
+
+def test_documents_and_batch_size_one_bypass_the_queue(model):
+    assert MicroBatchEmbeddings(model, max_batch_size=1).embed_query("direct") == model.vector("direct")
+    assert MicroBatchEmbeddings(model).embed_documents(["x", "y"]) == [model.vector("x"), model.vector("y")]
+    assert model.batches == [["x", "y"]]
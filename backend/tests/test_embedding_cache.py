@@ -0,0 +1,96 @@
+import unicodedata
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.services import embedding_cache
+from app.services.embedding_cache import CachedEmbeddings, cache_key
+
+
+class CountingEmbeddings(Embeddings):
+    """Vectors derived from the text, recording every text the model sees."""
+
+    def __init__(self):
+        self.calls = []
+
+    def _embed(self, text: str) -> list:
+        rng = np.random.default_rng(sum(map(ord, text)))
+        return rng.standard_normal(8).tolist()
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return self._embed(text)
+
+
+@pytest.fixture
+def model():
+    return CountingEmbeddings()
+
+
+def test_keys_normalize_unicode_and_whitespace():
+    composed = unicodedata.normalize("NFC", "café refund")
+    decomposed = unicodedata.normalize("NFD", "café refund")
+
+    assert cache_key("m", composed) == cache_key("m", f"  {decomposed}\n")
+    assert cache_key("m", "reset password") == cache_key("m", "reset \t password")
+    assert cache_key("m", "Reset password") != cache_key("m", "reset password")
+    assert cache_key("m", "reset password") != cache_key("other", "reset password")
+
+
+def test_memory_hits_and_batched_misses(model):
+    cache = CachedEmbeddings(model, "m", max_entries=10)
+
+    first = cache.embed_documents(["a", "b", "a", "b  "])
+    second = cache.embed_query("a")
+
+    assert model.calls == [["a", "b"]]
+    assert first[0] == first[2] == second
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["memory_hits"] == 1
+
+
+def test_lru_evicts_least_recently_used(model):
+    cache = CachedEmbeddings(model, "m", max_entries=2)
+    cache.embed_query("a")
+    cache.embed_query("b")
+    cache.embed_query("a")  # refresh a
+    cache.embed_query("c")  # evicts b
+
+    model.calls.clear()
+    cache.embed_query("a")
+    cache.embed_query("b")
+
+    assert model.calls == [["b"]]
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_disk_tier_round_trips_float16(model, tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    vector = CachedEmbeddings(model, "m", disk_path=path).embed_query("refund policy")
+
+    model.calls.clear()
+    restarted = CachedEmbeddings(model, "m", disk_path=path)
+    restored = restarted.embed_documents(["refund  policy"])[0]
+
+    assert model.calls == []
+    assert restarted.stats()["disk_hits"] == 1
+    np.testing.assert_allclose(restored, vector, rtol=1e-3, atol=1e-3)
+    assert restored == np.asarray(vector, dtype=np.float16).astype(np.float32).tolist()
+
+
+def test_disk_tier_reconnects_in_a_forked_process(model, tmp_path, monkeypatch):
+    cache = CachedEmbeddings(model, "m", disk_path=str(tmp_path / "embeddings.sqlite"))
+    cache.put(["shared"], [[0.5] * 8])
+    parent_connection = cache._disk._connection
+
+    monkeypatch.setattr(embedding_cache.os, "getpid", lambda: -1)
+    found = cache._disk.get_many([cache_key("m", "shared")])
+
+    assert cache._disk._connection is not parent_connection
+    assert cache._disk._pid == -1
+    assert found == {cache_key("m", "shared"): [0.5] * 8}
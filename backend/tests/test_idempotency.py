@@ -0,0 +1,164 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.config.settings import settings
+from app.db.session import SessionLocal
+from app.models.idempotency import IdempotencyKey
+from app.schemas.ticket import TicketCreate
+from app.services import idempotency
+from app.services.idempotency import CREATE_ROUTE, StreamBroadcast
+
+pytestmark = pytest.mark.usefixtures("database")
+
+
+def _expire(route: str, key: str) -> None:
+    db = SessionLocal()
+    try:
+        row = db.get(IdempotencyKey, idempotency.scoped_key(route, key))
+        row.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_first_claim_runs_and_retry_sees_it_in_progress():
+    assert idempotency.claim(CREATE_ROUTE, "k", "h", "t1") is None
+
+    record = idempotency.claim(CREATE_ROUTE, "k", "h", "t2")
+
+    assert record["status"] == idempotency.IN_PROGRESS
+    assert record["ticket_id"] == "t1"
+
+
+def test_keys_are_scoped_by_route():
+    assert idempotency.claim(CREATE_ROUTE, "k", "h", "t1") is None
+    assert idempotency.claim(idempotency.STREAM_ROUTE, "k", "h", "t2") is None
+
+
+def test_completed_response_is_replayed():
+    idempotency.claim(CREATE_ROUTE, "k", "h", "t1")
+    idempotency.complete(CREATE_ROUTE, "k", {"ticket_id": "t1", "status": "resolved"})
+
+    record = idempotency.claim(CREATE_ROUTE, "k", "h", "t2")
+
+    assert record["status"] == idempotency.COMPLETED
+    assert record["response"] == {"ticket_id": "t1", "status": "resolved"}
+
+
+def test_released_key_can_be_claimed_again():
+    idempotency.claim(CREATE_ROUTE, "k", "h", "t1")
+    idempotency.release(CREATE_ROUTE, "k")
+
+    assert idempotency.claim(CREATE_ROUTE, "k", "h", "t2") is None
+
+
+def test_expired_key_is_claimed_again():
+    idempotency.claim(CREATE_ROUTE, "k", "h", "t1")
+    _expire(CREATE_ROUTE, "k")
+
+    assert idempotency.claim(CREATE_ROUTE, "k", "h", "t2") is None
+
+
+def test_purge_removes_only_expired_keys():
+    idempotency.claim(CREATE_ROUTE, "old", "h", "t1")
+    idempotency.claim(CREATE_ROUTE, "new", "h", "t2")
+    _expire(CREATE_ROUTE, "old")
+
+    assert idempotency.purge_expired() == 1
+    assert idempotency.claim(CREATE_ROUTE, "new", "h", "t3") is not None
+
+
+def test_wait_returns_completed_record():
+    idempotency.claim(CREATE_ROUTE, "k", "h", "t1")
+    timer = threading.Timer(0.05, idempotency.complete, (CREATE_ROUTE, "k", {"ok": True}))
+    timer.start()
+
+    record = idempotency.wait_for_completion(CREATE_ROUTE, "k", timeout=2, poll_interval=0.01)
+
+    timer.join()
+    assert record["response"] == {"ok": True}
+
+
+def test_wait_times_out_while_in_progress():
+    idempotency.claim(CREATE_ROUTE, "k", "h", "t1")
+
+    assert idempotency.wait_for_completion(CREATE_ROUTE, "k", timeout=0.05, poll_interval=0.01) is None
+
+
+# =============================================================================
+# Route helpers
+# =============================================================================
+
+def test_key_reused_for_different_body_is_rejected():
+    from app.api.routes.tickets import _claim_idempotency_key
+
+    assert _claim_idempotency_key(CREATE_ROUTE, "k", TicketCreate(text="one"), "t1") is None
+
+    with pytest.raises(HTTPException) as raised:
+        _claim_idempotency_key(CREATE_ROUTE, "k", TicketCreate(text="two"), "t2")
+
+    assert raised.value.status_code == 422
+
+
+def test_retry_of_request_in_progress_gets_409_after_waiting(monkeypatch):
+    from app.api.routes.tickets import _claim_idempotency_key, _idempotent_response
+
+    monkeypatch.setattr(settings, "idempotency_wait_s", 0.05)
+    payload = TicketCreate(text="one")
+    _claim_idempotency_key(CREATE_ROUTE, "k", payload, "t1")
+    record = _claim_idempotency_key(CREATE_ROUTE, "k", payload, "t2")
+
+    with pytest.raises(HTTPException) as raised:
+        _idempotent_response(CREATE_ROUTE, "k", record)
+
+    assert raised.value.status_code == 409
+    assert "in progress" in raised.value.detail
+
+
+def test_retry_of_failed_request_is_told_to_retry(monkeypatch):
+    from app.api.routes.tickets import _claim_idempotency_key, _idempotent_response
+
+    monkeypatch.setattr(settings, "idempotency_wait_s", 1)
+    payload = TicketCreate(text="one")
+    _claim_idempotency_key(CREATE_ROUTE, "k", payload, "t1")
+    record = _claim_idempotency_key(CREATE_ROUTE, "k", payload, "t2")
+    idempotency.release(CREATE_ROUTE, "k")
+
+    with pytest.raises(HTTPException) as raised:
+        _idempotent_response(CREATE_ROUTE, "k", record)
+
+    assert raised.value.status_code == 409
+    assert "failed" in raised.value.detail
+    assert _claim_idempotency_key(CREATE_ROUTE, "k", payload, "t3") is None
+
+
+# =============================================================================
+# StreamBroadcast
+# =============================================================================
+
+def test_late_subscriber_sees_stream_from_start():
+    broadcast = StreamBroadcast("t1")
+    broadcast.put("a")
+    broadcast.put("b")
+    broadcast.put(None)
+
+    assert list(broadcast.subscribe()) == ["a", "b"]
+    assert list(broadcast.subscribe()) == ["a", "b"]
+
+
+def test_subscriber_follows_live_items():
+    broadcast = StreamBroadcast("t1")
+    broadcast.put("a")
+    received = []
+    reader = threading.Thread(target=lambda: received.extend(broadcast.subscribe()))
+    reader.start()
+
+    for item in ("b", "c", None):
+        broadcast.put(item)
+    reader.join(timeout=2)
+
+    assert not reader.is_alive()
+    assert received == ["a", "b", "c"]
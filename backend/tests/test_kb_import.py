@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config.settings import settings
+from app.db.session import SessionLocal
+from app.models.kb_import_job import KnowledgeImportJob
+from app.services import kb_import, vectorstore
+
+pytestmark = pytest.mark.usefixtures("database")
+
+
+class _InlineExecutor:
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+@pytest.fixture
+def inline_jobs(monkeypatch):
+    monkeypatch.setattr(kb_import, "_job_executor", _InlineExecutor())
+
+
+def _finish_long_ago(job_id: str) -> None:
+    db = SessionLocal()
+    try:
+        row = db.get(KnowledgeImportJob, job_id)
+        row.finished_at = datetime.utcnow() - timedelta(seconds=settings.kb_import_job_ttl_s + 1)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_job_status_is_stored_in_the_database(inline_jobs, monkeypatch):
+    def fake_import(articles, embedder, on_flush=None, **options):
+        articles = list(articles)
+        on_flush({"api": len(articles)})
+        return {"articles": len(articles), "chunks": 3, "skipped": 0, "written": 3, "deleted": 0}
+
+    monkeypatch.setattr(kb_import, "import_articles", fake_import)
+
+    job = kb_import.start_import_job([{"text": "one"}, {"text": "two"}])
+
+    stored = kb_import.get_import_job(job["job_id"])
+    assert stored["status"] == "completed"
+    assert stored["articles_done"] == 2
+    assert stored["stats"]["written"] == 3
+    assert stored["finished_at"] is not None
+
+
+def test_failed_job_records_the_error(inline_jobs, monkeypatch):
+    def failing_import(articles, embedder, on_flush=None, **options):
+        raise RuntimeError("Vector store is not available")
+
+    monkeypatch.setattr(kb_import, "import_articles", failing_import)
+
+    job = kb_import.start_import_job([{"text": "one"}])
+
+    stored = kb_import.get_import_job(job["job_id"])
+    assert stored["status"] == "failed"
+    assert stored["error"] == "Vector store is not available"
+
+
+def test_purge_removes_only_expired_finished_jobs(monkeypatch):
+    monkeypatch.setattr(kb_import, "_job_executor", type("Idle", (), {"submit": lambda *args: None})())
+    queued = kb_import.start_import_job([{"text": "one"}])["job_id"]
+    old = kb_import.start_import_job([{"text": "two"}])["job_id"]
+    _finish_long_ago(old)
+
+    assert kb_import.purge_finished_jobs() == 1
+    assert kb_import.get_import_job(old) is None
+    assert kb_import.get_import_job(queued)["status"] == "queued"
+    assert kb_import.get_import_job("missing") is None
+
+
+def _article(key: str, paragraphs: list) -> dict:
+    return {"key": key, "title": None, "text": "\n\n".join(paragraphs), "metadata": {}}
+
+
+def _import(*articles) -> dict:
+    return kb_import.import_articles(
+        [("faq", article) for article in articles], kb_import.ChunkEmbedder(),
+        chunk_size=120, overlap=0, write_batch=1
+    )
+
+
+def _chunk_ids(key: str) -> list:
+    prefix = kb_import.chunk_prefix({"key": key})
+    return sorted(
+        doc_id for doc_id in vectorstore.get_vectorstore().index_to_docstore_id.values()
+        if doc_id.startswith(prefix + ":")
+    )
+
+
+@pytest.mark.usefixtures("knowledge_index")
+def test_reimporting_a_shorter_article_deletes_its_extra_chunks(monkeypatch):
+    paragraphs = [f"Paragraph {n} explains refund step {n} in words enough to fill a chunk." for n in range(4)]
+    assert _import(_article("refunds", paragraphs), _article("plans", paragraphs[:1]))["written"] == 5
+
+    scans = []
+    scan = kb_import._indexed_chunk_counts
+    monkeypatch.setattr(kb_import, "_indexed_chunk_counts", lambda store: scans.append(1) or scan(store))
+    stats = _import(_article("refunds", paragraphs[:2]), _article("plans", paragraphs[:1]))
+
+    assert stats["deleted"] == 2
+    assert stats["skipped"] == 3
+    assert len(scans) == 1  # once per import, not per flush
+    prefix = kb_import.chunk_prefix({"key": "refunds"})
+    assert _chunk_ids("refunds") == [f"{prefix}:0", f"{prefix}:1"]
+    assert len(_chunk_ids("plans")) == 1
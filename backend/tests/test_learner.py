@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql
+
+from app.config.settings import settings
+from app.db.init_db import init_db
+from app.db.session import SessionLocal, engine
+from app.models.feedback import Feedback
+from app.services import learner
+
+pytestmark = pytest.mark.usefixtures("database")
+
+
+@pytest.fixture
+def written(monkeypatch):
+    """Documents the learner writes, instead of the knowledge base."""
+    batches = []
+
+    def add(texts, metadatas, ids):
+        batches.append(dict(zip(ids, texts)))
+        return len(texts)
+
+    monkeypatch.setattr(learner, "add_knowledge_documents", add)
+    return batches
+
+
+def _add_feedback(feedback_id: str, ticket_id: str, content: str = "check the card", **fields) -> None:
+    db = SessionLocal()
+    try:
+        db.add(Feedback(
+            id=feedback_id,
+            ticket_id=ticket_id,
+            content=content,
+            ticket_text="I was charged twice",
+            final_response="We refunded the duplicate charge.",
+            intent="billing",
+            **fields
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _feedback(feedback_id: str) -> Feedback:
+    db = SessionLocal()
+    try:
+        return db.get(Feedback, feedback_id)
+    finally:
+        db.close()
+
+
+def _make_due(feedback_id: str) -> None:
+    db = SessionLocal()
+    try:
+        db.get(Feedback, feedback_id).next_attempt_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_claim_skips_rows_locked_by_another_learner():
+    db = SessionLocal()
+    try:
+        query = learner._claim_query(db, datetime.utcnow(), 10)
+        sql = str(query.statement.compile(dialect=postgresql.dialect()))
+    finally:
+        db.close()
+
+    assert "FOR UPDATE SKIP LOCKED" in sql
+
+
+def test_drain_learns_due_feedback_once(written):
+    _add_feedback("f1", "t1", created_at=datetime.utcnow() - timedelta(seconds=2))
+    _add_feedback("f2", "t1", content="newer note", created_at=datetime.utcnow() - timedelta(seconds=1))
+    _add_feedback("f3", "t2", next_attempt_at=datetime.utcnow() + timedelta(minutes=5))
+    _add_feedback("f4", "t3", status="learned")
+
+    assert learner.drain_pending_feedback() == 2
+    assert learner.drain_pending_feedback() == 0
+
+    assert len(written) == 1
+    assert list(written[0]) == ["feedback:t1"]
+    assert written[0]["feedback:t1"].endswith("Agent Notes: newer note")
+    assert _feedback("f1").status == "learned"
+    assert _feedback("f2").processed_at is not None
+    assert _feedback("f3").status == "pending"
+
+
+def test_failed_batch_backs_off_then_gives_up(monkeypatch):
+    def fail(texts, metadatas, ids):
+        raise RuntimeError("index unavailable")
+
+    monkeypatch.setattr(learner, "add_knowledge_documents", fail)
+    monkeypatch.setattr(settings, "learner_max_attempts", 3)
+    _add_feedback("f1", "t1")
+
+    delays = []
+    for attempt in range(1, 4):
+        before = datetime.utcnow()
+        assert learner.drain_pending_feedback() == 1
+        row = _feedback("f1")
+        assert row.attempts == attempt
+        assert row.last_error == "index unavailable"
+        if row.status == "pending":
+            delays.append(row.next_attempt_at - before)
+            _make_due("f1")
+
+    assert _feedback("f1").status == "failed"
+    assert learner.drain_pending_feedback() == 0
+    assert [round(delay.total_seconds()) for delay in delays] == [
+        learner.RETRY_BASE_DELAY, learner.RETRY_BASE_DELAY * learner.RETRY_BACKOFF_MULTIPLIER
+    ]
+
+
+def test_init_db_backfills_feedback_from_before_the_learner():
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE feedback"))
+        conn.execute(text("CREATE TABLE feedback (id VARCHAR PRIMARY KEY, ticket_id VARCHAR, content TEXT)"))
+        conn.execute(text("INSERT INTO feedback (id, ticket_id, content) VALUES ('old', 't0', 'note')"))
+
+    init_db()
+
+    columns = {column["name"] for column in inspect(engine).get_columns("feedback")}
+    assert {"status", "attempts", "next_attempt_at", "created_at"} <= columns
+    row = _feedback("old")
+    # Learned on submission by the old code: the learner must not pick it up again
+    assert row.status == "learned"
+    assert row.attempts == 0
+    assert row.next_attempt_at is not None
+    assert learner.drain_pending_feedback() == 0
@@ -0,0 +1,135 @@
+import time
+
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+from app.services import vectorstore
+from app.services.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def _index() -> BM25Index:
+    index = BM25Index()
+    index.add("err", "Checkout fails with error ERR-502 after payment", intent="technical")
+    index.add("refund", "How to request a refund for a duplicate charge", intent="billing")
+    index.add("charge", "Charged twice: duplicate charge on the invoice, duplicate charge again", intent="billing")
+    return index
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    assert tokenize("Error ERR-502 on the INV_2024 invoice") == [
+        "error", "err-502", "err", "502", "inv_2024", "inv", "2024", "invoice"
+    ]
+
+
+def test_scores_rank_matching_documents():
+    index = _index()
+
+    results = index.search("duplicate charge", k=3)
+
+    assert [doc_id for doc_id, _ in results] == ["charge", "refund"]
+    assert results[0][1] > results[1][1] > 0
+
+
+def test_exact_identifier_outranks_shared_words():
+    index = _index()
+
+    assert index.search("ERR-502 charge", k=1)[0][0] == "err"
+
+
+def test_intent_filter_and_k():
+    index = _index()
+
+    assert index.search("duplicate charge error", k=5, intent="technical") == index.search("error", k=5)
+    assert len(index.search("duplicate charge", k=1)) == 1
+
+
+def test_replacing_a_document_reindexes_it():
+    index = _index()
+
+    index.add("err", "Login page is blank", intent="technical")
+
+    assert index.search("ERR-502", k=3) == []
+    assert index.search("login", k=3)[0][0] == "err"
+    assert len(index) == 3
+
+
+def test_removed_document_leaves_no_postings():
+    index = _index()
+
+    index.remove("err")
+
+    assert "err-502" not in index.postings
+    assert "err" not in index
+    assert index.total_length == sum(index.doc_lengths.values())
+
+
+def test_expired_deadline_scores_nothing():
+    index = _index()
+
+    assert index.search("duplicate charge", k=3, deadline=time.monotonic() - 1) == []
+
+
+def test_rrf_merges_rankings():
+    merged = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]], k=3, rrf_k=60)
+
+    # a: 1/61 + 1/62, c: 1/63 + 1/61, b: 1/62
+    assert merged == ["a", "c", "b"]
+
+
+def test_rrf_single_ranking_keeps_order():
+    assert reciprocal_rank_fusion([["x", "y", "z"]], k=2) == ["x", "y"]
+
+
+# =============================================================================
+# Side indexes following the docstore
+# =============================================================================
+
+class _Store:
+    """The parts of a LangChain FAISS store that _sync_attachments reads."""
+
+    def __init__(self, docs: dict):
+        self.docstore = InMemoryDocstore(dict(docs))
+        self.index_to_docstore_id = dict(enumerate(docs))
+
+
+def _attachments(store) -> dict:
+    attachments = vectorstore._new_attachments()
+    vectorstore._sync_attachments(store, attachments)
+    return attachments
+
+
+def test_sync_reindexes_document_replaced_under_same_id():
+    store = _Store({
+        "a": Document(page_content="Error ERR-502 at checkout", metadata={"intent": "technical"}),
+        "b": Document(page_content="Refund a duplicate charge", metadata={"intent": "billing"}),
+    })
+    attachments = _attachments(store)
+    fingerprint = attachments[vectorstore.DEDUP_ATTACHMENT].fingerprints["a"]
+
+    before = vectorstore._documents(store)
+    store.docstore.delete(["a"])
+    store.docstore.add({"a": Document(page_content="Password reset link expired", metadata={"intent": "account"})})
+    vectorstore._sync_attachments(store, attachments, before)
+
+    lexical = attachments[vectorstore.LEXICAL_ATTACHMENT]
+    assert lexical.search("ERR-502", k=3) == []
+    assert lexical.search("password", k=3)[0][0] == "a"
+    assert lexical.doc_intents["a"] == "account"
+    assert attachments[vectorstore.DEDUP_ATTACHMENT].fingerprints["a"] != fingerprint
+
+
+def test_sync_drops_removed_and_adds_new_documents():
+    store = _Store({
+        "a": Document(page_content="Error ERR-502 at checkout"),
+        "b": Document(page_content="Refund a duplicate charge"),
+    })
+    attachments = _attachments(store)
+
+    store.docstore.delete(["a"])
+    store.docstore.add({"c": Document(page_content="Invoice INV-77 missing")})
+    store.index_to_docstore_id = {0: "b", 1: "c"}
+    vectorstore._sync_attachments(store, attachments)
+
+    lexical = attachments[vectorstore.LEXICAL_ATTACHMENT]
+    assert set(lexical.doc_lengths) == {"b", "c"}
+    assert set(attachments[vectorstore.DEDUP_ATTACHMENT].fingerprints) == {"b", "c"}
@@ -0,0 +1,171 @@
+import queue
+import threading
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pytest
+
+from app.config.settings import settings
+from app.db.session import SessionLocal
+from app.models.ticket import Ticket
+from app.models.ticket_checkpoint import TicketCheckpoint
+from app.services import idempotency, lifecycle
+from app.services.idempotency import CREATE_ROUTE, STREAM_ROUTE
+
+pytestmark = pytest.mark.usefixtures("database")
+
+LONG_AGO = datetime.utcnow() - timedelta(hours=1)
+
+
+def _add_ticket(ticket_id: str, status: str = "processing", **fields) -> None:
+    db = SessionLocal()
+    try:
+        db.add(Ticket(id=ticket_id, text=f"text of {ticket_id}", status=status, **fields))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _ticket(ticket_id: str) -> Ticket:
+    db = SessionLocal()
+    try:
+        return db.get(Ticket, ticket_id)
+    finally:
+        db.close()
+
+
+def _checkpoint(ticket_id: str):
+    db = SessionLocal()
+    try:
+        return db.get(TicketCheckpoint, ticket_id)
+    finally:
+        db.close()
+
+
+def _graph(result=None, error=None):
+    graph = mock.Mock()
+    if error is not None:
+        graph.invoke.side_effect = error
+    else:
+        graph.invoke.return_value = result
+    return mock.patch("app.graph.graph.get_graph", return_value=graph)
+
+
+def test_checkpoint_requeues_ticket_and_completes_key():
+    _add_ticket("t1")
+    idempotency.claim(STREAM_ROUTE, "k", "h", "t1")
+    stream = queue.Queue()
+    run = lifecycle.GraphRun("t1", STREAM_ROUTE, "follow-up", "original", stream, STREAM_ROUTE, "k")
+
+    lifecycle._checkpoint(run)
+
+    assert _ticket("t1").status == lifecycle.REQUEUED
+    checkpoint = _checkpoint("t1")
+    assert (checkpoint.ticket_text, checkpoint.original_ticket_text) == ("follow-up", "original")
+    assert (checkpoint.idempotency_route, checkpoint.idempotency_key) == (STREAM_ROUTE, "k")
+    record = idempotency.claim(STREAM_ROUTE, "k", "h", "t1")
+    assert record["status"] == idempotency.COMPLETED
+    assert record["response"]["final_result"]["type"] == "error"
+
+
+def test_drain_checkpoints_only_unfinished_runs():
+    _add_ticket("slow")
+    _add_ticket("fast")
+    stream = queue.Queue()
+    release = threading.Event()
+
+    def run(ticket_id, stream_queue=None, wait=None):
+        with lifecycle.track(ticket_id, CREATE_ROUTE, "text", stream_queue=stream_queue):
+            if wait is not None:
+                wait.wait(5)
+
+    slow = threading.Thread(target=run, args=("slow", stream, release))
+    slow.start()
+    run("fast")
+
+    lifecycle._drain(timeout=0.05)
+    release.set()
+    slow.join()
+
+    assert _ticket("slow").status == lifecycle.REQUEUED
+    assert _ticket("fast").status == "processing"
+    assert stream.get_nowait()["error"] == lifecycle.SHUTDOWN_MESSAGE
+    assert stream.get_nowait() is None
+    # Finished after all: its result is stored, so the checkpoint is dropped
+    assert _checkpoint("slow") is None
+
+
+def test_orphan_sweep_skips_recent_and_heartbeating_tickets():
+    _add_ticket("orphan", updated_at=LONG_AGO, idempotency_route=CREATE_ROUTE, idempotency_key="k")
+    _add_ticket("recent")
+    _add_ticket("alive", updated_at=LONG_AGO)
+    idempotency.claim(CREATE_ROUTE, "k", "h", "orphan")
+    lifecycle._touch(["alive"])
+
+    assert lifecycle.requeue_orphans() == 1
+
+    assert _ticket("orphan").status == lifecycle.REQUEUED
+    assert _ticket("recent").status == "processing"
+    alive = _ticket("alive")
+    assert alive.status == "processing"
+    assert alive.updated_at == LONG_AGO
+    assert _checkpoint("orphan").idempotency_key == "k"
+    record = idempotency.claim(CREATE_ROUTE, "k", "h", "orphan")
+    assert record["response"]["status"] == lifecycle.REQUEUED
+
+
+def test_recovery_reruns_ticket_and_completes_key():
+    _add_ticket("t1", status=lifecycle.REQUEUED, idempotency_route=CREATE_ROUTE, idempotency_key="k")
+    idempotency.claim(CREATE_ROUTE, "k", "h", "t1")
+
+    with _graph({"status": "resolved", "intent": "billing", "final_response": "Refunded"}):
+        assert lifecycle.recover() == 1
+
+    ticket = _ticket("t1")
+    assert (ticket.status, ticket.intent) == ("resolved", "billing")
+    assert _checkpoint("t1") is None
+    record = idempotency.claim(CREATE_ROUTE, "k", "h", "t1")
+    assert record["response"]["result"]["final_response"] == "Refunded"
+
+
+def test_failed_recovery_releases_key():
+    _add_ticket("t1", status=lifecycle.REQUEUED, idempotency_route=CREATE_ROUTE, idempotency_key="k")
+    idempotency.claim(CREATE_ROUTE, "k", "h", "t1")
+
+    with _graph(error=RuntimeError("provider down")):
+        lifecycle.recover()
+
+    assert _ticket("t1").status == "failed"
+    assert idempotency.claim(CREATE_ROUTE, "k", "h", "t2") is None
+
+
+def test_claim_gives_up_after_max_attempts(monkeypatch):
+    monkeypatch.setattr(settings, "recovery_max_attempts", 2)
+    _add_ticket("t1", status=lifecycle.REQUEUED)
+
+    for _ in range(2):
+        found, checkpoint = lifecycle._claim_requeued()
+        assert found and checkpoint is not None
+        # Interrupted again
+        db = SessionLocal()
+        db.get(Ticket, "t1").status = lifecycle.REQUEUED
+        db.commit()
+        db.close()
+
+    assert lifecycle._claim_requeued() == (True, None)
+    ticket = _ticket("t1")
+    assert ticket.status == "failed"
+    assert "2 times" in ticket.error_message
+    assert _checkpoint("t1") is None
+    assert lifecycle._claim_requeued() == (False, None)
+
+
+def test_stale_threshold_must_exceed_max_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "deadline_max_ms", 120000)
+    monkeypatch.setattr(settings, "recovery_stale_after_s", 120)
+
+    with pytest.raises(ValueError):
+        lifecycle.validate_settings()
+
+    monkeypatch.setattr(settings, "recovery_stale_after_s", 300)
+    lifecycle.validate_settings()
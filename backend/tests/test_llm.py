@@ -0,0 +1,66 @@
+from unittest import mock
+
+import httpx
+import pytest
+from openai import APITimeoutError, RateLimitError
+
+from app.services import llm
+from app.services.deadline import Deadline
+from app.services.exceptions import LLMError, LLMRateLimitError, LLMTimeoutError
+
+REQUEST = httpx.Request("POST", "https://llm.test/chat/completions")
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Upstream client whose completions.create is a mock; sleeps are recorded, not taken."""
+    client = mock.Mock()
+    sleeps = []
+    monkeypatch.setattr(llm, "get_cassette", lambda: None)
+    monkeypatch.setattr(llm, "_client_for", lambda deadline: client)
+    monkeypatch.setattr(llm.time, "sleep", sleeps.append)
+    client.sleeps = sleeps
+    return client
+
+
+def _backoff():
+    return [llm.BASE_DELAY * llm.BACKOFF_MULTIPLIER ** n for n in range(llm.MAX_RETRIES - 1)]
+
+
+def test_timeout_without_deadline_backs_off_like_other_errors(upstream):
+    upstream.chat.completions.create.side_effect = APITimeoutError(request=REQUEST)
+
+    with pytest.raises(LLMError):
+        llm.invoke_llm("prompt")
+
+    assert upstream.chat.completions.create.call_count == llm.MAX_RETRIES
+    assert upstream.sleeps == _backoff()
+
+
+def test_rate_limit_backs_off(upstream):
+    response = httpx.Response(429, request=REQUEST)
+    upstream.chat.completions.create.side_effect = RateLimitError("slow down", response=response, body=None)
+
+    with pytest.raises(LLMRateLimitError):
+        llm.invoke_llm("prompt")
+
+    assert upstream.sleeps == _backoff()
+
+
+def test_timeout_at_the_deadline_is_not_retried(upstream):
+    upstream.chat.completions.create.side_effect = APITimeoutError(request=REQUEST)
+
+    with pytest.raises(LLMTimeoutError):
+        llm.invoke_llm("prompt", deadline=Deadline(10.0))
+
+    assert upstream.chat.completions.create.call_count == 1
+    assert upstream.sleeps == []
+
+
+def test_retry_after_timeout_returns_the_answer(upstream):
+    answer = mock.Mock(usage=None, choices=[mock.Mock()])
+    answer.choices[0].message.content = "hello"
+    upstream.chat.completions.create.side_effect = [APITimeoutError(request=REQUEST), answer]
+
+    assert llm.invoke_llm("prompt") == "hello"
+    assert upstream.sleeps == [llm.BASE_DELAY]
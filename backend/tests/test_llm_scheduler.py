@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+from app.services import llm_scheduler
+from app.services.exceptions import LLMTimeoutError
+from app.services.llm_scheduler import BATCH, INTERACTIVE, STANDARD, LLMScheduler
+
+
+def _scheduler(max_concurrency: int = 1, batch_max_concurrency: int = 8, **weights) -> LLMScheduler:
+    return LLMScheduler(
+        max_concurrency=max_concurrency,
+        weights={INTERACTIVE: weights.get("interactive", 2.0), STANDARD: 1.0, BATCH: 1.0},
+        batch_max_concurrency=batch_max_concurrency,
+    )
+
+
+def _wait_until(condition, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def _queue(scheduler: LLMScheduler, priority_class: str, label: str, granted: list) -> threading.Thread:
+    """Start a call that records its label when granted, and wait until it is queued."""
+    queued = scheduler.stats()["queued"][priority_class]
+
+    def call():
+        with scheduler.slot(priority_class):
+            granted.append(label)
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    _wait_until(lambda: scheduler.stats()["queued"][priority_class] == queued + 1)
+    return thread
+
+
+def _run_queued(scheduler: LLMScheduler, holder_class: str, threads: list) -> None:
+    scheduler.release(holder_class)
+    for thread in threads:
+        thread.join(timeout=2)
+        assert not thread.is_alive()
+
+
+def test_slots_are_granted_by_smallest_tag():
+    scheduler = _scheduler()
+    scheduler.acquire(STANDARD)
+    granted = []
+    # Tags: standard 2, 3; interactive (weight 2) 1.5, 2, 2.5, 3
+    threads = [_queue(scheduler, STANDARD, f"s{i}", granted) for i in (1, 2)]
+    threads += [_queue(scheduler, INTERACTIVE, f"i{i}", granted) for i in (1, 2, 3, 4)]
+
+    _run_queued(scheduler, STANDARD, threads)
+
+    assert granted == ["i1", "i2", "s1", "i3", "i4", "s2"]
+
+
+def test_batch_waits_while_interactive_calls_are_queued():
+    scheduler = _scheduler()
+    scheduler.acquire(STANDARD)
+    granted = []
+    threads = [_queue(scheduler, BATCH, "b1", granted)]
+    # A heavy interactive backlog still goes first despite its later tags
+    threads += [_queue(scheduler, INTERACTIVE, f"i{i}", granted) for i in (1, 2, 3)]
+
+    _run_queued(scheduler, STANDARD, threads)
+
+    assert granted == ["i1", "i2", "i3", "b1"]
+
+
+def test_batch_is_capped_at_its_concurrency():
+    scheduler = _scheduler(max_concurrency=4, batch_max_concurrency=2)
+    scheduler.acquire(BATCH)
+    scheduler.acquire(BATCH)
+    granted = []
+    waiting = _queue(scheduler, BATCH, "b3", granted)
+
+    # Free slots remain for other classes
+    assert scheduler.acquire(STANDARD, timeout=0.5) < 0.5
+    stats = scheduler.stats()
+    assert stats["running"] == {INTERACTIVE: 0, STANDARD: 1, BATCH: 2}
+    assert stats["queued"][BATCH] == 1
+
+    _run_queued(scheduler, BATCH, [waiting])
+    assert granted == ["b3"]
+
+
+def test_timeout_leaves_no_waiter_behind():
+    scheduler = _scheduler()
+    scheduler.acquire(STANDARD)
+
+    with pytest.raises(LLMTimeoutError):
+        scheduler.acquire(INTERACTIVE, timeout=0.02)
+
+    assert scheduler.stats()["queued"][INTERACTIVE] == 0
+    scheduler.release(STANDARD)
+    assert scheduler.stats()["running"] == {INTERACTIVE: 0, STANDARD: 0, BATCH: 0}
+
+
+def test_slot_granted_as_the_wait_times_out_is_kept(monkeypatch):
+    scheduler = _scheduler()
+    scheduler.acquire(STANDARD)
+
+    class LateGrant(threading.Event):
+        def wait(self, timeout=None):
+            # The slot is handed over just after the wait gave up
+            scheduler.release(STANDARD)
+            return False
+
+    class LateGrantWaiter(llm_scheduler._Waiter):
+        def __init__(self, priority_class, tag):
+            super().__init__(priority_class, tag)
+            self.event = LateGrant()
+
+    monkeypatch.setattr(llm_scheduler, "_Waiter", LateGrantWaiter)
+
+    scheduler.acquire(INTERACTIVE, timeout=0.01)
+
+    assert scheduler.stats() == {
+        "running": {INTERACTIVE: 1, STANDARD: 0, BATCH: 0},
+        "queued": {INTERACTIVE: 0, STANDARD: 0, BATCH: 0},
+    }
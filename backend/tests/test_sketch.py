@@ -0,0 +1,54 @@
+import random
+
+from app.utils.sketch import RELATIVE_ACCURACY, LatencySketch, bucket_index
+
+
+def _exact(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_quantiles_within_relative_accuracy():
+    rng = random.Random(7)
+    values = [10 ** rng.uniform(0, 5) for _ in range(5000)]
+    sketch = LatencySketch()
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.0, 0.1, 0.5, 0.9, 0.95, 0.99, 1.0):
+        exact = _exact(values, q)
+        assert abs(sketch.quantile(q) - exact) <= RELATIVE_ACCURACY * exact * 1.0001
+
+
+def test_merged_sketch_matches_sketch_of_all_values():
+    rng = random.Random(11)
+    first, second = LatencySketch(), LatencySketch()
+    combined = LatencySketch()
+    for i in range(2000):
+        value = rng.expovariate(1 / 300)
+        (first if i % 2 else second).add(value)
+        combined.add(value)
+
+    first.merge(second)
+
+    assert first.count == combined.count
+    assert first.buckets == combined.buckets
+
+
+def test_rebuilt_from_bucket_rows():
+    sketch = LatencySketch()
+    for value in (5, 50, 500, 5000):
+        sketch.add(value)
+
+    rebuilt = LatencySketch.from_buckets((str(index), count) for index, count in sketch.buckets.items())
+
+    assert rebuilt.quantile(0.5) == sketch.quantile(0.5)
+
+
+def test_empty_and_zero_values():
+    sketch = LatencySketch()
+    assert sketch.quantile(0.5) is None
+
+    sketch.add(0.0)
+    assert sketch.quantile(0.5) == 0.0
+    assert bucket_index(0.0) == bucket_index(-1.0)
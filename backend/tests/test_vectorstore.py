@@ -0,0 +1,194 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.config.settings import settings
+from app.services import index_store, knowledge_base, vectorstore
+
+pytestmark = pytest.mark.usefixtures("knowledge_index")
+
+
+def _add(docs: dict, **kwargs) -> None:
+    """docs: id -> (text, intent)"""
+    knowledge_base.add_knowledge_documents(
+        [text for text, _ in docs.values()],
+        [{"intent": intent} for _, intent in docs.values()],
+        ids=list(docs),
+        deduplicate=False,
+        **kwargs
+    )
+
+
+def _ids_by_intent(store, partitions: dict) -> dict:
+    return {
+        intent: sorted(store.index_to_docstore_id[int(p)] for p in positions)
+        for intent, positions in partitions.items()
+    }
+
+
+def test_intent_partitions_are_published_with_the_snapshot(monkeypatch):
+    _add({
+        "b1": ("refund for a duplicate charge", "billing"),
+        "t1": ("error ERR-502 at checkout", "technical"),
+        "b2": ("invoice shows the wrong plan", "billing"),
+    })
+    store = vectorstore.get_vectorstore()
+    stored = index_store.read_attachment(
+        vectorstore._index_root(), vectorstore.get_vectorstore_version(), vectorstore.PARTITIONS_ATTACHMENT
+    )
+
+    def no_scan(store):
+        raise AssertionError("partitions derived on the request path")
+
+    monkeypatch.setattr(vectorstore, "_intent_partitions", no_scan)
+    served = vectorstore.get_intent_partitions(store)
+
+    assert _ids_by_intent(store, served) == {"billing": ["b1", "b2"], "technical": ["t1"]}
+    assert _ids_by_intent(store, stored) == _ids_by_intent(store, served)
+
+
+def test_partitions_follow_deletes():
+    _add({
+        "b1": ("refund for a duplicate charge", "billing"),
+        "t1": ("error ERR-502 at checkout", "technical"),
+        "b2": ("invoice shows the wrong plan", "billing"),
+    })
+
+    _add({}, delete_ids=["b1"])
+
+    store = vectorstore.get_vectorstore()
+    assert _ids_by_intent(store, vectorstore.get_intent_partitions(store)) == {
+        "billing": ["b2"], "technical": ["t1"]
+    }
+
+
+def test_partition_shortfall_is_topped_up_from_global_search():
+    _add({
+        "b1": ("refund for a duplicate charge", "billing"),
+        "t1": ("duplicate charge error at checkout", "technical"),
+        "t2": ("charge page error", "technical"),
+    })
+
+    results = knowledge_base.search_knowledge_base("duplicate charge", k=3, intent="billing")
+
+    ids = [result["id"] for result in results]
+    assert ids[0] == "b1"
+    assert len(ids) == 3
+    assert len(set(ids)) == 3
+
+
+def _corpus(n: int) -> dict:
+    return {f"d{i}": (f"article {i} about topic{i} and word{i % 7}", "general") for i in range(n)}
+
+
+def _no_rebuild(monkeypatch):
+    def rebuild(*args, **kwargs):
+        raise AssertionError("index rebuilt")
+
+    monkeypatch.setattr(vectorstore, "_rebuild", rebuild)
+
+
+def test_ivf_delete_removes_in_place(monkeypatch):
+    monkeypatch.setattr(settings, "ann_index_type", "ivf_flat")
+    _add(_corpus(200))
+    assert vectorstore.get_index_info()["index_type"] == "ivf_flat"
+
+    _no_rebuild(monkeypatch)
+    _add({}, delete_ids=["d0", "d5", "d199"])
+
+    store = vectorstore.get_vectorstore()
+    mapping = store.index_to_docstore_id
+    assert sorted(mapping) == list(range(store.index.ntotal))
+    assert {"d0", "d5", "d199"}.isdisjoint(mapping.values())
+    # Every position still holds its document's vector (moved ones included)
+    positions = sorted(mapping)
+    texts = [store.docstore.search(mapping[p]).page_content for p in positions]
+    stored = vectorstore._stored_vectors(store, positions)
+    assert np.allclose(stored, vectorstore.get_embedding().embed_documents(texts), atol=1e-6)
+
+
+def test_hnsw_delete_tombstones_then_rebuilds(monkeypatch):
+    monkeypatch.setattr(settings, "ann_index_type", "hnsw")
+    corpus = _corpus(20)
+    _add(corpus)
+    assert vectorstore.get_index_info()["index_type"] == "hnsw"
+
+    with monkeypatch.context() as patched:
+        _no_rebuild(patched)
+        _add({}, delete_ids=["d3"])
+
+    store = vectorstore.get_vectorstore()
+    assert store.index.ntotal == 21  # seed document + corpus, d3 tombstoned
+    assert vectorstore.get_index_info()["tombstones"] == 1
+    assert list(vectorstore.get_tombstones(store)) == [
+        p for p, doc_id in store.index_to_docstore_id.items() if doc_id == vectorstore.TOMBSTONE_ID
+    ]
+    ids = [r["id"] for r in knowledge_base.search_knowledge_base(corpus["d3"][0], k=21)]
+    assert "d3" not in ids
+    assert len(ids) == 20
+
+    _add({}, delete_ids=[f"d{i}" for i in range(4, 9)])
+
+    store = vectorstore.get_vectorstore()
+    assert store.index.ntotal == 15
+    assert vectorstore.TOMBSTONE_ID not in store.index_to_docstore_id.values()
+    assert len(vectorstore.get_tombstones(store)) == 0
+
+
+def test_concurrent_writes_share_one_snapshot(monkeypatch):
+    published = []
+    publish = vectorstore._publish
+
+    def counting_publish(store, meta, attachments):
+        published.append(sorted(store.index_to_docstore_id.values()))
+        return publish(store, meta, attachments)
+
+    monkeypatch.setattr(vectorstore, "_publish", counting_publish)
+
+    started, release = threading.Event(), threading.Event()
+
+    def blocking_write(store, attachments):
+        started.set()
+        release.wait(5)
+
+    first = threading.Thread(target=vectorstore.update_vectorstore, args=(blocking_write,))
+    first.start()
+    assert started.wait(5)
+
+    followers = [
+        threading.Thread(target=_add, args=({doc_id: (f"text for {doc_id}", "general")},))
+        for doc_id in ("a", "b")
+    ]
+    for thread in followers:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while len(vectorstore._queue) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in (first, *followers):
+        thread.join(5)
+
+    assert len(published) == 2
+    assert {"a", "b"} <= set(published[1])
+    assert {"a", "b"} <= set(vectorstore.get_vectorstore().index_to_docstore_id.values())
+
+
+def test_failed_write_is_left_out_of_the_batch():
+    def bad_write(store, attachments):
+        store.add_texts(["half-applied change"], ids=["partial"])
+        raise ValueError("bad write")
+
+    def good_write(store, attachments):
+        store.add_texts(["kept change"], ids=["kept"])
+
+    batch = [vectorstore._Write(bad_write), vectorstore._Write(good_write)]
+    with vectorstore._write_lock:
+        vectorstore._apply(batch)
+
+    assert isinstance(batch[0].error, ValueError)
+    assert batch[1].done and batch[1].error is None
+    ids = set(vectorstore.get_vectorstore().index_to_docstore_id.values())
+    assert "kept" in ids
+    assert "partial" not in ids